@@ -0,0 +1,107 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+from debate_store import HISTOGRAM_BINS, SPECTRUM_METRICS, valid_score
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+class DebateArrays:
+    """One debate as column arrays, for whole-debate analytics and bulk re-aggregation.
+
+    Built from DebateStore.debate_nodes(). Scores that are missing or out
+    of range are NaN and left out of their metric, as in aggregate_deltas().
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]]):
+        self.ids = [node["id"] for node in nodes]
+        index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.parent = np.array([index.get(node["parent_id"], -1) for node in nodes], dtype=np.int64)
+        self.depth = np.array([node["depth"] for node in nodes], dtype=np.int64)
+        self.types, self.type_codes = np.unique(np.array([node["opinion_type"] for node in nodes], dtype=object),
+                                                return_inverse=True)
+        scores = np.full((len(nodes), len(SPECTRUM_METRICS)), np.nan)
+        for i, node in enumerate(nodes):
+            node_scores = node["spectrum_scores"] if isinstance(node["spectrum_scores"], dict) else {}
+            for j, metric in enumerate(SPECTRUM_METRICS):
+                if valid_score(node_scores.get(metric)):
+                    scores[i, j] = node_scores[metric]
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _features(self):
+        """Per-node contributions as a matrix, with the aggregate key of each column."""
+        n, valid = len(self), ~np.isnan(self.scores)
+        bins = np.minimum(np.nan_to_num(self.scores).astype(np.int64) * HISTOGRAM_BINS // 100, HISTOGRAM_BINS - 1)
+        columns, keys = [np.ones(n)], ["nodes"]
+        for code, opinion_type in enumerate(self.types):
+            columns.append((self.type_codes == code).astype(float))
+            keys.append(f"type:{opinion_type}")
+        for j, metric in enumerate(SPECTRUM_METRICS):
+            columns += [valid[:, j].astype(float), np.where(valid[:, j], self.scores[:, j], 0.0)]
+            keys += [f"count:{metric}", f"sum:{metric}"]
+            for b in range(HISTOGRAM_BINS):
+                columns.append((valid[:, j] & (bins[:, j] == b)).astype(float))
+                keys.append(f"bin:{metric}:{b}")
+        return np.column_stack(columns) if n else np.zeros((0, len(keys))), keys
+
+    def subtree_totals(self) -> Dict[str, Dict[str, float]]:
+        """The running aggregates of every node's subtree, as stored in subtree_stats."""
+        totals, keys = self._features()
+        # Fold each depth level into its parents, deepest first: one vectorized step per level
+        order = np.argsort(self.depth, kind="stable")
+        levels = np.searchsorted(self.depth[order], np.arange(self.depth.max() + 2 if len(self) else 1))
+        for d in range(len(levels) - 2, 0, -1):
+            rows = order[levels[d]:levels[d + 1]]
+            rows = rows[self.parent[rows] >= 0]
+            np.add.at(totals, self.parent[rows], totals[rows])
+        return {
+            node_id: {keys[k]: float(totals[i, k]) for k in np.flatnonzero(totals[i])}
+            for i, node_id in enumerate(self.ids)
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Whole-debate distributions that running sums can't give: spread, percentiles, correlations, per-depth means."""
+        spectrum = {}
+        for j, metric in enumerate(SPECTRUM_METRICS):
+            column = self.scores[:, j][~np.isnan(self.scores[:, j])]
+            spectrum[metric] = {
+                "count": int(column.size),
+                "mean": float(column.mean()) if column.size else None,
+                "std": float(column.std()) if column.size else None,
+                "percentiles": dict(zip((f"p{p}" for p in PERCENTILES),
+                                        np.percentile(column, PERCENTILES).tolist())) if column.size else {},
+            }
+
+        complete = self.scores[~np.isnan(self.scores).any(axis=1)]
+        correlation = None
+        if len(complete) > 1:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                matrix = np.corrcoef(complete, rowvar=False)
+            correlation = {a: {b: (None if np.isnan(matrix[i, k]) else float(matrix[i, k]))
+                               for k, b in enumerate(SPECTRUM_METRICS)}
+                           for i, a in enumerate(SPECTRUM_METRICS)}
+
+        by_depth = {}
+        if len(self):
+            depths = self.depth.max() + 1
+            valid = ~np.isnan(self.scores)
+            counts = np.bincount(self.depth, minlength=depths)
+            for j, metric in enumerate(SPECTRUM_METRICS):
+                n = np.bincount(self.depth, weights=valid[:, j], minlength=depths)
+                total = np.bincount(self.depth, weights=np.nan_to_num(self.scores[:, j]), minlength=depths)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    by_depth[metric] = [None if c == 0 else float(t / c) for t, c in zip(total, n)]
+            by_depth["nodes"] = counts.tolist()
+
+        return {
+            "nodes": len(self),
+            "max_depth": int(self.depth.max()) if len(self) else None,
+            "opinion_types": {str(t): int(c) for t, c in zip(self.types, np.bincount(self.type_codes, minlength=len(self.types)))},
+            "spectrum": spectrum,
+            "correlation": correlation,
+            "by_depth": by_depth,
+        }
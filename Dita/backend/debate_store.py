@@ -0,0 +1,309 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Node columns holding JSON documents
+_JSON_FIELDS = ("spectrum_scores",)
+
+SPECTRUM_METRICS = ("logicality", "emotion", "novelty", "concreteness")
+HISTOGRAM_BINS = 10 # 0-9, 10-19, ..., 90-100
+
+
+def score_bin(score: float) -> int:
+    return min(int(score) * HISTOGRAM_BINS // 100, HISTOGRAM_BINS - 1)
+
+
+def valid_score(score: Any) -> bool:
+    return isinstance(score, (int, float)) and not isinstance(score, bool) and 0 <= score <= 100
+
+
+def aggregate_deltas(node: Dict[str, Any]) -> Dict[str, float]:
+    """What one node adds to the running aggregates of every subtree containing it."""
+    deltas = {"nodes": 1, f"type:{node['opinion_type']}": 1}
+    scores = node["spectrum_scores"] if isinstance(node["spectrum_scores"], dict) else {}
+    for metric in SPECTRUM_METRICS:
+        score = scores.get(metric)
+        if valid_score(score): # Missing or out-of-range scores are left out of that metric
+            deltas[f"count:{metric}"] = 1
+            deltas[f"sum:{metric}"] = score
+            deltas[f"bin:{metric}:{score_bin(score)}"] = 1
+    return deltas
+
+
+def format_aggregates(node_id: str, values: Dict[str, float]) -> Dict[str, Any]:
+    """Turn aggregate_deltas() totals into the /aggregates response."""
+    spectrum = {}
+    for metric in SPECTRUM_METRICS:
+        count = int(values.get(f"count:{metric}", 0))
+        spectrum[metric] = {
+            "count": count,
+            "mean": values.get(f"sum:{metric}", 0) / count if count else None,
+            "histogram": [int(values.get(f"bin:{metric}:{b}", 0)) for b in range(HISTOGRAM_BINS)],
+        }
+    return {
+        "node_id": node_id,
+        "nodes": int(values.get("nodes", 0)),
+        "opinion_types": {key[len("type:"):]: int(v) for key, v in sorted(values.items()) if key.startswith("type:")},
+        "spectrum": spectrum,
+    }
+
+
+class UnknownParentError(Exception):
+    def __init__(self, parent_id: str):
+        super().__init__(f"Parent node not found: {parent_id}")
+        self.parent_id = parent_id
+
+
+class DebateStore:
+    """SQLite-backed debate tree: every analyzed opinion or avatar reply is a node.
+
+    Nodes are indexed by id and by (parent_id, created_at), and carry their
+    root id and depth, so a node's children, its debate's root and the path
+    up to the root are all index lookups; ancestors() walks the path with a
+    recursive query that stops after ``limit`` nodes, so reading the recent
+    context of a deep node costs the same as that of a shallow one.
+
+    Every node also has running aggregates of its whole subtree (node count,
+    opinion type counts, spectrum score sums and histograms) in
+    ``subtree_stats``. add_node() adds the new node's contribution to each of
+    its ancestors in the same transaction, so subtree_aggregates() is a
+    single indexed read however large the subtree is.
+
+    Transcript imports checkpoint every stored entry in ``import_entries``,
+    written in the same transaction as its node, so a resumed import knows
+    exactly which entries are done.
+
+    The database runs in WAL mode so several uvicorn workers can share it.
+    Calls block on disk I/O; async endpoints should go through
+    ``run_in_threadpool``. Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                id TEXT PRIMARY KEY,
+                parent_id TEXT REFERENCES nodes (id),
+                root_id TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                author TEXT,
+                text TEXT NOT NULL,
+                opinion_type TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                spectrum_scores TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS nodes_parent ON nodes (parent_id, created_at);
+            CREATE INDEX IF NOT EXISTS nodes_root ON nodes (root_id);
+            -- Keys from aggregate_deltas(): nodes, type:<t>, count:<m>, sum:<m>, bin:<m>:<b>
+            CREATE TABLE IF NOT EXISTS subtree_stats (
+                node_id TEXT NOT NULL REFERENCES nodes (id),
+                key TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (node_id, key)
+            ) WITHOUT ROWID;
+            -- Transcript imports: which entries are already stored, so an interrupted import resumes
+            CREATE TABLE IF NOT EXISTS imports (
+                import_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                entries INTEGER NOT NULL,
+                failed INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS import_entries (
+                import_id TEXT NOT NULL REFERENCES imports (import_id),
+                entry_id TEXT NOT NULL,
+                line INTEGER NOT NULL,
+                node_id TEXT NOT NULL REFERENCES nodes (id),
+                PRIMARY KEY (import_id, entry_id)
+            ) WITHOUT ROWID;
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly in _transaction()
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, serializing writers across processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _node(row: sqlite3.Row) -> Dict[str, Any]:
+        node = dict(row)
+        for name in _JSON_FIELDS:
+            node[name] = json.loads(node[name])
+        return node
+
+    def add_node(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """Store an OpinionOut-shaped dict; raises UnknownParentError for a dangling parent_node."""
+        with self._transaction() as conn:
+            return self._insert_node(conn, node)
+
+    def _insert_node(self, conn: sqlite3.Connection, node: Dict[str, Any]) -> Dict[str, Any]:
+        parent_id = node.get("parent_node")
+        root_id, depth = node["id"], 0
+        if parent_id is not None:
+            parent = conn.execute("SELECT root_id, depth FROM nodes WHERE id = ?", (parent_id,)).fetchone()
+            if parent is None:
+                raise UnknownParentError(parent_id)
+            root_id, depth = parent["root_id"], parent["depth"] + 1
+        conn.execute(
+            "INSERT INTO nodes (id, parent_id, root_id, depth, author, text, opinion_type, summary, spectrum_scores, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (node["id"], parent_id, root_id, depth, node.get("author"), node["text"], node["opinion_type"],
+             node["summary"], json.dumps(node["spectrum_scores"], ensure_ascii=False), time.time()),
+        )
+        self._add_to_ancestors(conn, node["id"], aggregate_deltas(node))
+        return {**node, "root_id": root_id, "depth": depth}
+
+    @staticmethod
+    def _add_to_ancestors(conn: sqlite3.Connection, node_id: str, deltas: Dict[str, float]) -> None:
+        # One statement: (node and each ancestor) x (each delta), upserted
+        values = ", ".join("(?, ?)" for _ in deltas)
+        conn.execute(
+            f"""
+            WITH RECURSIVE path (id, parent_id) AS (
+                SELECT id, parent_id FROM nodes WHERE id = ?
+                UNION ALL
+                SELECT nodes.id, nodes.parent_id FROM nodes JOIN path ON nodes.id = path.parent_id
+            ), deltas (key, amount) AS (VALUES {values})
+            INSERT INTO subtree_stats (node_id, key, value)
+            SELECT path.id, deltas.key, deltas.amount FROM path, deltas WHERE true
+            ON CONFLICT (node_id, key) DO UPDATE SET value = value + excluded.value
+            """,
+            [node_id, *(x for item in deltas.items() for x in item)],
+        )
+
+    def subtree_aggregates(self, node_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM nodes WHERE id = ?", (node_id,)).fetchone() is None:
+            return None
+        rows = conn.execute("SELECT key, value FROM subtree_stats WHERE node_id = ?", (node_id,))
+        return format_aggregates(node_id, {key: value for key, value in rows})
+
+    def debate_nodes(self, root_id: str) -> List[Dict[str, Any]]:
+        """Every node of one debate (id, parent_id, depth, opinion_type, spectrum_scores)."""
+        return self._debate_nodes(self._conn(), root_id)
+
+    def _debate_nodes(self, conn: sqlite3.Connection, root_id: str) -> List[Dict[str, Any]]:
+        rows = conn.execute(
+            "SELECT id, parent_id, depth, opinion_type, spectrum_scores FROM nodes WHERE root_id = ?", (root_id,)
+        )
+        return [self._node(row) for row in rows]
+
+    def rebuild_aggregates(
+        self, root_id: str, compute: Callable[[List[Dict[str, Any]]], Dict[str, Dict[str, float]]]
+    ) -> int:
+        """Replace the subtree_stats of a debate with ``compute(debate_nodes)``; returns the node count.
+
+        Runs under the write lock, so no node can be added between reading the
+        debate and writing its totals.
+        """
+        with self._transaction() as conn:
+            nodes = self._debate_nodes(conn, root_id)
+            aggregates = compute(nodes)
+            conn.execute(
+                "DELETE FROM subtree_stats WHERE node_id IN (SELECT id FROM nodes WHERE root_id = ?)", (root_id,)
+            )
+            conn.executemany(
+                "INSERT INTO subtree_stats (node_id, key, value) VALUES (?, ?, ?)",
+                ((node_id, key, value) for node_id, values in aggregates.items() for key, value in values.items()),
+            )
+        return len(nodes)
+
+    def get_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        return self._node(row) if row else None
+
+    def children(self, node_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT * FROM nodes WHERE parent_id = ? ORDER BY created_at LIMIT ?", (node_id, limit)
+        )
+        return [self._node(row) for row in rows]
+
+    def ancestors(self, node_id: str, limit: int) -> List[Dict[str, Any]]:
+        """The node and up to ``limit - 1`` of its ancestors, nearest first."""
+        rows = self._conn().execute(
+            """
+            WITH RECURSIVE path (id, parent_id, n) AS (
+                SELECT id, parent_id, 0 FROM nodes WHERE id = ?
+                UNION ALL
+                SELECT nodes.id, nodes.parent_id, path.n + 1 FROM nodes JOIN path ON nodes.id = path.parent_id
+                LIMIT ?
+            )
+            SELECT nodes.* FROM path JOIN nodes ON nodes.id = path.id ORDER BY path.n
+            """,
+            (node_id, limit),
+        )
+        return [self._node(row) for row in rows]
+
+    # --- Transcript imports ---
+
+    def start_import(self, import_id: str, entries: int) -> Dict[str, str]:
+        """Register (or reopen) an import; returns the node id of every entry it already stored."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO imports (import_id, status, entries, created_at, updated_at) VALUES (?, 'running', ?, ?, ?)"
+                " ON CONFLICT (import_id) DO UPDATE SET status = 'running', entries = excluded.entries,"
+                " updated_at = excluded.updated_at",
+                (import_id, entries, now, now),
+            )
+            rows = conn.execute("SELECT entry_id, node_id FROM import_entries WHERE import_id = ?", (import_id,))
+            return {entry_id: node_id for entry_id, node_id in rows}
+
+    def add_imported_node(self, import_id: str, entry_id: str, line: int, node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """add_node() and the import's checkpoint for the entry, in one transaction.
+
+        Returns None, storing nothing, when the entry was stored meanwhile
+        (e.g. by a concurrent run of the same import in another worker).
+        """
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM import_entries WHERE import_id = ? AND entry_id = ?",
+                            (import_id, entry_id)).fetchone() is not None:
+                return None
+            stored = self._insert_node(conn, node)
+            conn.execute("INSERT INTO import_entries (import_id, entry_id, line, node_id) VALUES (?, ?, ?, ?)",
+                         (import_id, entry_id, line, node["id"]))
+        return stored
+
+    def imported_node_id(self, import_id: str, entry_id: str) -> Optional[str]:
+        row = self._conn().execute("SELECT node_id FROM import_entries WHERE import_id = ? AND entry_id = ?",
+                                   (import_id, entry_id)).fetchone()
+        return row["node_id"] if row else None
+
+    def finish_import(self, import_id: str, status: str, failed: int) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE imports SET status = ?, failed = ?, updated_at = ? WHERE import_id = ?",
+                         (status, failed, time.time(), import_id))
+
+    def get_import(self, import_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM imports WHERE import_id = ?", (import_id,)).fetchone()
+        if row is None:
+            return None
+        stored = conn.execute("SELECT COUNT(*) FROM import_entries WHERE import_id = ?", (import_id,)).fetchone()[0]
+        return {**dict(row), "stored": stored}
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
@@ -1,9 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from collections import deque
+from contextlib import asynccontextmanager
+import anyio
+import asyncio
 import httpx
 import uuid
 import json
+import os
+import sys
+import time
+# Modules shared by the backends live in <repo>/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "common"))
+from llm_gateway import LLMGateway
+from stream_json import JSONFieldStream
+from micro_batcher import BatchParseError, MicroBatcher
+from debate_store import DebateStore, UnknownParentError
+from debate_arrays import DebateArrays
 
 # --- Pydantic Models ---
 class OpinionIn(BaseModel):
@@ -23,8 +39,50 @@ class AvatarIn(BaseModel):
     name: str
     parent_node: str | None = None
 
+class TranscriptEntry(BaseModel):
+    id: str | int | None = None # Defaults to the line number
+    text: str
+    parent: str | int | None = None # id of an earlier entry; None starts a new debate
+    author: str | None = "あなた"
+
+# --- LM Studio Configuration ---
+LMSTUDIO_API_URL = os.getenv("LMSTUDIO_API_URL", "http://localhost:1234/v1/chat/completions")
+LMSTUDIO_MODEL = "local-model" # Use "local-model" for LM Studio
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4")) # In-flight LLM calls per process
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60.0"))
+
+# Opt-in micro-batching of /analyze-opinion: opinions arriving within the window share one LLM call.
+# Each call waits up to the window for company, so it is off (0) unless set, e.g. 50 under heavy load.
+ANALYZE_BATCH_WINDOW = float(os.getenv("ANALYZE_BATCH_WINDOW_MS", "0")) / 1000
+ANALYZE_BATCH_MAX_SIZE = int(os.getenv("ANALYZE_BATCH_MAX_SIZE", "16"))
+
+# Debate tree: every analyzed opinion and avatar reply, linked through parent_node
+DITA_DB_PATH = os.getenv("DITA_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "debates.db"))
+debate_store = DebateStore(DITA_DB_PATH)
+# Debate history in avatar prompts: estimated tokens, and ancestors read per prompt
+AVATAR_CONTEXT_TOKENS = int(os.getenv("AVATAR_CONTEXT_TOKENS", "1500"))
+AVATAR_CONTEXT_MAX_NODES = 64
+CONTEXT_FULL_TEXT_TOKENS = 150 # Longer ancestors are quoted by their stored summary
+
+# Bulk transcript import: entries in analysis at once (the micro-batcher groups them into LLM calls),
+# and how far analysis may run ahead of the oldest entry not yet stored
+TRANSCRIPT_CONCURRENCY = int(os.getenv("TRANSCRIPT_CONCURRENCY", "32"))
+TRANSCRIPT_LOOKAHEAD = 4 * TRANSCRIPT_CONCURRENCY
+TRANSCRIPT_MAX_LINE_BYTES = 1 << 20
+
+# Keep-alive pool, concurrency cap, retries and circuit breaker for LM Studio; opened in lifespan()
+llm_gateway = LLMGateway(LMSTUDIO_API_URL, LLM_MAX_CONCURRENCY, read_timeout=LLM_READ_TIMEOUT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_gateway.start()
+    try:
+        yield
+    finally:
+        await llm_gateway.close()
+
 # --- FastAPI App ---
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Middleware ---
 origins = [
@@ -42,10 +100,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- LM Studio Configuration ---
-LMSTUDIO_API_URL = "http://localhost:1234/v1/chat/completions"
-LMSTUDIO_MODEL = "local-model" # Use "local-model" for LM Studio
-
 # --- System Prompts ---
 ANALYZE_SYSTEM_PROMPT = """
 You are an expert debate analyst. A user has submitted an opinion. Your task is to analyze it and provide a structured JSON output. The JSON object must contain the following keys:
@@ -55,6 +109,13 @@ You are an expert debate analyst. A user has submitted an opinion. Your task is
 Do not include any other text or explanations in your response, only the raw JSON object.
 """
 
+ANALYZE_BATCH_SYSTEM_PROMPT = ANALYZE_SYSTEM_PROMPT.replace(
+    "A user has submitted an opinion. Your task is to analyze it and provide a structured JSON output. The JSON object must contain the following keys:",
+    "Users have submitted several numbered opinions. Analyze each one independently. Respond with a JSON object with a single key \"results\": an array holding one object per opinion, in the same order as the opinions. Each object must contain the following keys:",
+)
+
+ANALYSIS_KEYS = ("opinion_type", "summary", "spectrum_scores")
+
 def get_avatar_prompt(avatar_name: str) -> str:
     prompts = {
         "ソクラテス": "You are Socrates. Respond to the user's last point by asking a probing, philosophical question that challenges their assumptions. Your response should be in the persona of Socrates. Structure your output as a JSON object with the same keys as the debate analyst.",
@@ -63,68 +124,439 @@ def get_avatar_prompt(avatar_name: str) -> str:
     }
     return prompts.get(avatar_name, ANALYZE_SYSTEM_PROMPT) # Default to analyst if name is unknown
 
-# --- API Endpoints ---
-@app.post("/analyze-opinion", response_model=OpinionOut)
-async def analyze_opinion(opinion: OpinionIn):
-    payload = {
+def estimate_tokens(text: str) -> int:
+    # No tokenizer at hand: about 4 ASCII characters per token, one token per other (e.g. Japanese) character
+    ascii_chars = sum(c < "\x80" for c in text)
+    return ascii_chars // 4 + len(text) - ascii_chars + 1
+
+def context_line(node: dict, text: str) -> str:
+    return f"[{node['author'] or 'participant'} / {node['opinion_type']}] {text}"
+
+def build_debate_context(path: list[dict], root: dict | None, budget: int) -> str:
+    """Debate history for an avatar prompt, oldest first, within ``budget`` estimated tokens.
+
+    ``path`` is the node being answered followed by its nearest ancestors.
+    Walking up from the node, long ancestors are quoted by their summary and
+    the walk stops when the budget runs out; the debate's root (its topic) is
+    kept, with a note of how many opinions in between were left out.
+    """
+    if root is not None and root["id"] == path[0]["id"]:
+        root = None # Answering the root itself
+    root_line = None
+    if root is not None:
+        path = [node for node in path if node["id"] != root["id"]]
+        root_text = root["text"] if estimate_tokens(root["text"]) <= CONTEXT_FULL_TEXT_TOKENS else root["summary"]
+        root_line = context_line(root, root_text)
+    used = estimate_tokens(root_line) if root_line else 0
+    lines = []
+    for i, node in enumerate(path):
+        text = node["text"]
+        if estimate_tokens(text) > (budget - used if i == 0 else CONTEXT_FULL_TEXT_TOKENS):
+            text = node["summary"]
+        line = context_line(node, text)
+        cost = estimate_tokens(line)
+        if used + cost > budget and i > 0:
+            break
+        lines.append(line)
+        used += cost
+    omitted = path[0]["depth"] + 1 - len(lines) - (root_line is not None)
+    if omitted > 0:
+        lines.append(f"... ({omitted} earlier opinions omitted) ...")
+    if root_line is not None:
+        lines.append(root_line)
+    return "\n".join(reversed(lines))
+
+async def avatar_user_message(parent_node: str | None) -> str:
+    question = "Based on the last point, what is your opinion?"
+    if parent_node is None:
+        return question
+    path = await run_in_threadpool(debate_store.ancestors, parent_node, AVATAR_CONTEXT_MAX_NODES)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"Parent node not found: {parent_node}")
+    root = path[-1] if path[-1]["parent_id"] is None else await run_in_threadpool(debate_store.get_node, path[0]["root_id"])
+    context = build_debate_context(path, root, AVATAR_CONTEXT_TOKENS)
+    return f"The debate so far, oldest first (the last line is the last point):\n{context}\n\n{question}"
+
+async def store_node(node: "OpinionOut") -> None:
+    try:
+        await run_in_threadpool(debate_store.add_node, node.model_dump())
+    except UnknownParentError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def require_parent(parent_node: str | None) -> None:
+    # Checked before the LLM call, so a bad link doesn't cost a generation
+    if parent_node is not None and await run_in_threadpool(debate_store.get_node, parent_node) is None:
+        raise HTTPException(status_code=404, detail=f"Parent node not found: {parent_node}")
+
+def analyze_payload(system_prompt: str, user_content: str) -> dict:
+    return {
         "model": LMSTUDIO_MODEL,
         "messages": [
-            {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
-            {"role": "user", "content": opinion.text}
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
         ],
         "temperature": 0.7,
         "response_format": {"type": "json_object"},
     }
+
+async def analyze_text(text: str) -> dict:
+    response = await llm_gateway.post(analyze_payload(ANALYZE_SYSTEM_PROMPT, text))
+    response.raise_for_status()
+    return json.loads(response.json()["choices"][0]["message"]["content"])
+
+async def analyze_texts(texts: list[str]) -> list[dict]:
+    """Analyze several opinions in one LLM call; BatchParseError when the answer doesn't line up."""
+    numbered = "\n\n".join(f"Opinion {i + 1}:\n{text}" for i, text in enumerate(texts))
+    response = await llm_gateway.post(analyze_payload(ANALYZE_BATCH_SYSTEM_PROMPT, numbered))
+    response.raise_for_status()
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(LMSTUDIO_API_URL, json=payload)
-            response.raise_for_status()
-            
-            llm_response_data = json.loads(response.json()["choices"][0]["message"]["content"])
-
-            return OpinionOut(
-                id=str(uuid.uuid4()),
-                text=opinion.text,
-                parent_node=opinion.parent_node,
-                **llm_response_data
-            )
+        data = json.loads(response.json()["choices"][0]["message"]["content"])
+        # Some models return the bare array, or put it under another key
+        results = data if isinstance(data, list) else next(v for v in data.values() if isinstance(v, list))
+    except (json.JSONDecodeError, KeyError, IndexError, AttributeError, StopIteration) as e:
+        raise BatchParseError(f"Unparseable batch response: {e!r}")
+    if len(results) != len(texts) or not all(isinstance(r, dict) and all(k in r for k in ANALYSIS_KEYS) for r in results):
+        raise BatchParseError(f"Expected {len(texts)} analyses, got {len(results)}")
+    return [{k: r[k] for k in ANALYSIS_KEYS} for r in results]
+
+analyze_batcher = MicroBatcher(analyze_texts, analyze_text, ANALYZE_BATCH_WINDOW, ANALYZE_BATCH_MAX_SIZE) if ANALYZE_BATCH_WINDOW > 0 else None
+
+async def analyze(text: str) -> dict:
+    if analyze_batcher is not None:
+        return await analyze_batcher.submit(text)
+    return await analyze_text(text)
+
+# --- API Endpoints ---
+@app.post("/analyze-opinion", response_model=OpinionOut)
+async def analyze_opinion(opinion: OpinionIn):
+    await require_parent(opinion.parent_node)
+    try:
+        llm_response_data = await analyze(opinion.text)
+
+        node = OpinionOut(
+            id=str(uuid.uuid4()),
+            text=opinion.text,
+            parent_node=opinion.parent_node,
+            **llm_response_data
+        )
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Error connecting to LM Studio: {e}")
     except (json.JSONDecodeError, KeyError) as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse LLM response: {e}")
+    await store_node(node)
+    return node
 
 
-@app.post("/invoke-avatar", response_model=OpinionOut)
-async def invoke_avatar(req: AvatarIn):
-    system_prompt = get_avatar_prompt(req.name)
-    payload = {
+async def avatar_payload(req: AvatarIn) -> dict:
+    return {
         "model": LMSTUDIO_MODEL,
         "messages": [
-            {"role": "system", "content": system_prompt},
-            # In a real app, you'd pass the recent conversation history here
-            {"role": "user", "content": "Based on the last point, what is your opinion?"} 
+            {"role": "system", "content": get_avatar_prompt(req.name)},
+            # The path to parent_node, cut to AVATAR_CONTEXT_TOKENS
+            {"role": "user", "content": await avatar_user_message(req.parent_node)}
         ],
         "temperature": 0.8,
         "response_format": {"type": "json_object"},
     }
+
+@app.post("/invoke-avatar", response_model=OpinionOut)
+async def invoke_avatar(req: AvatarIn):
+    payload = await avatar_payload(req)
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(LMSTUDIO_API_URL, json=payload)
-            response.raise_for_status()
-
-            llm_response_data = json.loads(response.json()["choices"][0]["message"]["content"])
-            
-            # The LLM generates the core text, so we use its summary as the main text
-            generated_text = llm_response_data.get("summary", "No text generated.")
-
-            return OpinionOut(
-                id=str(uuid.uuid4()),
-                text=generated_text,
-                parent_node=req.parent_node,
-                author=req.name,
-                **llm_response_data
-            )
+        response = await llm_gateway.post(payload)
+        response.raise_for_status()
+
+        llm_response_data = json.loads(response.json()["choices"][0]["message"]["content"])
+        
+        # The LLM generates the core text, so we use its summary as the main text
+        generated_text = llm_response_data.get("summary", "No text generated.")
+
+        node = OpinionOut(
+            id=str(uuid.uuid4()),
+            text=generated_text,
+            parent_node=req.parent_node,
+            author=req.name,
+            **llm_response_data
+        )
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Error connecting to LM Studio: {e}")
     except (json.JSONDecodeError, KeyError) as e:
-        raise HTTPException(status_code=500, detail=f"Failed to parse LLM response: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to parse LLM response: {e}")
+    await store_node(node)
+    return node
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def opinion_events(payload: dict, make_node):
+    """Server-Sent Events for one streamed analysis or avatar completion.
+
+    ``delta`` events ({"field", "text"}) carry string fields such as the
+    summary as they are generated, ``field`` events ({"field", "value"}) each
+    field once it is complete (opinion_type, spectrum_scores), and a final
+    ``opinion`` event the stored OpinionOut built by ``make_node(analysis)``;
+    or an ``error`` event ({"status", "detail"}).
+    """
+    parser = JSONFieldStream(ANALYSIS_KEYS)
+    try:
+        async for delta in llm_gateway.stream_deltas(payload):
+            for field, text in parser.feed(delta):
+                yield sse_event("delta", {"field": field, "text": text})
+            for field, value in parser.completed():
+                yield sse_event("field", {"field": field, "value": value})
+    except httpx.RequestError as e:
+        yield sse_event("error", {"status": 503, "detail": f"Error connecting to LM Studio: {e}"})
+        return
+    except httpx.HTTPStatusError as e:
+        yield sse_event("error", {"status": 502, "detail": f"LM Studio returned an error: {e.response.status_code}"})
+        return
+    except (json.JSONDecodeError, KeyError, IndexError) as e:
+        yield sse_event("error", {"status": 500, "detail": f"Failed to parse LLM stream: {e}"})
+        return
+
+    try:
+        analysis = parser.result()
+        node = make_node({k: analysis[k] for k in ANALYSIS_KEYS})
+        await run_in_threadpool(debate_store.add_node, node.model_dump())
+    except (json.JSONDecodeError, KeyError, TypeError, ValidationError) as e:
+        yield sse_event("error", {"status": 500, "detail": f"Failed to parse LLM response: {e}"})
+        return
+    except UnknownParentError as e:
+        yield sse_event("error", {"status": 404, "detail": str(e)})
+        return
+    yield sse_event("opinion", node.model_dump())
+
+def sse_response(events) -> StreamingResponse:
+    # Starlette cancels events() when the client goes away, which exits the
+    # upstream stream context and aborts the LLM request.
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/analyze-opinion/stream")
+async def analyze_opinion_stream(opinion: OpinionIn):
+    """Server-Sent Events variant of /analyze-opinion (not micro-batched); see opinion_events()."""
+    await require_parent(opinion.parent_node)
+    return sse_response(opinion_events(
+        analyze_payload(ANALYZE_SYSTEM_PROMPT, opinion.text),
+        lambda analysis: OpinionOut(id=str(uuid.uuid4()), text=opinion.text, parent_node=opinion.parent_node, **analysis),
+    ))
+
+@app.post("/invoke-avatar/stream")
+async def invoke_avatar_stream(req: AvatarIn):
+    """Server-Sent Events variant of /invoke-avatar; the summary deltas are the avatar's words as it speaks."""
+    return sse_response(opinion_events(
+        await avatar_payload(req),
+        lambda analysis: OpinionOut(id=str(uuid.uuid4()), text=analysis["summary"], parent_node=req.parent_node,
+                                    author=req.name, **analysis),
+    ))
+
+async def read_transcript(request: Request) -> list[dict]:
+    """Parse an NDJSON transcript as it is received.
+
+    Returns one item per non-empty line, in order: {"line", "id", "text",
+    "parent", "author"}, or {"line", "id", "error"} for a line that can't be
+    imported (invalid JSON, duplicate id, parent not among the earlier entries).
+    """
+    entries = []
+    seen = set()
+    buffer = b""
+    line_no = 0
+
+    def add_line(line: bytes):
+        nonlocal line_no
+        line_no += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            entry = TranscriptEntry(**json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValidationError) as e:
+            entries.append({"line": line_no, "id": None, "error": f"Invalid entry: {e}"})
+            return
+        entry_id = str(line_no if entry.id is None else entry.id)
+        parent = None if entry.parent is None else str(entry.parent)
+        if entry_id in seen:
+            entries.append({"line": line_no, "id": entry_id, "error": f"Duplicate entry id: {entry_id}"})
+        elif parent is not None and parent not in seen:
+            entries.append({"line": line_no, "id": entry_id, "error": f"Parent entry not found: {parent}"})
+        else:
+            seen.add(entry_id)
+            entries.append({"line": line_no, "id": entry_id, "text": entry.text, "parent": parent, "author": entry.author})
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        if len(buffer) > TRANSCRIPT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=400, detail="Transcript line too long")
+        for line in lines:
+            add_line(line)
+    add_line(buffer)
+    return entries
+
+async def transcript_results(import_id: str, entries: list[dict], done: dict[str, str]):
+    """NDJSON results of a transcript import, one line per entry in transcript order, then a summary.
+
+    Up to TRANSCRIPT_CONCURRENCY entries are analyzed at once, at most
+    TRANSCRIPT_LOOKAHEAD ahead of the entry being stored; each entry is
+    stored with its checkpoint as soon as it and every entry before it are
+    analyzed. ``done`` maps the entries stored by earlier runs of the import
+    to their node ids; they are reported as "skipped" without an LLM call.
+    If LM Studio can't be reached the import stops as "interrupted".
+    """
+    started = time.time()
+    node_ids = dict(done) # Entry id -> node id, for the parent links
+    counts = {"stored": 0, "skipped": 0, "failed": 0}
+    summary = {"import_id": import_id, "status": "interrupted"}
+    semaphore = asyncio.Semaphore(TRANSCRIPT_CONCURRENCY)
+    remaining = iter(entries)
+    pending = deque()
+
+    async def analyze_entry(text: str) -> dict:
+        async with semaphore:
+            return await analyze(text)
+
+    def discard(task: asyncio.Task | None):
+        if task is not None and not task.cancel() and not task.cancelled():
+            task.exception() # Retrieved, so the error isn't logged as never retrieved
+
+    def fill():
+        while len(pending) < TRANSCRIPT_LOOKAHEAD:
+            entry = next(remaining, None)
+            if entry is None:
+                return
+            needs_analysis = "error" not in entry and entry["id"] not in done
+            pending.append((entry, asyncio.create_task(analyze_entry(entry["text"])) if needs_analysis else None))
+
+    async def store(entry: dict, task: asyncio.Task | None) -> dict:
+        result = {"line": entry["line"], "id": entry["id"]}
+        if "error" in entry:
+            return {**result, "status": "failed", "detail": entry["error"]}
+        if task is None:
+            return {**result, "status": "skipped", "node_id": done[entry["id"]]}
+        try:
+            analysis = await task # Before the parent check, so an unreachable LM Studio still stops the import
+            parent_node = None if entry["parent"] is None else node_ids.get(entry["parent"])
+            if entry["parent"] is not None and parent_node is None:
+                return {**result, "status": "failed", "detail": f"Parent entry was not stored: {entry['parent']}"}
+            node = OpinionOut(id=str(uuid.uuid4()), text=entry["text"], parent_node=parent_node,
+                              author=entry["author"], **analysis)
+        except httpx.HTTPStatusError as e:
+            return {**result, "status": "failed", "detail": f"LM Studio returned an error: {e.response.status_code}"}
+        except (json.JSONDecodeError, KeyError, TypeError, ValidationError) as e:
+            return {**result, "status": "failed", "detail": f"Failed to parse LLM response: {e}"}
+        stored = await run_in_threadpool(debate_store.add_imported_node, import_id, entry["id"], entry["line"], node.model_dump())
+        if stored is None: # Stored meanwhile by a concurrent run of this import
+            node_ids[entry["id"]] = await run_in_threadpool(debate_store.imported_node_id, import_id, entry["id"])
+            return {**result, "status": "skipped", "node_id": node_ids[entry["id"]]}
+        node_ids[entry["id"]] = node.id
+        return {**result, "status": "stored", "node_id": node.id, "node": node.model_dump()}
+
+    try:
+        fill()
+        while pending:
+            entry, task = pending.popleft()
+            try:
+                result = await store(entry, task)
+            except httpx.RequestError as e:
+                summary["detail"] = f"Error connecting to LM Studio: {e}"
+                break
+            counts[result["status"]] += 1
+            fill()
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+        else:
+            summary["status"] = "done" if counts["failed"] == 0 else "incomplete"
+        summary.update(entries=len(entries), **counts, elapsed_seconds=time.time() - started)
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+    finally:
+        # Also reached when the client goes away: stop the analyses and record the status
+        for _, task in pending:
+            discard(task)
+        with anyio.CancelScope(shield=True):
+            await run_in_threadpool(debate_store.finish_import, import_id, summary["status"], counts["failed"])
+
+@app.post("/transcripts/import")
+async def import_transcript(request: Request, import_id: str | None = None):
+    """Import a recorded debate streamed as NDJSON, one TranscriptEntry per line.
+
+    Every entry is analyzed like /analyze-opinion and stored as a node under
+    its parent entry's node. The response is NDJSON too, see
+    transcript_results(); its X-Import-Id header names the import. Posting
+    the same transcript again with ?import_id= resumes an interrupted
+    import: entries already stored are not analyzed again.
+
+    The body is read to the end before the response starts (Starlette's
+    StreamingResponse listens for disconnects on the same receive channel).
+    """
+    import_id = import_id or uuid.uuid4().hex
+    entries = await read_transcript(request)
+    done = await run_in_threadpool(debate_store.start_import, import_id, len(entries))
+    return StreamingResponse(
+        transcript_results(import_id, entries, done),
+        media_type="application/x-ndjson",
+        headers={"X-Import-Id": import_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/transcripts/import/{import_id}")
+async def get_transcript_import(import_id: str):
+    progress = await run_in_threadpool(debate_store.get_import, import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
+@app.get("/nodes/{node_id}")
+async def get_node(node_id: str):
+    node = await run_in_threadpool(debate_store.get_node, node_id)
+    if node is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return node
+
+@app.get("/nodes/{node_id}/children")
+async def get_children(node_id: str, limit: int = 100):
+    return await run_in_threadpool(debate_store.children, node_id, min(limit, 1000))
+
+@app.get("/nodes/{node_id}/path")
+async def get_path(node_id: str, limit: int = AVATAR_CONTEXT_MAX_NODES):
+    """The node and its ancestors, nearest first."""
+    path = await run_in_threadpool(debate_store.ancestors, node_id, min(limit, 1000))
+    if not path:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return path
+
+
+@app.get("/nodes/{node_id}/aggregates")
+async def get_aggregates(node_id: str):
+    """Node count, opinion type counts and spectrum score means/histograms of the node's subtree."""
+    aggregates = await run_in_threadpool(debate_store.subtree_aggregates, node_id)
+    if aggregates is None:
+        raise HTTPException(status_code=404, detail="Node not found")
+    return aggregates
+
+@app.get("/debates/{root_id}/snapshot")
+async def get_debate_snapshot(root_id: str):
+    """Whole-debate analytics (spread, percentiles, correlations, per-depth means), computed with NumPy."""
+    nodes = await run_in_threadpool(debate_store.debate_nodes, root_id)
+    if not nodes:
+        raise HTTPException(status_code=404, detail="Debate not found")
+    return await run_in_threadpool(lambda: DebateArrays(nodes).snapshot())
+
+@app.post("/debates/{root_id}/reaggregate")
+async def reaggregate_debate(root_id: str):
+    """Recompute every subtree aggregate of a debate from its nodes (e.g. for debates stored before aggregates existed)."""
+    nodes = await run_in_threadpool(
+        debate_store.rebuild_aggregates, root_id, lambda nodes: DebateArrays(nodes).subtree_totals()
+    )
+    if nodes == 0:
+        raise HTTPException(status_code=404, detail="Debate not found")
+    return {"root_id": root_id, "nodes": nodes}
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return llm_gateway.stats()
+
+@app.get("/analyze-opinion/batch-stats")
+async def analyze_batch_stats():
+    return analyze_batcher.stats() if analyze_batcher else {"enabled": False}
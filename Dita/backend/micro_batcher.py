@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+class BatchParseError(Exception):
+    """The batched call answered, but not with one usable result per item."""
+
+
+class MicroBatcher:
+    """Coalesces concurrent calls into batched ones.
+
+    submit() parks its item for up to ``window`` seconds; everything that
+    arrives in that window (at most ``max_size`` items, a full batch is sent
+    at once) goes to ``run_batch(items)`` in one call, which returns the
+    results in item order. A lone item goes straight to ``run_one``. When
+    run_batch raises BatchParseError every item of that batch is retried
+    with run_one; other errors are passed on to all of the batch's callers.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 run_one: Callable[[Any], Awaitable[Any]], window: float, max_size: int):
+        self._run_batch = run_batch
+        self._run_one = run_one
+        self.window = window
+        self.max_size = max_size
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.items = 0
+        self.batches = 0
+        self.calls = 0
+        self.fallbacks = 0
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self.items += 1
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _one(self, item: Any, future: asyncio.Future) -> None:
+        self.calls += 1
+        try:
+            result = await self._run_one(item)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        # Callers that went away (client disconnects) are dropped from the batch
+        batch = [(item, future) for item, future in batch if not future.done()]
+        if len(batch) <= 1:
+            await asyncio.gather(*(self._one(item, future) for item, future in batch))
+            return
+        self.batches += 1
+        self.calls += 1
+        try:
+            results = await self._run_batch([item for item, _ in batch])
+        except BatchParseError:
+            self.fallbacks += 1
+            await asyncio.gather(*(self._one(item, future) for item, future in batch))
+            return
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_seconds": self.window,
+            "max_size": self.max_size,
+            "items": self.items,
+            "batches": self.batches,
+            "llm_calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "calls_per_item": self.calls / self.items if self.items else 0.0,
+        }
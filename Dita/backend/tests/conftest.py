@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(BACKEND)), "common"))
+
+# main.py opens its store at import time
+os.environ.setdefault("DITA_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="dita-test-"), "debates.db"))
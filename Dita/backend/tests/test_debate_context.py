@@ -0,0 +1,76 @@
+import pytest
+
+import main
+from main import CONTEXT_FULL_TEXT_TOKENS, build_debate_context, context_line, estimate_tokens
+
+
+def chain(depth, text=lambda d: f"opinion {d}"):
+    """Nodes of one debate from the root (depth 0) down to ``depth``."""
+    return [
+        {"id": f"n{d}", "parent_id": f"n{d - 1}" if d else None, "depth": d, "author": f"user{d}",
+         "opinion_type": "claim", "text": text(d), "summary": f"summary {d}"}
+        for d in range(depth + 1)
+    ]
+
+
+def path_to(nodes, limit=main.AVATAR_CONTEXT_MAX_NODES):
+    # As DebateStore.ancestors() returns it: the node first, then its ancestors
+    return list(reversed(nodes))[:limit]
+
+
+def test_short_debate_is_quoted_in_full():
+    nodes = chain(3)
+    context = build_debate_context(path_to(nodes), nodes[0], budget=1000)
+    assert context.splitlines() == [context_line(node, node["text"]) for node in nodes]
+
+
+def test_answering_the_root():
+    nodes = chain(0)
+    assert build_debate_context(path_to(nodes), nodes[0], budget=1000) == context_line(nodes[0], "opinion 0")
+
+
+def test_budget_keeps_root_and_nearest_opinions():
+    nodes = chain(20)
+    line_cost = estimate_tokens(context_line(nodes[5], nodes[5]["text"]))
+    budget = line_cost * 5 # The root and the four nearest opinions
+    lines = build_debate_context(path_to(nodes), nodes[0], budget).splitlines()
+    assert lines[0] == context_line(nodes[0], "opinion 0")
+    assert lines[1] == "... (16 earlier opinions omitted) ..."
+    assert lines[2:] == [context_line(node, node["text"]) for node in nodes[17:]]
+    assert sum(estimate_tokens(line) for line in lines if not line.startswith("...")) <= budget
+
+
+def test_omission_counts_nodes_beyond_the_fetched_path():
+    nodes = chain(100)
+    lines = build_debate_context(path_to(nodes, limit=10), nodes[0], budget=10_000).splitlines()
+    # 10 fetched nodes quoted, the root kept, 90 in between left out
+    assert lines[1] == "... (90 earlier opinions omitted) ..."
+    assert len(lines) == 12
+
+
+def test_long_ancestors_are_quoted_by_summary():
+    long_text = "x" * (4 * CONTEXT_FULL_TEXT_TOKENS + 40)
+    nodes = chain(3, text=lambda d: long_text if d in (0, 1) else f"opinion {d}")
+    lines = build_debate_context(path_to(nodes), nodes[0], budget=10_000).splitlines()
+    assert lines[0] == context_line(nodes[0], "summary 0")
+    assert lines[1] == context_line(nodes[1], "summary 1")
+    assert lines[3] == context_line(nodes[3], "opinion 3")
+
+
+def test_answered_node_uses_its_summary_when_over_budget():
+    nodes = chain(2, text=lambda d: "y" * 4000 if d == 2 else f"opinion {d}")
+    lines = build_debate_context(path_to(nodes), nodes[0], budget=200).splitlines()
+    assert lines[-1] == context_line(nodes[2], "summary 2")
+    assert lines[0] == context_line(nodes[0], "opinion 0")
+
+
+@pytest.mark.parametrize("budget", [1, 50, 300, 3000])
+def test_every_opinion_is_quoted_or_counted(budget):
+    nodes = chain(30)
+    lines = build_debate_context(path_to(nodes), nodes[0], budget).splitlines()
+    assert lines[0] == context_line(nodes[0], "opinion 0")
+    assert lines[-1].startswith("[user30 / claim] ") # The point being answered, at worst by its summary
+    quoted = [line for line in lines[1:] if not line.startswith("...")]
+    notes = [line for line in lines if line.startswith("...")]
+    omitted = 31 - 1 - len(quoted)
+    assert notes == ([f"... ({omitted} earlier opinions omitted) ..."] if omitted else [])
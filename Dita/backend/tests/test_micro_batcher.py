@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from micro_batcher import BatchParseError, MicroBatcher
+
+
+class Backend:
+    def __init__(self, batch_error=None):
+        self.batch_error = batch_error
+        self.batches = []
+        self.singles = []
+
+    async def run_batch(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(0)
+        if self.batch_error is not None:
+            raise self.batch_error
+        return [item * 10 for item in items]
+
+    async def run_one(self, item):
+        self.singles.append(item)
+        await asyncio.sleep(0)
+        return item * 10
+
+
+def submit_all(batcher, items):
+    async def run():
+        return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_concurrent_items_share_one_call():
+    backend = Backend()
+    batcher = MicroBatcher(backend.run_batch, backend.run_one, window=0.01, max_size=16)
+    assert submit_all(batcher, [1, 2, 3]) == [10, 20, 30]
+    assert backend.batches == [[1, 2, 3]] and backend.singles == []
+    assert batcher.stats()["llm_calls"] == 1
+
+
+def test_lone_item_skips_the_batch_prompt():
+    backend = Backend()
+    batcher = MicroBatcher(backend.run_batch, backend.run_one, window=0.01, max_size=16)
+    assert submit_all(batcher, [7]) == [70]
+    assert backend.batches == [] and backend.singles == [7]
+
+
+def test_full_batch_is_sent_at_once():
+    backend = Backend()
+    batcher = MicroBatcher(backend.run_batch, backend.run_one, window=60.0, max_size=2)
+    assert submit_all(batcher, [1, 2, 3, 4]) == [10, 20, 30, 40]
+    assert backend.batches == [[1, 2], [3, 4]]
+
+
+def test_parse_error_falls_back_to_single_calls():
+    backend = Backend(batch_error=BatchParseError("3 analyses for 2 opinions"))
+    batcher = MicroBatcher(backend.run_batch, backend.run_one, window=0.01, max_size=16)
+    assert submit_all(batcher, [1, 2]) == [10, 20]
+    assert backend.batches == [[1, 2]] and sorted(backend.singles) == [1, 2]
+    stats = batcher.stats()
+    assert stats["fallbacks"] == 1 and stats["llm_calls"] == 3
+
+
+def test_other_errors_reach_every_caller():
+    backend = Backend(batch_error=ConnectionError("LLM server down"))
+    batcher = MicroBatcher(backend.run_batch, backend.run_one, window=0.01, max_size=16)
+    results = submit_all(batcher, [1, 2])
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert backend.singles == [] and batcher.stats()["fallbacks"] == 0
+
+
+def test_single_call_errors_are_per_item():
+    backend = Backend(batch_error=BatchParseError("unparseable"))
+
+    async def run_one(item):
+        if item == 2:
+            raise ValueError("bad analysis")
+        return item * 10
+
+    batcher = MicroBatcher(backend.run_batch, run_one, window=0.01, max_size=16)
+    first, second = submit_all(batcher, [1, 2])
+    assert first == 10
+    with pytest.raises(ValueError):
+        raise second
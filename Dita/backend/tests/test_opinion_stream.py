@@ -0,0 +1,129 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+ANALYSIS = {"opinion_type": "反論", "summary": "炭素税は\n\"逆進的\"だ", "spectrum_scores": {"emotion": 40, "logic": 70}}
+
+
+def sse(text):
+    """[(event, data)] of a Server-Sent Events body."""
+    events = []
+    for block in text.split("\n\n"):
+        if block:
+            event, data = block.split("\n", 1)
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class FakeDeltas:
+    """Stands in for llm_gateway.stream_deltas, yielding ``deltas`` then raising ``error`` if given."""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.payloads = []
+
+    async def __call__(self, payload, url=None):
+        self.payloads.append(payload)
+        for delta in self.deltas:
+            yield delta
+        if self.error is not None:
+            raise self.error
+
+
+def chunked(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def client():
+    # No lifespan: stream_deltas is replaced, so the gateway is never opened
+    return TestClient(main.app)
+
+
+def stream(client, monkeypatch, path, body, fake):
+    monkeypatch.setattr(main.llm_gateway, "stream_deltas", fake)
+    response = client.post(path, json=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return sse(response.text)
+
+
+def check_events(events):
+    """Check the delta and field events against ANALYSIS and return the final event."""
+    summary = "".join(data["text"] for event, data in events if event == "delta" and data["field"] == "summary")
+    assert summary == ANALYSIS["summary"]
+    fields = [(data["field"], data["value"]) for event, data in events if event == "field"]
+    assert fields == list(ANALYSIS.items())
+    # The opinion or error event comes last
+    assert [event for event, _ in events][-1] not in ("delta", "field")
+    return events[-1]
+
+
+def test_analyze_opinion_stream(client, monkeypatch):
+    fake = FakeDeltas(chunked(json.dumps(ANALYSIS, ensure_ascii=False)))
+    events = stream(client, monkeypatch, "/analyze-opinion/stream", {"text": "炭素税は貧困層に不利だ"}, fake)
+    event, node = check_events(events)
+    assert event == "opinion"
+    assert node["text"] == "炭素税は貧困層に不利だ" and node["summary"] == ANALYSIS["summary"]
+    assert node["parent_node"] is None
+    assert client.get(f"/nodes/{node['id']}").json()["spectrum_scores"] == ANALYSIS["spectrum_scores"]
+    assert fake.payloads[0]["messages"][-1]["content"] == "炭素税は貧困層に不利だ"
+
+
+def test_invoke_avatar_stream(client, monkeypatch):
+    fake = FakeDeltas(chunked(json.dumps(ANALYSIS, ensure_ascii=False)))
+    parent = stream(client, monkeypatch, "/analyze-opinion/stream", {"text": "炭素税を導入すべきだ"}, fake)[-1][1]
+    events = stream(client, monkeypatch, "/invoke-avatar/stream", {"name": "ソクラテス", "parent_node": parent["id"]}, fake)
+    event, node = check_events(events)
+    assert event == "opinion"
+    # The avatar's words are its summary
+    assert node["text"] == ANALYSIS["summary"] and node["author"] == "ソクラテス"
+    assert node["parent_node"] == parent["id"]
+    assert "炭素税を導入すべきだ" in fake.payloads[-1]["messages"][-1]["content"]
+
+
+def test_unknown_parent(client, monkeypatch):
+    fake = FakeDeltas([])
+    monkeypatch.setattr(main.llm_gateway, "stream_deltas", fake)
+    response = client.post("/analyze-opinion/stream", json={"text": "x", "parent_node": "missing"})
+    assert response.status_code == 404
+    assert fake.payloads == []
+
+
+def test_unfinished_json(client, monkeypatch):
+    fake = FakeDeltas(['{"opinion_type": "反論", "summary": "途中'])
+    events = stream(client, monkeypatch, "/analyze-opinion/stream", {"text": "x"}, fake)
+    assert events[:3] == [
+        ("delta", {"field": "opinion_type", "text": "反論"}),
+        ("delta", {"field": "summary", "text": "途中"}),
+        ("field", {"field": "opinion_type", "value": "反論"}),
+    ]
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 500
+
+
+def test_missing_key(client, monkeypatch):
+    fake = FakeDeltas([json.dumps({"opinion_type": "反論", "summary": "x"})])
+    events = stream(client, monkeypatch, "/invoke-avatar/stream", {"name": "ソクラテス"}, fake)
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 500
+    assert "spectrum_scores" in events[-1][1]["detail"]
+
+
+def test_malformed_upstream_chunk(client, monkeypatch):
+    fake = FakeDeltas(['{"summary": "a'], json.JSONDecodeError("Expecting value", "data: {", 6))
+    events = stream(client, monkeypatch, "/analyze-opinion/stream", {"text": "x"}, fake)
+    assert events == [("delta", {"field": "summary", "text": "a"}),
+                      ("error", {"status": 500, "detail": "Failed to parse LLM stream: Expecting value: line 1 column 7 (char 6)"})]
+
+
+@pytest.mark.parametrize("error, status", [
+    (httpx.ConnectError("connection refused"), 503),
+    (httpx.HTTPStatusError("busy", request=httpx.Request("POST", "http://llm.test"), response=httpx.Response(429)), 502),
+])
+def test_upstream_failure(client, monkeypatch, error, status):
+    events = stream(client, monkeypatch, "/analyze-opinion/stream", {"text": "x"}, FakeDeltas([], error))
+    assert [(event, data["status"]) for event, data in events] == [("error", status)]
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from debate_arrays import DebateArrays
+from debate_store import SPECTRUM_METRICS, DebateStore
+
+
+def random_score(rng):
+    # Mostly valid, plus the values aggregate_deltas() has to leave out
+    return rng.choice([rng.uniform(0, 100), rng.randint(0, 100), 100, 0, -5, 150, None, True, "high"])
+
+
+@pytest.fixture
+def debate(tmp_path):
+    rng = random.Random(42)
+    store = DebateStore(str(tmp_path / "debates.db"))
+    ids = []
+    for i in range(300):
+        parent = None if not ids else rng.choice(ids[-20:] if rng.random() < 0.7 else ids)
+        scores = {metric: random_score(rng) for metric in SPECTRUM_METRICS if rng.random() < 0.9}
+        store.add_node({
+            "id": f"n{i}", "parent_node": parent, "author": None, "text": f"opinion {i}", "summary": "",
+            "opinion_type": rng.choice(["claim", "rebuttal", "question"]),
+            "spectrum_scores": scores if rng.random() < 0.95 else "unscored",
+        })
+        ids.append(f"n{i}")
+    return store
+
+
+def stored_stats(store):
+    stats = {}
+    for node_id, key, value in store._conn().execute("SELECT node_id, key, value FROM subtree_stats"):
+        stats.setdefault(node_id, {})[key] = value
+    return stats
+
+
+def assert_same(actual, expected):
+    # A missing key reads as 0 (format_aggregates), e.g. the sum of scores that were all 0
+    nonzero = lambda values: {key: value for key, value in values.items() if value}
+    assert actual.keys() == expected.keys()
+    for node_id, values in expected.items():
+        assert nonzero(actual[node_id]) == pytest.approx(nonzero(values)), node_id
+
+
+def test_incremental_stats_match_bulk_totals(debate):
+    totals = DebateArrays(debate.debate_nodes("n0")).subtree_totals()
+    assert totals["n0"]["nodes"] == 300
+    assert_same(stored_stats(debate), totals)
+
+
+def test_rebuild_changes_nothing(debate):
+    before = stored_stats(debate)
+    assert debate.rebuild_aggregates("n0", lambda nodes: DebateArrays(nodes).subtree_totals()) == 300
+    assert_same(stored_stats(debate), before)
+
+
+def test_aggregates_response(debate):
+    aggregates = debate.subtree_aggregates("n0")
+    assert aggregates["nodes"] == 300
+    assert sum(aggregates["opinion_types"].values()) == 300
+    for metric in SPECTRUM_METRICS:
+        spectrum = aggregates["spectrum"][metric]
+        assert sum(spectrum["histogram"]) == spectrum["count"]
+        assert spectrum["mean"] is None or 0 <= spectrum["mean"] <= 100
+    assert debate.subtree_aggregates("missing") is None
@@ -0,0 +1,91 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+TRANSCRIPT = [
+    {"id": "a", "text": "We should tax carbon."},
+    {"id": "b", "text": "It hurts the poor.", "parent": "a"},
+    {"id": "c", "text": "Rebate the revenue.", "parent": "b"},
+    {"id": "d", "text": "Markets adapt.", "parent": "a"},
+    {"id": "e", "text": "Not fast enough.", "parent": "d"},
+    {"id": "f", "text": "Nuclear instead?"},
+]
+
+
+class FakeAnalyze:
+    """Stands in for main.analyze; LM Studio goes away after ``reachable`` calls."""
+
+    def __init__(self, reachable=None):
+        self.reachable = reachable
+        self.texts = []
+
+    async def __call__(self, text):
+        if self.reachable is not None and len(self.texts) >= self.reachable:
+            raise httpx.ConnectError("connection refused")
+        self.texts.append(text)
+        return {"opinion_type": "claim", "summary": text[:10], "spectrum_scores": {"emotion": 50}}
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the fake analyze never reaches the LLM gateway
+    return TestClient(main.app)
+
+
+def post(client, import_id=None):
+    body = "".join(json.dumps(entry) + "\n" for entry in TRANSCRIPT)
+    response = client.post("/transcripts/import", params={"import_id": import_id} if import_id else None, content=body)
+    assert response.status_code == 200
+    *results, summary = [json.loads(line) for line in response.text.splitlines()]
+    return response.headers["X-Import-Id"], results, summary["summary"]
+
+
+def test_interrupted_import_resumes(client, monkeypatch):
+    fake = FakeAnalyze(reachable=3)
+    monkeypatch.setattr(main, "analyze", fake)
+    import_id, results, summary = post(client)
+    assert summary["status"] == "interrupted"
+    assert "LM Studio" in summary["detail"]
+    assert [r["id"] for r in results] == ["a", "b", "c"]
+    assert all(r["status"] == "stored" for r in results)
+    first_run = {r["id"]: r["node_id"] for r in results}
+    progress = client.get(f"/transcripts/import/{import_id}").json()
+    assert progress["status"] == "interrupted" and progress["stored"] == 3 and progress["entries"] == len(TRANSCRIPT)
+
+    fake = FakeAnalyze()
+    monkeypatch.setattr(main, "analyze", fake)
+    resumed_id, results, summary = post(client, import_id)
+    assert resumed_id == import_id
+    assert summary["status"] == "done"
+    assert (summary["stored"], summary["skipped"], summary["failed"]) == (3, 3, 0)
+    # Stored entries are neither analyzed nor stored again
+    assert fake.texts == [entry["text"] for entry in TRANSCRIPT[3:]]
+    assert [(r["id"], r["status"]) for r in results] == [
+        ("a", "skipped"), ("b", "skipped"), ("c", "skipped"), ("d", "stored"), ("e", "stored"), ("f", "stored"),
+    ]
+    node_ids = {r["id"]: r["node_id"] for r in results}
+    assert {entry: node_ids[entry] for entry in first_run} == first_run
+    # Entries stored by the second run link to nodes from either run
+    parents = {r["id"]: r["node"]["parent_node"] for r in results if r["status"] == "stored"}
+    assert parents == {"d": node_ids["a"], "e": node_ids["d"], "f": None}
+    progress = client.get(f"/transcripts/import/{import_id}").json()
+    assert progress["status"] == "done" and progress["stored"] == len(TRANSCRIPT)
+
+
+def test_finished_import_is_not_repeated(client, monkeypatch):
+    monkeypatch.setattr(main, "analyze", FakeAnalyze())
+    import_id, _, summary = post(client)
+    assert summary["status"] == "done"
+    fake = FakeAnalyze()
+    monkeypatch.setattr(main, "analyze", fake)
+    _, results, summary = post(client, import_id)
+    assert fake.texts == []
+    assert summary["skipped"] == len(TRANSCRIPT) and summary["stored"] == 0
+
+
+def test_unknown_import(client):
+    assert client.get("/transcripts/import/missing").status_code == 404
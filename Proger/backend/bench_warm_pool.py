@@ -0,0 +1,111 @@
+"""Compare python3 test-case latency: cold start vs. the warm interpreter pool.
+
+Usage: python bench_warm_pool.py [--cases 100] [--rounds 3]
+
+Judges one small submission against a synthetic problem with --cases test
+cases three ways and prints per-test-case wall time (p50/p95) and total
+submission time:
+
+  subprocess  plain subprocess.run([python3, main.py]) per case, no sandbox
+  cold        execute_code_in_sandbox() with the warm pool stopped
+  warm        execute_code_in_sandbox() after start_python_pool()
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import shutil
+import tempfile
+import time
+
+import sandbox
+
+# Imports a few of the usual modules, like typical submissions do
+CODE = """\
+import sys
+from collections import Counter
+import heapq, bisect, math
+
+data = sys.stdin.read().split()
+n = int(data[0])
+nums = list(map(int, data[1:1 + n]))
+print(sum(nums), max(Counter(nums).values()))
+"""
+
+
+def make_cases(count: int):
+    cases = []
+    for i in range(count):
+        nums = [(i * 7 + j * 13) % 50 for j in range(100)]
+        counts = {}
+        for x in nums:
+            counts[x] = counts.get(x, 0) + 1
+        cases.append({
+            "input": f"{len(nums)}\n{' '.join(map(str, nums))}\n",
+            "output": f"{sum(nums)} {max(counts.values())}\n",
+        })
+    return cases
+
+
+def bench_subprocess(cases):
+    python = shutil.which(sandbox.PYTHON_COMMAND)
+    latencies = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, "main.py"), "w") as f:
+            f.write(CODE)
+        start = time.perf_counter()
+        for case in cases:
+            t0 = time.perf_counter()
+            out = subprocess.run([python, "main.py"], cwd=work_dir, input=case["input"].encode(),
+                                 capture_output=True, check=True).stdout.decode()
+            latencies.append(time.perf_counter() - t0)
+            assert out == case["output"], out
+        total = time.perf_counter() - start
+    return latencies, total
+
+
+async def bench_sandbox(cases):
+    start = time.perf_counter()
+    result = await sandbox.execute_code_in_sandbox("python3", CODE, cases)
+    total = time.perf_counter() - start
+    assert result["verdict"] == "AC", result["error"] or result["verdict"]
+    return [r["wall_time"] for r in result["details"]], total
+
+
+def report(name, latencies, totals):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<11} p50 {statistics.median(latencies) * 1000:7.2f}ms  p95 {p95 * 1000:7.2f}ms  "
+          f"submission {statistics.median(totals):6.3f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = make_cases(args.cases)
+    print(f"{args.cases} test cases, {args.rounds} rounds, {sandbox.SANDBOX_WORKERS} sandbox workers, "
+          f"pool size {sandbox.PYTHON_POOL_SIZE}")
+
+    runs = [bench_subprocess(cases) for _ in range(args.rounds)]
+    report("subprocess", [l for lat, _ in runs for l in lat], [t for _, t in runs])
+
+    runs = [await bench_sandbox(cases) for _ in range(args.rounds)]
+    report("cold", [l for lat, _ in runs for l in lat], [t for _, t in runs])
+
+    if sandbox.start_python_pool() == 0:
+        print("warm pool unavailable (SANDBOX_PYTHON_POOL_SIZE=0 or no interpreter)")
+        return
+    try:
+        await bench_sandbox(cases[:1]) # Let the zygotes finish their imports
+        runs = [await bench_sandbox(cases) for _ in range(args.rounds)]
+        report("warm", [l for lat, _ in runs for l in lat], [t for _, t in runs])
+    finally:
+        sandbox.stop_python_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+COMPILE_ERROR_FILE = "compile_error.txt"
+
+
+@lru_cache(maxsize=None)
+def toolchain_version(compiler: str) -> str:
+    """First line of ``<compiler> --version``; part of the cache key so upgrades invalidate entries."""
+    try:
+        out = subprocess.run([compiler, "--version"], capture_output=True, timeout=30).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return "unknown"
+    return out.decode(errors="replace").strip().splitlines()[0] if out.strip() else "unknown"
+
+
+def cache_key(language: str, version: str, flags: List[str], source: str) -> str:
+    h = hashlib.sha256()
+    for part in (language, version, "\0".join(flags), source):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class CompileCache:
+    """Content-addressed on-disk cache of compiler outputs.
+
+    Each entry is a directory named by cache_key() holding the artifacts of a
+    successful build, or COMPILE_ERROR_FILE for a failed one so identical
+    resubmissions don't recompile to the same error. Entries are published
+    with an atomic rename, so several backend processes can share the
+    directory. A hit bumps the entry's mtime; when the total size exceeds
+    ``max_bytes`` the least recently used entries are removed.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, mode=0o755, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            os.utime(path) # LRU stamp
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def compile_error(self, entry: str) -> Optional[str]:
+        try:
+            with open(os.path.join(entry, COMPILE_ERROR_FILE), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def install(self, entry: str, artifacts: List[str], work_dir: str) -> bool:
+        """Link a cached build into ``work_dir``.
+
+        Returns False, installing nothing, when another process evicted the
+        entry since lookup(); the caller treats that as a miss and rebuilds.
+        Once linked, the files survive the entry's eviction.
+        """
+        installed = []
+        try:
+            for name in artifacts:
+                # Hard links are free; the cached files are root/owner-owned and read-only
+                src, dst = os.path.join(entry, name), os.path.join(work_dir, name)
+                try:
+                    os.link(src, dst)
+                except FileNotFoundError:
+                    raise
+                except OSError: # e.g. another filesystem
+                    shutil.copy2(src, dst)
+                installed.append(dst)
+        except FileNotFoundError:
+            for dst in installed:
+                os.unlink(dst)
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+            return False
+        return True
+
+    def store(self, key: str, build_dir: str, artifacts: List[str], compile_error: Optional[str] = None) -> None:
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        try:
+            if compile_error is not None:
+                with open(os.path.join(staging, COMPILE_ERROR_FILE), "w", encoding="utf-8") as f:
+                    f.write(compile_error)
+            else:
+                for name in artifacts:
+                    dst = os.path.join(staging, name)
+                    shutil.copyfile(os.path.join(build_dir, name), dst)
+                    os.chmod(dst, 0o555)
+            os.chmod(staging, 0o755)
+            try:
+                os.rename(staging, self._path(key))
+            except OSError:
+                return # Another process published the same key first
+            staging = None
+            with self._lock:
+                self.stores += 1
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            path = self._path(name)
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path))
+                entries.append((os.stat(path).st_mtime, size, path))
+            except FileNotFoundError:
+                continue # Evicted concurrently
+        return entries
+
+    def evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
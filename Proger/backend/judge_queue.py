@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# publish(event, data) as passed to the judge function
+Publish = Callable[[str, Dict[str, Any]], None]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JudgeQueue:
+    """Bounded priority queue of submissions served by background judge workers.
+
+    submit() queues a submission record (a dict with an "id", created by
+    the caller) and returns at once; ``workers`` tasks take records off the
+    queue (lowest priority value first, FIFO within a priority) and hand
+    them to ``judge(record, publish)``. Events the judge publishes are passed
+    to ``on_event(record, event, data)`` (persistence) and fanned out to
+    subscribe()rs, which is what the SSE endpoint streams. With
+    ``max_depth`` submissions already waiting, submit() raises
+    QueueFullError instead of queueing more. Records are only held here
+    while they are queued or being judged.
+
+    The judge may return an awaitable follow-up (the LLM review): the worker
+    moves on to the next submission and the record is only marked done once
+    the follow-up has finished.
+    """
+
+    def __init__(self, judge: Callable[[Dict[str, Any], Publish], Awaitable[Optional[Awaitable[None]]]],
+                 workers: int, max_depth: int,
+                 on_event: Optional[Callable[[Dict[str, Any], str, Dict[str, Any]], None]] = None):
+        self._judge = judge
+        self._workers = workers
+        self._on_event = on_event
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, int]]" = asyncio.PriorityQueue(maxsize=max_depth)
+        self._order = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._followups: Set[asyncio.Task] = set()
+        self._subscribers: Dict[int, List[asyncio.Queue]] = {}
+        # Queued and in-progress records only: _finish() drops each record, so
+        # this never holds more than max_depth + workers + pending follow-ups
+        self.submissions: Dict[int, Dict[str, Any]] = {}
+        self.running = 0
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+
+    async def stop(self) -> None:
+        tasks = [*self._tasks, *self._followups]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self.submissions.clear() # Unfinished records are picked up from the store on restart
+
+    def full(self) -> bool:
+        return self._queue.full()
+
+    def submit(self, record: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        if self._queue.full():
+            raise QueueFullError(f"Judge queue is full ({self._queue.maxsize} submissions waiting)")
+        record.update(status="queued", priority=priority, finished_at=None, test_results=[])
+        record.setdefault("created_at", time.time())
+        self.submissions[record["id"]] = record
+        self._queue.put_nowait((priority, next(self._order), record["id"]))
+        return record
+
+    def get(self, submission_id: int) -> Optional[Dict[str, Any]]:
+        return self.submissions.get(submission_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"queued": self._queue.qsize(), "max_depth": self._queue.maxsize, "running": self.running,
+                "workers": self._workers, "following_up": len(self._followups), "tracked": len(self.submissions)}
+
+    def _publish(self, submission_id: int, event: str, data: Dict[str, Any]) -> None:
+        if self._on_event is not None:
+            self._on_event(self.submissions[submission_id], event, data)
+        for subscriber in self._subscribers.get(submission_id, []):
+            subscriber.put_nowait((event, data))
+
+    async def subscribe(self, submission_id: int) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield a "snapshot" of the record, then its live events until "done".
+
+        Yields nothing when the submission isn't queued or being judged here.
+        """
+        record = self.submissions.get(submission_id)
+        if record is None:
+            return
+        yield "snapshot", record
+        if record["finished_at"] is not None:
+            return
+        events: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(submission_id, []).append(events)
+        try:
+            while True:
+                event, data = await events.get()
+                yield event, data
+                if event == "done":
+                    return
+        finally:
+            subscribers = self._subscribers[submission_id]
+            subscribers.remove(events)
+            if not subscribers:
+                del self._subscribers[submission_id]
+
+    def _set_status(self, record: Dict[str, Any], status: str) -> None:
+        record["status"] = status
+        self._publish(record["id"], "status", {"status": status})
+
+    def _publisher(self, record: Dict[str, Any]) -> Publish:
+        def publish(event: str, data: Dict[str, Any]) -> None:
+            if event == "status":
+                self._set_status(record, data["status"])
+            else:
+                self._publish(record["id"], event, data)
+        return publish
+
+    def _fail(self, record: Dict[str, Any], error: Exception) -> None:
+        record["error"] = f"Judge failed: {error}"
+        self._set_status(record, "failed")
+
+    def _finish(self, record: Dict[str, Any]) -> None:
+        try:
+            if record["status"] != "failed":
+                self._set_status(record, "done")
+            record["finished_at"] = time.time()
+            self._publish(record["id"], "done", {"status": record["status"]})
+        finally:
+            # Finished records are served from the store; a failing publish must not leak them
+            self.submissions.pop(record["id"], None)
+
+    async def _follow_up(self, record: Dict[str, Any], followup: Awaitable[None]) -> None:
+        try:
+            await followup
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(record, e)
+        self._finish(record)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, submission_id = await self._queue.get()
+            record = self.submissions[submission_id]
+            followup = None
+            self.running += 1
+            try:
+                self._set_status(record, "judging")
+                followup = await self._judge(record, self._publisher(record))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._fail(record, e)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+            if followup is None:
+                self._finish(record)
+            else:
+                task = asyncio.create_task(self._follow_up(record, followup))
+                self._followups.add(task)
+                task.add_done_callback(self._followups.discard)
@@ -0,0 +1,325 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Submission statuses after which nothing changes any more
+FINAL_STATUSES = ("done", "failed")
+
+PROBLEM_FIELDS = ("title", "description", "input_format", "output_format", "sample_input", "sample_output",
+                  "float_tolerance")
+# Submission columns holding JSON documents
+_JSON_FIELDS = ("execution", "review", "trace")
+
+
+class JudgeStore:
+    """SQLite-backed storage for problems, submissions and per-test results.
+
+    The database runs in WAL mode so several uvicorn workers can share it:
+    readers never block, writers are serialized by BEGIN IMMEDIATE, and
+    INTEGER PRIMARY KEY AUTOINCREMENT ids are unique across processes. Every
+    submission row records the pid of the worker that judges it (``owner``),
+    which lets a restarted backend pick up submissions whose worker died.
+
+    Calls block on disk I/O; async endpoints should go through
+    ``run_in_threadpool``. Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS problems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                input_format TEXT NOT NULL,
+                output_format TEXT NOT NULL,
+                sample_input TEXT NOT NULL,
+                sample_output TEXT NOT NULL,
+                float_tolerance REAL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                problem_id INTEGER NOT NULL REFERENCES problems (id),
+                language TEXT NOT NULL,
+                code TEXT NOT NULL,
+                code_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                owner INTEGER,
+                verdict TEXT,
+                execution TEXT,
+                review TEXT,
+                error TEXT,
+                trace TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS submissions_problem ON submissions (problem_id, id);
+            CREATE INDEX IF NOT EXISTS submissions_status ON submissions (status);
+            CREATE TABLE IF NOT EXISTS test_results (
+                submission_id INTEGER NOT NULL REFERENCES submissions (id),
+                test_case_id INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (submission_id, test_case_id)
+            );
+            CREATE TABLE IF NOT EXISTS rejudges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                problem_id INTEGER,
+                status TEXT NOT NULL,
+                submissions INTEGER NOT NULL,
+                programs INTEGER NOT NULL,
+                programs_done INTEGER NOT NULL DEFAULT 0,
+                submissions_done INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS rejudge_changes (
+                rejudge_id INTEGER NOT NULL REFERENCES rejudges (id),
+                submission_id INTEGER NOT NULL,
+                old_verdict TEXT,
+                new_verdict TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rejudge_changes_rejudge ON rejudge_changes (rejudge_id);
+        """)
+        # Databases created before per-submission traces existed
+        columns = {row["name"] for row in self._conn().execute("PRAGMA table_info(submissions)")}
+        if "trace" not in columns:
+            self._conn().execute("ALTER TABLE submissions ADD COLUMN trace TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly in _transaction()
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, serializing writers across processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --- Problems ---
+
+    def create_problem(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"INSERT INTO problems ({', '.join(PROBLEM_FIELDS)}, created_at) VALUES ({', '.join('?' * (len(PROBLEM_FIELDS) + 1))})",
+                [fields.get(name) for name in PROBLEM_FIELDS] + [time.time()],
+            )
+        return self.get_problem(cur.lastrowid)
+
+    def get_problem(self, problem_id: int) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM problems WHERE id = ?", (problem_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_problems(self) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._conn().execute("SELECT * FROM problems ORDER BY id")]
+
+    # --- Submissions ---
+
+    @staticmethod
+    def _submission(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for name in _JSON_FIELDS:
+            if record[name] is not None:
+                record[name] = json.loads(record[name])
+        return record
+
+    def create_submission(self, fields: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO submissions (problem_id, language, code, code_hash, status, priority, owner, created_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (fields["problem_id"], fields["language"], fields["code"], fields["code_hash"],
+                 priority, os.getpid(), time.time()),
+            )
+        return self.get_submission(cur.lastrowid)
+
+    def update_submission(self, submission_id: int, fields: Dict[str, Any]) -> None:
+        if not fields:
+            return
+        values = [json.dumps(v, ensure_ascii=False) if k in _JSON_FIELDS and v is not None else v
+                  for k, v in fields.items()]
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE submissions SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                values + [submission_id],
+            )
+
+    def add_test_result(self, submission_id: int, result: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO test_results (submission_id, test_case_id, result) VALUES (?, ?, ?)",
+                (submission_id, result["test_case_id"], json.dumps(result, ensure_ascii=False)),
+            )
+
+    def delete_submission(self, submission_id: int) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM test_results WHERE submission_id = ?", (submission_id,))
+            conn.execute("DELETE FROM submissions WHERE id = ?", (submission_id,))
+
+    def get_submission(self, submission_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+        if row is None:
+            return None
+        record = self._submission(row)
+        record["test_results"] = [
+            json.loads(r[0]) for r in conn.execute(
+                "SELECT result FROM test_results WHERE submission_id = ? ORDER BY test_case_id", (submission_id,)
+            )
+        ]
+        return record
+
+    def list_submissions(
+        self, problem_id: Optional[int] = None, verdict: Optional[str] = None,
+        before_id: Optional[int] = None, limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Newest first, without code or per-test results; page with ``before_id``."""
+        clauses, params = [], []
+        for clause, value in (("problem_id = ?", problem_id), ("verdict = ?", verdict), ("id < ?", before_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            "SELECT id, problem_id, language, code_hash, status, priority, verdict, error, created_at, finished_at"
+            f" FROM submissions {where} ORDER BY id DESC LIMIT ?",
+            params + [limit],
+        )
+        return [dict(row) for row in rows]
+
+    def verdict_counts(self, problem_id: int) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT COALESCE(verdict, status), COUNT(*) FROM submissions WHERE problem_id = ? GROUP BY 1",
+            (problem_id,),
+        )
+        return {key: count for key, count in rows}
+
+    # --- Rejudges ---
+
+    def finished_submissions(
+        self, problem_id: Optional[int] = None, submission_ids: Optional[List[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """Finished submissions to rejudge: by problem, by id, or both (ids within the problem)."""
+        clauses = [f"status IN ({', '.join('?' * len(FINAL_STATUSES))})"]
+        params: List[Any] = list(FINAL_STATUSES)
+        if problem_id is not None:
+            clauses.append("problem_id = ?")
+            params.append(problem_id)
+        if submission_ids is not None:
+            clauses.append("id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(submission_ids))
+        rows = self._conn().execute(
+            f"SELECT id, problem_id, language, code, verdict FROM submissions WHERE {' AND '.join(clauses)} ORDER BY id",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def create_rejudge(self, problem_id: Optional[int], submissions: int, programs: int) -> Dict[str, Any]:
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "INSERT INTO rejudges (problem_id, status, submissions, programs, created_at) VALUES (?, 'running', ?, ?, ?)",
+                (problem_id, submissions, programs, time.time()),
+            )
+        return self.get_rejudge(cur.lastrowid)
+
+    def update_rejudge(self, rejudge_id: int, fields: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                f"UPDATE rejudges SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                list(fields.values()) + [rejudge_id],
+            )
+
+    def apply_rejudge(
+        self, rejudge_id: int, members: List[Dict[str, Any]], verdict: str,
+        execution: Dict[str, Any], test_results: List[Dict[str, Any]],
+    ) -> None:
+        """Fan one program's new result out to every submission in ``members`` (id, verdict) and log changes."""
+        execution_json = json.dumps(execution, ensure_ascii=False)
+        results = [(r["test_case_id"], json.dumps(r, ensure_ascii=False)) for r in test_results]
+        with self._transaction() as conn:
+            for member in members:
+                conn.execute("UPDATE submissions SET verdict = ?, execution = ? WHERE id = ?",
+                             (verdict, execution_json, member["id"]))
+                conn.execute("DELETE FROM test_results WHERE submission_id = ?", (member["id"],))
+                conn.executemany(
+                    "INSERT INTO test_results (submission_id, test_case_id, result) VALUES (?, ?, ?)",
+                    [(member["id"], test_case_id, result) for test_case_id, result in results],
+                )
+            conn.executemany(
+                "INSERT INTO rejudge_changes (rejudge_id, submission_id, old_verdict, new_verdict) VALUES (?, ?, ?, ?)",
+                [(rejudge_id, m["id"], m["verdict"], verdict) for m in members if m["verdict"] != verdict],
+            )
+            conn.execute(
+                "UPDATE rejudges SET programs_done = programs_done + 1, submissions_done = submissions_done + ? WHERE id = ?",
+                (len(members), rejudge_id),
+            )
+
+    def get_rejudge(self, rejudge_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM rejudges WHERE id = ?", (rejudge_id,)).fetchone()
+        if row is None:
+            return None
+        rejudge = dict(row)
+        changes = [dict(r) for r in conn.execute(
+            "SELECT submission_id, old_verdict, new_verdict FROM rejudge_changes WHERE rejudge_id = ? ORDER BY submission_id",
+            (rejudge_id,),
+        )]
+        transitions: Dict[str, int] = {}
+        for change in changes:
+            key = f"{change['old_verdict']}->{change['new_verdict']}"
+            transitions[key] = transitions.get(key, 0) + 1
+        rejudge["changed"] = len(changes)
+        rejudge["transitions"] = transitions
+        rejudge["changes"] = changes
+        return rejudge
+
+    def claim_orphans(self) -> List[Dict[str, Any]]:
+        """Take over unfinished submissions whose owning worker process is gone.
+
+        A submission whose owner pid is our own is stale too: this process
+        has only just started. The claim happens in one write transaction, so
+        two workers starting together don't both take the same submission.
+        """
+        me = os.getpid()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                f"SELECT id, owner FROM submissions WHERE status NOT IN ({', '.join('?' * len(FINAL_STATUSES))})",
+                FINAL_STATUSES,
+            ).fetchall()
+            orphans = [row["id"] for row in rows if row["owner"] == me or not _alive(row["owner"])]
+            for submission_id in orphans:
+                conn.execute("UPDATE submissions SET owner = ?, status = 'queued' WHERE id = ?", (me, submission_id))
+                conn.execute("DELETE FROM test_results WHERE submission_id = ?", (submission_id,))
+        return [self.get_submission(submission_id) for submission_id in orphans]
+
+
+def _alive(pid: Optional[int]) -> bool:
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True # Exists, owned by someone else
+    return True
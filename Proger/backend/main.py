@@ -1,12 +1,101 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import httpx
 import json
 import re
+from contextlib import asynccontextmanager
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from sandbox import check_network_isolation, execute_code_in_sandbox, compile_cache, start_python_pool, stop_python_pool
+from judge_queue import JudgeQueue, QueueFullError
+from judge_store import FINAL_STATUSES, JudgeStore
+from rejudge import Rejudger
+from testcase_store import KINDS, TestCaseStore
+import asyncio
+import hashlib
+import logging
+import metrics
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+# Modules shared by the backends live in <repo>/common (/common in the Docker image)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "common"))
+from llm_gateway import LLMGateway
+from generation_cache import GenerationCache
 
-app = FastAPI()
+logger = logging.getLogger("proger")
+
+# --- LLM configuration ---
+LLM_API_URL = os.getenv("LLM_API_URL", "http://localhost:1234/v1/chat/completions") # Default LM Studio endpoint
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5.0"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "30.0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4")) # In-flight LLM calls per process
+
+# Problems and submission history; SQLite in WAL mode, shared by all uvicorn workers
+JUDGE_DB_PATH = os.getenv("JUDGE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "proger.db"))
+judge_store = JudgeStore(JUDGE_DB_PATH)
+# Judge progress is written by this single thread, so a submission's updates land in order
+_store_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="judge-store")
+SUBMISSIONS_PAGE_SIZE = 50
+SUBMISSION_POLL_INTERVAL = 0.5 # Seconds, for streams of submissions judged by another worker
+
+# Test case files live here, one directory per problem
+TESTCASE_DIR = os.getenv("TESTCASE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata"))
+testcase_store = TestCaseStore(TESTCASE_DIR)
+MAX_TEST_FILE_BYTES = int(os.getenv("MAX_TEST_FILE_BYTES", str(256 * 1024 * 1024)))
+
+# Reviews keyed on (problem id, normalized code hash); 0 entries disables the cache
+review_cache = GenerationCache(
+    max_entries=int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("REVIEW_CACHE_TTL", "86400")),
+)
+
+# Keep-alive pool, concurrency cap, retries and circuit breaker for the LLM server; opened in lifespan().
+llm_gateway = LLMGateway(LLM_API_URL, LLM_MAX_CONCURRENCY, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+
+# --- Judge queue configuration ---
+JUDGE_WORKERS = int(os.getenv("JUDGE_WORKERS", "4")) # Submissions judged at once (test cases share the sandbox pool)
+JUDGE_QUEUE_MAX_DEPTH = int(os.getenv("JUDGE_QUEUE_MAX_DEPTH", "1000")) # Waiting submissions before /submit returns 503
+JUDGE_RETRY_AFTER = 5 # Seconds, sent with 503 when the queue is full
+# Queue depth and judge workers are per uvicorn worker process
+LIVE_PRIORITY = 0 # Sandbox priority of submissions; lower values get sandbox slots first
+
+# Bulk rejudges: distinct programs judged at once, behind live submissions in the sandbox
+REJUDGE_CONCURRENCY = int(os.getenv("REJUDGE_CONCURRENCY", "2"))
+REJUDGE_PRIORITY = 10
+
+# Per-submission stage traces requested with /submit?trace=true, while the submission is judged here
+_traces: Dict[int, metrics.Trace] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Refuse to start rather than answer every submission with IE
+    await run_in_threadpool(check_network_isolation)
+    await llm_gateway.start()
+    # Warm Python interpreters are forked up front so the first submission doesn't pay for them
+    await run_in_threadpool(start_python_pool)
+    judge_queue.start()
+    # Submissions left unfinished by a worker that died (or by the previous run)
+    for record in await run_in_threadpool(judge_store.claim_orphans):
+        try:
+            judge_queue.submit(record, record["priority"])
+        except QueueFullError:
+            record.update(status="failed", error="Judge queue was full after a restart; please resubmit.")
+            await run_in_threadpool(judge_store.update_submission, record["id"],
+                                    {"status": record["status"], "error": record["error"]})
+    try:
+        yield
+    finally:
+        await rejudger.stop()
+        await judge_queue.stop()
+        _store_writer.shutdown(wait=True)
+        await run_in_threadpool(stop_python_pool)
+        await llm_gateway.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost",
@@ -22,6 +111,18 @@ app.add_middleware(
 )
 
 class Problem(BaseModel):
+    id: int = 0 # Assigned by the server
+    title: str
+    description: str
+    input_format: str
+    output_format: str
+    sample_input: str
+    sample_output: str
+    # [{"input": "...", "output": "..."}]; written to the TestCaseStore on creation, not kept in memory
+    test_cases: List[Dict[str, str]] = []
+    float_tolerance: Optional[float] = None # Absolute/relative error allowed for numeric output tokens
+
+class ProblemSummary(BaseModel):
     id: int
     title: str
     description: str
@@ -29,71 +130,90 @@ class Problem(BaseModel):
     output_format: str
     sample_input: str
     sample_output: str
-    test_cases: List[Dict[str, str]] = [] # [{"input": "...", "output": "..."}]
+    float_tolerance: Optional[float] = None
+    test_case_count: int
 
 class Submission(BaseModel):
     problem_id: int
     language: str
     code: str
 
-# In-memory storage for problems and submissions (for demonstration)
-problems_db: List[Problem] = []
-next_problem_id = 1
+class RejudgeRequest(BaseModel):
+    # A problem's submissions, the listed ones, or the listed ones within the problem
+    problem_id: Optional[int] = None
+    submission_ids: Optional[List[int]] = None
 
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to Proger Backend!"}
 
-@app.get("/problems", response_model=List[Problem])
+def problem_summary(row: Dict[str, Any]) -> ProblemSummary:
+    return ProblemSummary(**row, test_case_count=testcase_store.count(row["id"]))
+
+async def find_problem(problem_id: int) -> Problem:
+    row = await run_in_threadpool(judge_store.get_problem, problem_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return Problem(**row)
+
+@app.get("/problems", response_model=List[ProblemSummary])
 async def get_problems():
-    return problems_db
+    # Summaries only; test data stays on disk
+    return await run_in_threadpool(lambda: [problem_summary(row) for row in judge_store.list_problems()])
 
-@app.post("/problems", response_model=Problem)
+@app.post("/problems", response_model=ProblemSummary)
 async def create_problem(problem: Problem):
-    global next_problem_id
-    problem.id = next_problem_id
-    next_problem_id += 1
-    problems_db.append(problem)
-    return problem
-
-@app.post("/submit")
-async def submit_code(submission: Submission):
-    problem = next((p for p in problems_db if p.id == submission.problem_id), None)
-    if not problem:
-        raise HTTPException(status_code=404, detail="Problem not found")
+    row = await run_in_threadpool(judge_store.create_problem, problem.dict(exclude={"id", "test_cases"}))
+    await run_in_threadpool(testcase_store.replace, row["id"], problem.test_cases)
+    return await run_in_threadpool(problem_summary, row)
 
-    # --- Code Execution in Sandbox ---
-    # This calls a placeholder function. In a real system, this would
-    # involve a secure sandboxed environment (e.g., Docker containers)
-    # to execute the user's code against the problem's test cases.
-    from .sandbox import execute_code_in_sandbox
-    
-    sandbox_result = await execute_code_in_sandbox(
-        language=submission.language,
-        code=submission.code,
-        test_cases=problem.test_cases # Pass test cases to the sandbox
-    )
+@app.get("/problems/{problem_id}/verdicts")
+async def problem_verdicts(problem_id: int):
+    """How many submissions to the problem ended with each verdict (or are still pending)."""
+    await find_problem(problem_id)
+    return await run_in_threadpool(judge_store.verdict_counts, problem_id)
+
+@app.put("/problems/{problem_id}/test-cases/{index}/{kind}")
+async def upload_test_file(problem_id: int, index: int, kind: str, request: Request):
+    """Stream one test file (raw request body) to disk, for data too large for the JSON body of POST /problems."""
+    await find_problem(problem_id)
+    if kind not in KINDS:
+        raise HTTPException(status_code=404, detail="kind must be 'input' or 'output'")
+    if index < 1:
+        raise HTTPException(status_code=422, detail="Test case indices start at 1")
+
+    async def body():
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > MAX_TEST_FILE_BYTES:
+                raise HTTPException(status_code=413, detail=f"Test files are limited to {MAX_TEST_FILE_BYTES} bytes")
+            yield chunk
+
+    size = await testcase_store.write_stream(problem_id, index, kind, body())
+    return {"problem_id": problem_id, "index": index, "kind": kind, "bytes": size}
+
+@app.get("/compile-cache/stats")
+async def compile_cache_stats():
+    return compile_cache.stats()
 
-    execution_success = sandbox_result.get("success", False)
-    execution_output = sandbox_result.get("output", "")
-    execution_error = sandbox_result.get("error", "")
-    
-    # --- LLM Integration using httpx (for LM Studio or similar local LLM API) ---
-    LLM_API_URL = "http://localhost:1234/v1/chat/completions" # Default LM Studio endpoint
+REVIEW_SYSTEM_PROMPT = "You are an expert competitive programming judge. Review the provided code; its execution results are reported separately. Provide a score out of 100, constructive comments, and specific improvement suggestions. Respond in JSON format only."
 
-    prompt_messages = [
-        {"role": "system", "content": "You are an expert competitive programming judge. Review the provided code and execution results. Provide a score out of 100, constructive comments, and specific improvement suggestions. Respond in JSON format only."},
-        {"role": "user", "content": f'''"
+def code_hash(code: str) -> str:
+    # Line endings, trailing whitespace and blank lines don't change the review
+    lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+    return hashlib.sha256("\n".join(line for line in lines if line).encode()).hexdigest()
+
+def review_prompt(problem: Problem, language: str, code: str) -> str:
+    # Only what is known before execution, so the review can start alongside the sandbox
+    return f'''"
         Problem Title: {problem.title}
         Problem Description: {problem.description}
-        Submitted Language: {submission.language}
+        Submitted Language: {language}
         Submitted Code:
         ```
-        {submission.code}
+        {code}
         ```
-        Simulated Execution Success: {execution_success}
-        Simulated Execution Output: {execution_output}
-        Simulated Execution Error: {execution_error}
 
         Please provide a review in the following JSON format:
         {{
@@ -101,65 +221,325 @@ async def submit_code(submission: Submission):
             "comments": "<string_constructive_comments>",
             "improvements": ["<string_suggestion_1>", "<string_suggestion_2>", ...]
         }}
-        '''}
-    ]
+        '''
+
+def review_payload(user_content: str, max_tokens: int) -> Dict[str, Any]:
+    return {
+        "messages": [
+            {"role": "system", "content": REVIEW_SYSTEM_PROMPT},
+            {"role": "user", "content": user_content},
+        ],
+        "temperature": 0.7,
+        "max_tokens": max_tokens,
+        "cache_prompt": True, # llama.cpp: keep the prompt's KV cache for the next request
+        # "model": "local-model" # Specify model if needed by your LM Studio setup
+    }
+
+async def request_review(problem: Problem, language: str, code: str) -> Dict[str, Any]:
+    response = await llm_gateway.post(review_payload(review_prompt(problem, language, code), 500))
+    response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
+    llm_response_content = response.json()["choices"][0]["message"]["content"]
+
+    # Attempt to parse the JSON content from the LLM's response
+    # LLMs sometimes include markdown or extra text, so we try to extract the JSON part
+    try:
+        json_match = re.search(r'```json\n(.*)\n```', llm_response_content, re.DOTALL)
+        if json_match:
+            parsed_review = json.loads(json_match.group(1))
+        else:
+            parsed_review = json.loads(llm_response_content) # Try direct parse if no markdown
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse LLM response JSON: {e}. Raw response: {llm_response_content}")
+
+    return {
+        "score": parsed_review.get("score", 0),
+        "comments": parsed_review.get("comments", "No comments from LLM."),
+        "improvements": parsed_review.get("improvements", []),
+    }
 
+def start_review(problem: Problem, language: str, code: str, trace: metrics.Trace | None = None) -> asyncio.Task:
+    """Start reviewing the code, from the cache when possible; the task yields (review, outcome)."""
+    key = (problem.id, code_hash(code))
+    outcome = "cached"
+
+    async def review_now() -> Dict[str, Any]:
+        nonlocal outcome
+        outcome = "reviewed"
+        with metrics.span("review", trace):
+            return await request_review(problem, language, code)
+
+    async def review() -> tuple:
+        return await review_cache.get_or_generate(key, review_now), outcome
+
+    return asyncio.create_task(review())
+
+async def review_submission(
+    problem: Problem, language: str, review_task: asyncio.Task, sandbox_result: Dict[str, Any],
+) -> Dict[str, Any]:
+    """The review from start_review() with the execution results added; never raises, failures end up in the comments."""
     llm_review = {
         "score": 0,
         "comments": "LLM review failed or could not be parsed.",
         "improvements": ["Check LLM API connection.", "Ensure LLM provides valid JSON."],
         "execution_details": {
-            "success": execution_success,
-            "output": execution_output,
-            "error": execution_error,
-            "language": submission.language,
-            "problem_id": submission.problem_id
+            "success": sandbox_result.get("success", False),
+            "verdict": sandbox_result.get("verdict", "IE"),
+            "output": sandbox_result.get("output", ""),
+            "error": sandbox_result.get("error", ""),
+            "runtime": sandbox_result.get("runtime", 0.0),
+            "cpu_time": sandbox_result.get("cpu_time", 0.0),
+            "memory_usage": sandbox_result.get("memory_usage", ""),
+            "test_results": sandbox_result.get("details", []),
+            "language": language,
+            "problem_id": problem.id
         }
     }
 
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                LLM_API_URL,
-                json={
-                    "messages": prompt_messages,
-                    "temperature": 0.7,
-                    "max_tokens": 500,
-                    # "model": "local-model" # Specify model if needed by your LM Studio setup
-                },
-                timeout=30.0 # Increased timeout for LLM response
-            )
-            response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
-            llm_response_content = response.json()["choices"][0]["message"]["content"]
-            
-            # Attempt to parse the JSON content from the LLM's response
-            # LLMs sometimes include markdown or extra text, so we try to extract the JSON part
-            import json
-            import re
-            json_match = re.search(r'```json\n(.*)\n```', llm_response_content, re.DOTALL)
-            if json_match:
-                parsed_review = json.loads(json_match.group(1))
-            else:
-                parsed_review = json.loads(llm_response_content) # Try direct parse if no markdown
-
-            llm_review["score"] = parsed_review.get("score", 0)
-            llm_review["comments"] = parsed_review.get("comments", "No comments from LLM.")
-            llm_review["improvements"] = parsed_review.get("improvements", [])
-
+        review, outcome = await review_task
+        llm_review.update(review)
     except httpx.RequestError as e:
         llm_review["comments"] = f"LLM API request failed: {e}"
         llm_review["improvements"] = ["Ensure LM Studio is running and accessible at http://localhost:1234."]
     except httpx.HTTPStatusError as e:
         llm_review["comments"] = f"LLM API returned an error: {e.response.status_code} - {e.response.text}"
         llm_review["improvements"] = ["Check LM Studio logs for errors."]
-    except json.JSONDecodeError as e:
-        llm_review["comments"] = f"Failed to parse LLM response JSON: {e}. Raw response: {llm_response_content}"
+    except ValueError as e:
+        llm_review["comments"] = str(e)
         llm_review["improvements"] = ["Adjust LLM prompt to ensure valid JSON output."]
-    except KeyError as e:
-        llm_review["comments"] = f"Unexpected LLM response format: Missing key {e}. Raw response: {llm_response_content}"
+    except (KeyError, IndexError, TypeError) as e:
+        llm_review["comments"] = f"Unexpected LLM response format: {e!r}"
         llm_review["improvements"] = ["Adjust LLM prompt to ensure expected JSON structure."]
     except Exception as e:
         llm_review["comments"] = f"An unexpected error occurred during LLM review: {e}"
         llm_review["improvements"] = ["Review backend logs."]
+    else:
+        metrics.registry.inc("reviews", outcome=outcome)
+        return llm_review
+
+    metrics.registry.inc("reviews", outcome="failed")
+    return llm_review
+
+async def judge_submission(record: Dict[str, Any], publish):
+    """Judge a queued submission; returns the LLM review as a follow-up so the verdict doesn't wait for it."""
+    trace = _traces.get(record["id"])
+    metrics.observe("queue_wait", time.time() - record["created_at"], trace)
+    with metrics.span("load_problem", trace):
+        row = await run_in_threadpool(judge_store.get_problem, record["problem_id"])
+        if row is not None:
+            test_cases = await run_in_threadpool(testcase_store.cases, row["id"])
+    if row is None:
+        record["error"] = "Problem not found"
+        publish("status", {"status": "failed"})
+        return None
+    problem = Problem(**row)
+    language, code = record["language"], record["code"]
+
+    # The LLM reviews the code while the sandbox runs it; the execution
+    # results are added to the review once they are known
+    review_task = start_review(problem, language, code, trace)
+
+    def on_result(result: Dict[str, Any]) -> None:
+        record["test_results"].append(result)
+        publish("test", result)
+
+    # --- Code Execution in Sandbox ---
+    # Runs the code against every test case in rlimited, network-isolated
+    # subprocesses (see sandbox.py); verdicts are published as they complete.
+    try:
+        with metrics.span("sandbox", trace):
+            sandbox_result = await execute_code_in_sandbox(
+                language=language,
+                code=code,
+                test_cases=test_cases, # Files from the TestCaseStore, fed to the program as stdin
+                on_result=on_result,
+                float_tolerance=problem.float_tolerance,
+                priority=LIVE_PRIORITY,
+                trace=trace,
+            )
+    except BaseException:
+        review_task.cancel() # The shared review, if any, carries on for its other waiters
+        raise
+    record["verdict"] = sandbox_result.get("verdict", "IE")
+    metrics.registry.inc("submissions", verdict=record["verdict"])
+    record["execution"] = {k: v for k, v in sandbox_result.items() if k != "details"}
+    publish("verdict", record["execution"])
+    publish("status", {"status": "reviewing"})
+
+    async def review() -> None:
+        record["review"] = await review_submission(problem, language, review_task, sandbox_result)
+        publish("review", record["review"])
+
+    return review()
+
+def persist_event(record: Dict[str, Any], event: str, data: Dict[str, Any]) -> None:
+    """Mirror judge progress into the store, so any worker can serve the submission."""
+    if event == "test":
+        future = _store_writer.submit(judge_store.add_test_result, record["id"], data)
+    else:
+        fields = {k: record.get(k) for k in ("status", "verdict", "execution", "review", "error", "trace", "finished_at")}
+        future = _store_writer.submit(judge_store.update_submission, record["id"], fields)
+    future.add_done_callback(
+        lambda f: f.exception() and logger.error("Failed to store submission %s: %r", record["id"], f.exception())
+    )
+
+def on_judge_event(record: Dict[str, Any], event: str, data: Dict[str, Any]) -> None:
+    if event == "done":
+        metrics.observe("submission_total", record["finished_at"] - record["created_at"])
+        trace = _traces.pop(record["id"], None)
+        if trace is not None:
+            record["trace"] = trace.as_dict()
+    persist_event(record, event, data)
+
+judge_queue = JudgeQueue(judge_submission, JUDGE_WORKERS, JUDGE_QUEUE_MAX_DEPTH, on_event=on_judge_event)
+metrics.registry.gauge("judge_queue", "Submissions waiting, being judged, and waiting for their LLM review.",
+                       lambda: [({"state": state}, judge_queue.stats()[key])
+                                for state, key in (("queued", "queued"), ("judging", "running"), ("reviewing", "following_up"))])
+metrics.registry.gauge("llm_requests", "LLM requests in flight and waiting for a slot, per endpoint.",
+                       lambda: [({"endpoint": url, "state": state}, s[state])
+                                for url, s in llm_gateway.stats().items() for state in ("in_flight", "queued")])
+metrics.registry.gauge("cache_entries", "Entries in the compile and review caches.",
+                       lambda: [({"cache": "compile"}, compile_cache.stats()["entries"]),
+                                ({"cache": "review"}, review_cache.stats()["entries"])])
+metrics.registry.gauge("cache_hit_ratio", "Lookups served from the compile and review caches.",
+                       lambda: [({"cache": "compile"}, compile_cache.stats()["hit_rate"]),
+                                ({"cache": "review"}, review_cache.stats()["hit_rate"])])
+rejudger = Rejudger(judge_store, testcase_store, REJUDGE_CONCURRENCY, REJUDGE_PRIORITY)
+
+@app.post("/submit", status_code=202)
+async def submit_code(
+    submission: Submission,
+    trace: bool = Query(False, description="Record a per-stage timing trace, served at /submissions/{id}/trace"),
+):
+    await find_problem(submission.problem_id)
+    # Backpressure: tell the client to come back instead of piling up requests
+    busy = HTTPException(status_code=503, detail="Judge queue is full", headers={"Retry-After": str(JUDGE_RETRY_AFTER)})
+    if judge_queue.full():
+        raise busy
+    record = await run_in_threadpool(
+        judge_store.create_submission, {**submission.dict(), "code_hash": code_hash(submission.code)}
+    )
+    if trace:
+        _traces[record["id"]] = metrics.Trace()
+    try:
+        judge_queue.submit(record)
+    except QueueFullError:
+        _traces.pop(record["id"], None)
+        await run_in_threadpool(judge_store.delete_submission, record["id"])
+        raise busy
+    return {"status": "Submission queued", "submission_id": record["id"]}
+
+@app.get("/submissions")
+async def list_submissions(
+    response: Response,
+    problem_id: Optional[int] = None,
+    verdict: Optional[str] = None,
+    cursor: Optional[int] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: int = Query(SUBMISSIONS_PAGE_SIZE, ge=1, le=1000),
+):
+    """Submission history, newest first, without code or per-test results."""
+    rows = await run_in_threadpool(judge_store.list_submissions, problem_id, verdict, cursor, limit)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+async def load_submission(submission_id: int) -> Dict[str, Any]:
+    # Records being judged by this process are more current than the store
+    record = judge_queue.get(submission_id) or await run_in_threadpool(judge_store.get_submission, submission_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return record
+
+@app.get("/submissions/{submission_id}")
+async def get_submission(submission_id: int):
+    return await load_submission(submission_id)
+
+@app.get("/submissions/{submission_id}/trace")
+async def get_submission_trace(submission_id: int):
+    """Per-stage timings of a submission made with /submit?trace=true (partial while it is judged)."""
+    trace = _traces.get(submission_id)
+    if trace is not None:
+        return trace.as_dict()
+    record = await load_submission(submission_id)
+    if record.get("trace") is None:
+        raise HTTPException(status_code=404, detail="No trace recorded; submit with ?trace=true")
+    return record["trace"]
+
+async def follow_stored_submission(submission_id: int):
+    """Same events as JudgeQueue.subscribe(), reconstructed by polling the store."""
+    record = await run_in_threadpool(judge_store.get_submission, submission_id)
+    yield "snapshot", record
+    seen_tests = {r["test_case_id"] for r in record["test_results"]}
+    status, has_execution, has_review = record["status"], record["execution"] is not None, record["review"] is not None
+    while record["status"] not in FINAL_STATUSES:
+        await asyncio.sleep(SUBMISSION_POLL_INTERVAL)
+        record = await run_in_threadpool(judge_store.get_submission, submission_id)
+        for result in record["test_results"]:
+            if result["test_case_id"] not in seen_tests:
+                seen_tests.add(result["test_case_id"])
+                yield "test", result
+        if record["execution"] is not None and not has_execution:
+            has_execution = True
+            yield "verdict", record["execution"]
+        if record["review"] is not None and not has_review:
+            has_review = True
+            yield "review", record["review"]
+        if record["status"] != status:
+            status = record["status"]
+            yield "status", {"status": status}
+    yield "done", {"status": record["status"]}
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/submissions/{submission_id}/events")
+async def stream_submission(submission_id: int):
+    """Server-Sent Events: a snapshot, then status/test/verdict/review events until done."""
+    await load_submission(submission_id)
+
+    async def events():
+        local = False
+        async for event, data in judge_queue.subscribe(submission_id):
+            local = True
+            yield sse_event(event, data)
+        if not local:
+            # Finished, or judged by another worker process: follow it through the store
+            async for event, data in follow_stored_submission(submission_id):
+                yield sse_event(event, data)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/rejudge", status_code=202)
+async def start_rejudge(request: RejudgeRequest):
+    """Re-grade finished submissions (e.g. after fixing test data); poll /rejudges/{id} for progress."""
+    if request.problem_id is None and not request.submission_ids:
+        raise HTTPException(status_code=422, detail="Give a problem_id and/or submission_ids")
+    if request.problem_id is not None:
+        await find_problem(request.problem_id)
+    return await rejudger.start(request.problem_id, request.submission_ids)
+
+@app.get("/rejudges/{rejudge_id}")
+async def get_rejudge(rejudge_id: int):
+    """Progress, plus every submission whose verdict changed and counts per old->new transition."""
+    rejudge = await run_in_threadpool(judge_store.get_rejudge, rejudge_id)
+    if rejudge is None:
+        raise HTTPException(status_code=404, detail="Rejudge not found")
+    return rejudge
+
+@app.get("/judge/stats")
+async def judge_stats():
+    return judge_queue.stats()
+
+@app.get("/review-cache/stats")
+async def review_cache_stats():
+    return review_cache.stats()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return llm_gateway.stats()
 
-    return {"status": "Submission processed", "review": llm_review}
\ No newline at end of file
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage latency histograms (with p50/p95/p99), counters and queue gauges of this worker process."""
+    body = await run_in_threadpool(metrics.registry.render) # The compile cache gauge scans its directory
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,200 @@
+"""Judge pipeline instrumentation in the Prometheus text format.
+
+Every stage of a submission (queue wait, sandbox setup, compile, each test
+run, output comparison, LLM review, ...) is timed with span(). Durations go
+into a per-stage histogram, and optionally into a Trace that records the
+breakdown of one submission. render() produces the /metrics payload.
+
+Metrics are per process: with several uvicorn workers each one reports its
+own series, every one labelled with the worker's pid, so scrape every
+worker (or run the metrics endpoint on one).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+PREFIX = "proger"
+# Seconds; stages range from sub-millisecond comparisons to LLM reviews
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+QUANTILE_WINDOW = 2048 # Recent samples per stage the quantiles are computed over
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    # Series from different worker processes must not collide in one scrape
+    labels = (("pid", str(os.getpid())),) + tuple(labels)
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "recent")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: deque = deque(maxlen=QUANTILE_WINDOW)
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantiles(self) -> Dict[float, float]:
+        samples = sorted(self.recent)
+        if not samples:
+            return {}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, _Histogram] = {}
+        self._counters: Dict[str, Tuple[str, Dict[Labels, float]]] = {}
+        self._gauges: List[Tuple[str, str, Callable[[], Iterable[Tuple[Dict[str, Any], float]]]]] = []
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = _Histogram()
+            histogram.observe(seconds)
+
+    def counter(self, name: str, help: str) -> None:
+        self._counters.setdefault(name, (help, {}))
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            values = self._counters[name][1]
+            values[key] = values.get(key, 0) + amount
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, Any], float]]]) -> None:
+        """Register a gauge whose (labels, value) samples are read at scrape time."""
+        self._gauges.append((name, help, collect))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            stages = {stage: (list(h.counts), h.sum, h.count, h.quantiles()) for stage, h in sorted(self._stages.items())}
+            counters = {name: (help, dict(values)) for name, (help, values) in sorted(self._counters.items())}
+
+        name = f"{PREFIX}_stage_duration_seconds"
+        lines += [f"# HELP {name} Duration of each judge pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, (counts, total, count, _) in stages.items():
+            cumulative = 0
+            for bound, n in zip(BUCKETS, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_format_labels((('stage', stage), ('le', _format_value(bound))))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels((('stage', stage), ('le', '+Inf')))} {count}")
+            lines.append(f"{name}_sum{_format_labels((('stage', stage),))} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels((('stage', stage),))} {count}")
+
+        name = f"{PREFIX}_stage_duration_quantile_seconds"
+        lines += [f"# HELP {name} p50/p95/p99 stage duration over the last {QUANTILE_WINDOW} samples.",
+                  f"# TYPE {name} gauge"]
+        for stage, (_, _, _, quantiles) in stages.items():
+            for q, value in quantiles.items():
+                lines.append(f"{name}{_format_labels((('stage', stage), ('quantile', str(q))))} {_format_value(value)}")
+
+        for counter, (help, values) in counters.items():
+            name = f"{PREFIX}_{counter}_total"
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for gauge, help, collect in self._gauges:
+            name = f"{PREFIX}_{gauge}"
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+            for labels, value in collect():
+                key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        lines.append(f"# HELP {PREFIX}_process_info Worker process reporting these metrics.")
+        lines.append(f"# TYPE {PREFIX}_process_info gauge")
+        lines.append(f"{PREFIX}_process_info{_format_labels(())} 1")
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Per-submission breakdown of the spans recorded while judging it (opt-in)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, stage: str, start: float, duration: float, **attrs: Any) -> None:
+        # list.append is atomic, so sandbox worker threads can add spans directly
+        self.spans.append({"stage": stage, "start": round(start - self.started, 6),
+                           "duration": round(duration, 6), **attrs})
+
+    def as_dict(self) -> Dict[str, Any]:
+        spans = sorted(self.spans, key=lambda s: s["start"])
+        totals: Dict[str, float] = {}
+        for s in spans:
+            totals[s["stage"]] = round(totals.get(s["stage"], 0.0) + s["duration"], 6)
+        return {"spans": spans, "stage_totals": totals}
+
+
+registry = Registry()
+
+
+@contextmanager
+def span(stage: str, trace: Optional[Trace] = None, **attrs: Any):
+    """Time the enclosed block as ``stage``; exceptions count in errors_total.
+
+    A cancelled block (e.g. the client went away, or shutdown) counts in
+    cancelled_total instead and is left out of the stage's histogram, since
+    it didn't run to completion.
+    """
+    start = time.perf_counter()
+    cancelled = False
+    try:
+        yield attrs # The block may add attributes for the trace
+    except asyncio.CancelledError:
+        cancelled = True
+        registry.inc("cancelled", stage=stage)
+        raise
+    except BaseException:
+        registry.inc("errors", stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        if not cancelled:
+            registry.observe(stage, duration)
+        if trace is not None:
+            trace.add(stage, start, duration, **attrs, **({"cancelled": True} if cancelled else {}))
+
+
+def observe(stage: str, seconds: float, trace: Optional[Trace] = None, end: Optional[float] = None, **attrs: Any) -> None:
+    """Record a duration measured elsewhere (e.g. queue wait); ``end`` is a perf_counter() time."""
+    registry.observe(stage, seconds)
+    if trace is not None:
+        end = time.perf_counter() if end is None else end
+        trace.add(stage, end - seconds, seconds, **attrs)
+
+
+registry.counter("errors", "Judge pipeline stages that raised, by stage.")
+registry.counter("cancelled", "Judge pipeline stages cut short by cancellation, by stage.")
+registry.counter("submissions", "Judged submissions, by verdict.")
+registry.counter("test_cases", "Judged test cases, by verdict.")
+registry.counter("reviews", "LLM reviews, by outcome (cached, reviewed, failed).")
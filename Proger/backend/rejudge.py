@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+from judge_store import JudgeStore
+from sandbox import execute_code_in_sandbox
+from testcase_store import TestCaseStore
+
+
+class Rejudger:
+    """Re-grades finished submissions in the background.
+
+    Submissions are grouped by (problem, language, exact code hash): each
+    distinct program is judged once and its result is fanned out to every
+    submission in the group. ``concurrency`` programs are judged at a time,
+    at sandbox priority ``priority``, so test cases of live submissions
+    always get the next free sandbox slot. Progress and verdict changes are
+    recorded in the store (JudgeStore.get_rejudge()), so any worker can
+    report them. LLM reviews are left as they were.
+    """
+
+    def __init__(self, store: JudgeStore, testcases: TestCaseStore, concurrency: int, priority: int):
+        self.store = store
+        self.testcases = testcases
+        self.concurrency = concurrency
+        self.priority = priority
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, problem_id: Optional[int] = None, submission_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+        rows = await asyncio.to_thread(self.store.finished_submissions, problem_id, submission_ids)
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for row in rows:
+            key = (row["problem_id"], row["language"], hashlib.sha256(row["code"].encode()).hexdigest())
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"problem_id": row["problem_id"], "language": row["language"],
+                                       "code": row["code"], "members": []}
+            group["members"].append({"id": row["id"], "verdict": row["verdict"]})
+
+        rejudge = await asyncio.to_thread(self.store.create_rejudge, problem_id, len(rows), len(groups))
+        task = asyncio.create_task(self._run(rejudge["id"], list(groups.values())))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return rejudge
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _judge(self, rejudge_id: int, group: Dict[str, Any], problem: Dict[str, Any]) -> None:
+        result = await execute_code_in_sandbox(
+            group["language"], group["code"], problem["test_cases"],
+            float_tolerance=problem["float_tolerance"], priority=self.priority,
+        )
+        execution = {k: v for k, v in result.items() if k != "details"}
+        await asyncio.to_thread(
+            self.store.apply_rejudge, rejudge_id, group["members"], result["verdict"], execution, result["details"]
+        )
+
+    async def _run(self, rejudge_id: int, groups: List[Dict[str, Any]]) -> None:
+        status, error = "done", None
+        try:
+            # Test data is read (as file paths) once per problem, not per program
+            problems = {}
+            for problem_id in {g["problem_id"] for g in groups}:
+                row = await asyncio.to_thread(self.store.get_problem, problem_id)
+                cases = await asyncio.to_thread(self.testcases.cases, problem_id)
+                problems[problem_id] = {"float_tolerance": row["float_tolerance"] if row else None, "test_cases": cases}
+
+            pending = deque(groups)
+
+            async def worker() -> None:
+                while pending:
+                    group = pending.popleft()
+                    await self._judge(rejudge_id, group, problems[group["problem_id"]])
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(groups)))]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+        except asyncio.CancelledError:
+            status, error = "cancelled", "Backend shut down before the rejudge finished."
+            raise
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            await asyncio.to_thread(
+                self.store.update_rejudge, rejudge_id, {"status": status, "error": error, "finished_at": time.time()}
+            )
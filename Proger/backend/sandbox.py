@@ -1,183 +1,663 @@
 import asyncio
+import heapq
+import itertools
+import json
+import mmap
 import os
+import queue
+import re
+import shutil
+import signal
 import subprocess
+import sys
 import tempfile
-import shutil
-from typing import Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
-async def execute_code_in_sandbox(
-    language: str,
-    code: str,
-    test_cases: list[Dict[str, str]]
-) -> Dict[str, Any]:
+import metrics
+from compile_cache import CompileCache, cache_key, toolchain_version
+
+# --- Sandbox configuration ---
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", str(os.cpu_count() or 2))) # Test cases run concurrently
+TIME_LIMIT = float(os.getenv("SANDBOX_TIME_LIMIT", "2.0")) # CPU seconds per test case
+WALL_TIME_LIMIT = float(os.getenv("SANDBOX_WALL_TIME_LIMIT", "5.0")) # Seconds per test case, covers sleeping/blocked programs
+MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "256"))
+MAX_PROCESSES = int(os.getenv("SANDBOX_MAX_PROCESSES", "256")) # RLIMIT_NPROC, counted per sandbox user
+MAX_OUTPUT_BYTES = int(os.getenv("SANDBOX_MAX_OUTPUT_BYTES", str(16 * 1024 * 1024))) # RLIMIT_FSIZE for stdout/stderr
+COMPILE_TIME_LIMIT = float(os.getenv("SANDBOX_COMPILE_TIME_LIMIT", "30.0"))
+COMPILE_MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_COMPILE_MEMORY_LIMIT_MB", "2048"))
+# "required": refuse to run without a private network namespace (checked at
+# startup by check_network_isolation(); in Docker this needs CAP_SYS_ADMIN, see
+# docker-compose.yml), "best-effort": run anyway if namespaces are unavailable,
+# "off": don't try
+NETWORK_ISOLATION = os.getenv("SANDBOX_NETWORK_ISOLATION", "required")
+SANDBOX_UID = int(os.getenv("SANDBOX_UID", "65534")) # Used when the backend runs as root ("nobody")
+SANDBOX_GID = int(os.getenv("SANDBOX_GID", "65534"))
+PYTHON_COMMAND = os.getenv("SANDBOX_PYTHON", "python3")
+# Warm pre-forked interpreters for python3 (see start_python_pool()); 0 = cold start every run
+PYTHON_POOL_SIZE = int(os.getenv("SANDBOX_PYTHON_POOL_SIZE", str(SANDBOX_WORKERS)))
+COMPILE_CACHE_DIR = os.getenv("COMPILE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "proger-compile-cache"))
+COMPILE_CACHE_MAX_BYTES = int(os.getenv("COMPILE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# source: file the code is written to; compile/run: argv executed in the work dir;
+# artifacts: files the compile step produces that the run step needs;
+# warm: runs can be served by the warm Python pool.
+# address_space_mb=None skips RLIMIT_AS for runtimes that reserve huge virtual
+# ranges up front (V8, Mono); their heap is capped with a flag and peak RSS is
+# still checked against MEMORY_LIMIT_MB.
+LANGUAGES: Dict[str, Dict[str, Any]] = {
+    "python3": {
+        "source": "main.py",
+        "compile": None,
+        "run": [PYTHON_COMMAND, "main.py"],
+        "warm": True,
+    },
+    "c": {
+        "source": "main.c",
+        "compile": ["gcc", "-O2", "-std=gnu11", "-o", "main", "main.c", "-lm"],
+        "artifacts": ["main"],
+        "run": ["./main"],
+    },
+    "cpp": {
+        "source": "main.cpp",
+        "compile": ["g++", "-O2", "-std=gnu++17", "-o", "main", "main.cpp"],
+        "artifacts": ["main"],
+        "run": ["./main"],
+    },
+    "javascript": {
+        "source": "main.js",
+        "compile": None,
+        "run": ["node", f"--max-old-space-size={MEMORY_LIMIT_MB}", "main.js"],
+        "address_space_mb": None,
+    },
+    "typescript": {
+        "source": "main.ts",
+        "compile": ["tsc", "--target", "es2020", "--module", "commonjs", "--outDir", ".", "main.ts"],
+        "artifacts": ["main.js"],
+        "run": ["node", f"--max-old-space-size={MEMORY_LIMIT_MB}", "main.js"],
+        "address_space_mb": None,
+        "compile_address_space_mb": None,
+    },
+    "csharp": {
+        "source": "Program.cs",
+        "compile": ["mcs", "-optimize+", "-out:main.exe", "Program.cs"],
+        "artifacts": ["main.exe"],
+        "run": ["mono", "main.exe"],
+        "address_space_mb": None,
+        "compile_address_space_mb": None,
+    },
+}
+
+# Bounded pool: each worker thread supervises one sandboxed child process at a time
+_executor = ThreadPoolExecutor(max_workers=SANDBOX_WORKERS, thread_name_prefix="sandbox")
+
+
+class _PriorityGate:
+    """Hands out ``slots`` run slots, lowest priority value first (FIFO within a priority).
+
+    Work only reaches _executor once it holds a slot, so the executor's own
+    FIFO never fills up with low-priority work (e.g. a bulk rejudge) ahead
+    of a live submission.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._free = slots
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release() # Granted just as we were cancelled; pass it on
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"busy": self.slots - self._free, "waiting": sum(not w.done() for _, _, w in self._waiters)}
+
+
+_slots = _PriorityGate(SANDBOX_WORKERS)
+metrics.registry.gauge("sandbox_slots", "Sandbox run slots in use and test runs/compiles waiting for one.",
+                       lambda: [({"state": state}, n) for state, n in _slots.stats().items()])
+
+
+async def _in_slot(priority: int, fn, *args):
+    waited = time.perf_counter()
+    await _slots.acquire(priority)
+    metrics.observe("sandbox_slot_wait", time.perf_counter() - waited)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _slots.release()
+
+compile_cache = CompileCache(COMPILE_CACHE_DIR, COMPILE_CACHE_MAX_BYTES)
+# Cache keys being compiled by this process; identical submissions wait instead of compiling twice
+_compiling: Dict[str, asyncio.Future] = {}
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_runner.py")
+
+
+class _Runner:
+    """Handle on one sandbox_runner.py helper process (see its module docstring)."""
+
+    def __init__(self, zygote: bool = False):
+        if zygote:
+            # The submission runs inside this interpreter, so start it the way a
+            # cold `python3 main.py` would be: PYTHON_COMMAND with site, sandbox env
+            argv = [shutil.which(PYTHON_COMMAND) or PYTHON_COMMAND, RUNNER_PATH, "--zygote"]
+            env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"}
+        else:
+            # -S skips site imports to keep the helper (and so the RSS floor of its children) small
+            argv = [sys.executable, "-S", RUNNER_PATH]
+            env = None
+        self.proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+
+    def request(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        self.proc.stdin.write(json.dumps(req).encode() + b"\n")
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise OSError("sandbox runner exited unexpectedly")
+        return json.loads(line)
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        self.proc.kill()
+        self.proc.wait()
+
+
+# One runner per worker thread; a runner serves a single request at a time
+_runners: "queue.SimpleQueue[_Runner]" = queue.SimpleQueue()
+# Warm Python zygotes; _zygote_count stays at PYTHON_POOL_SIZE once started
+_zygotes: "queue.SimpleQueue[_Runner]" = queue.SimpleQueue()
+_zygote_count = 0
+
+
+def start_python_pool() -> int:
+    """Pre-fork PYTHON_POOL_SIZE warm interpreters for python3 submissions.
+
+    Until this is called (or with a pool size of 0) python3 test cases start a
+    cold interpreter like every other language. Returns the pool size.
     """
-    Conceptual implementation for secure code execution in a sandboxed environment (e.g., Docker).
-    This function demonstrates the *idea* of how it would work, but requires a fully
-    configured Docker environment with appropriate language images and security measures.
-
-    For a real competitive programming judge, consider:
-    - Dedicated Docker images for each language with pre-installed compilers/interpreters.
-    - Strict resource limits (CPU, memory, time) using Docker run options (--cpus, --memory, --pids-limit).
-    - Network isolation (--network none).
-    - User/group mapping inside the container.
-    - Robust error handling for compilation, runtime, and timeout issues.
-    - Secure temporary file management.
+    global _zygote_count
+    if shutil.which(PYTHON_COMMAND) is None:
+        return 0
+    while _zygote_count < PYTHON_POOL_SIZE:
+        _zygotes.put(_Runner(zygote=True))
+        _zygote_count += 1
+    return _zygote_count
+
+
+def stop_python_pool() -> None:
+    global _zygote_count
+    while _zygote_count:
+        _zygotes.get().close()
+        _zygote_count -= 1
+
+
+def _run_limited(
+    argv: List[str],
+    cwd: str,
+    stdin_path: Optional[str],
+    stdout_path: str,
+    stderr_path: str,
+    cpu_seconds: float,
+    wall_seconds: float,
+    address_space_mb: Optional[int],
+    warm: bool = False,
+) -> Dict[str, Any]:
+    """Run argv under rlimits and collect its exit status and rusage.
+
+    With ``warm`` (a ``python3 script`` argv) and the warm pool running, the
+    script runs in a fork of a zygote instead. Blocks the calling (worker)
+    thread. Raises OSError if the sandbox could not be set up, e.g. no
+    network namespace with NETWORK_ISOLATION=required.
     """
-    print(f"Attempting conceptual execution for {language} code...")
-    print(f"Code snippet: {code[:100]}...") # Print first 100 chars for debug
-
-    # --- Simulation for demonstration purposes ---
-    # In a real scenario, this would be replaced by actual Docker commands
-    # and execution against test cases.
-    if "error" in code.lower() or "fail" in code.lower():
-        return {
-            "success": False,
-            "output": "",
-            "error": "Simulated: Runtime error or compilation failure in sandbox.",
-            "runtime": 0.0,
-            "memory_usage": "Simulated: 0MB",
-            "details": "Simulated sandbox execution details (failed)."
-        }
-    elif "while True:" in code or "import os" in code:
-        return {
-            "success": True,
-            "output": "Simulated: Code ran with potential infinite loop/security risk.",
-            "error": "",
-            "runtime": 0.5,
-            "memory_usage": "Simulated: 15MB",
-            "details": "Simulated sandbox execution details (warning)."
-        }
+    zygote = warm and _zygote_count > 0
+    if zygote:
+        runner = _zygotes.get() # Waits while all zygotes are busy
     else:
-        return {
-            "success": True,
-            "output": "Simulated: Code executed successfully against test cases.",
-            "error": "",
-            "runtime": 0.2,
-            "memory_usage": "Simulated: 10MB",
-            "details": "Simulated sandbox execution details (success)."
-        }
-
-    # --- Conceptual Docker Execution Flow (requires actual implementation) ---
-    # This part is commented out as it requires a full Docker setup and
-    # is complex to implement robustly within this CLI interaction.
+        try:
+            runner = _runners.get_nowait()
+        except queue.Empty:
+            runner = _Runner()
+    if not runner.alive():
+        # Died while idle (e.g. OOM-killed): replace it rather than fail this run
+        runner.close()
+        runner = _Runner(zygote=zygote)
+    try:
+        result = runner.request({
+            "argv": argv,
+            "script": argv[-1] if zygote else None,
+            "cwd": cwd,
+            "stdin": stdin_path,
+            "stdout": stdout_path,
+            "stderr": stderr_path,
+            "env": {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": cwd, "LANG": "C.UTF-8"},
+            "cpu_seconds": cpu_seconds,
+            "wall_seconds": wall_seconds,
+            "address_space_mb": address_space_mb,
+            "max_processes": MAX_PROCESSES,
+            "max_output_bytes": MAX_OUTPUT_BYTES,
+            "network_isolation": NETWORK_ISOLATION,
+            "uid": SANDBOX_UID,
+            "gid": SANDBOX_GID,
+        })
+    except (OSError, ValueError):
+        runner.close()
+        if zygote:
+            _zygotes.put(_Runner(zygote=True)) # Keep the pool at full size
+        raise
+    (_zygotes if zygote else _runners).put(runner)
+    if "error" in result:
+        raise OSError(result["error"])
+    return result
+
+
+def check_network_isolation() -> None:
+    """Fail fast when SANDBOX_NETWORK_ISOLATION=required can't be honoured.
+
+    Runs a no-op program through the sandbox once. Without this every
+    submission would end in IE; raises RuntimeError naming the fix instead.
     """
-    temp_dir = None
+    if NETWORK_ISOLATION != "required":
+        return
+    probe_dir = tempfile.mkdtemp(prefix="judge-probe-")
     try:
-        temp_dir = tempfile.mkdtemp()
-        code_file_name = ""
-        docker_image = ""
-        command = []
-        
-        if language == "python3":
-            code_file_name = "main.py"
-            docker_image = "python:3.10-slim-buster"
-            command = ["python", f"/app/{code_file_name}"]
-        elif language == "c":
-            code_file_name = "main.c"
-            docker_image = "gcc:latest"
-            command = ["bash", "-c", f"gcc /app/{code_file_name} -o /app/a.out && /app/a.out"]
-        elif language == "csharp":
-            code_file_name = "Program.cs"
-            docker_image = "mcr.microsoft.com/dotnet/sdk:6.0" # Example .NET SDK image
-            command = ["bash", "-c", f"dotnet new console -o /app/ && cp /app/{code_file_name} /app/Program.cs && dotnet run --project /app"]
-        elif language == "cpp":
-            code_file_name = "main.cpp"
-            docker_image = "gcc:latest"
-            command = ["bash", "-c", f"g++ /app/{code_file_name} -o /app/a.out && /app/a.out"]
-        elif language == "typescript" or language == "javascript":
-            code_file_name = "main.js" if language == "javascript" else "main.ts"
-            docker_image = "node:18-slim" # Node.js for JS/TS
-            if language == "typescript":
-                command = ["bash", "-c", f"npm install -g typescript && tsc /app/{code_file_name} && node /app/main.js"]
-            else:
-                command = ["node", f"/app/{code_file_name}"]
-        else:
-            return {"success": False, "error": f"Unsupported language: {language}"}
+        os.chmod(probe_dir, 0o755)
+        _run_limited([shutil.which("true") or "/bin/true"], probe_dir, None,
+                     os.path.join(probe_dir, "out"), os.path.join(probe_dir, "err"), 1.0, 5.0, None)
+    except OSError as e:
+        raise RuntimeError(
+            f"Sandbox network isolation is unavailable ({e}). Run the backend with CAP_SYS_ADMIN "
+            "(docker-compose.yml adds it), or set SANDBOX_NETWORK_ISOLATION=best-effort or off "
+            "to judge without a private network namespace."
+        ) from e
+    finally:
+        shutil.rmtree(probe_dir, ignore_errors=True)
+
+
+def _read_text(path: str, limit: Optional[int] = None) -> str:
+    with open(path, "rb") as f:
+        data = f.read(limit) if limit else f.read()
+    return data.decode("utf-8", errors="replace")
+
+
+COMPARE_BLOCK_BYTES = 1 << 20 # Outputs are compared this many bytes at a time
+
+
+@contextmanager
+def _mapped(path: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b"" # mmap() can't map an empty file
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
 
-        code_file_path = os.path.join(temp_dir, code_file_name)
-        with open(code_file_path, "w") as f:
-            f.write(code)
 
-        # For each test case, run the code
-        results = []
-        for i, tc in enumerate(test_cases):
-            input_data = tc.get("input", "")
-            expected_output = tc.get("output", "")
-
-            # Docker command with resource limits and network isolation
-            docker_cmd = [
-                "docker", "run", "--rm",
-                "--network", "none", # No network access
-                "--memory", "128m",  # 128MB memory limit
-                "--cpus", "0.5",     # 0.5 CPU core limit
-                "-v", f"{temp_dir}:/app", # Mount temp dir
-                docker_image,
-                *command
-            ]
-
-            process = await asyncio.create_subprocess_exec(
-                *docker_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+def _token_blocks(data) -> Iterator[List[bytes]]:
+    # Whitespace-separated tokens, one block at a time; a token cut by the
+    # block boundary is carried over to the next block
+    carry = b""
+    for start in range(0, len(data), COMPARE_BLOCK_BYTES):
+        block = carry + data[start:start + COMPARE_BLOCK_BYTES]
+        tokens = block.split()
+        carry = tokens.pop() if tokens and not block[-1:].isspace() else b""
+        yield tokens
+    if carry:
+        yield [carry]
+
+
+def _tokens_match(actual: bytes, expected: bytes, float_tolerance: Optional[float]) -> bool:
+    if actual == expected:
+        return True
+    if float_tolerance is None:
+        return False
+    try:
+        a, e = float(actual), float(expected)
+    except ValueError:
+        return False
+    # Absolute or relative error, whichever is more lenient
+    return abs(a - e) <= float_tolerance * max(1.0, abs(e))
+
+
+def outputs_match(actual_path: str, expected_path: str, float_tolerance: Optional[float] = None) -> bool:
+    """Compare two output files token by token, ignoring all whitespace differences.
+
+    Both files are memory-mapped and walked in COMPARE_BLOCK_BYTES blocks, so
+    neither output is ever held in memory as a whole. With ``float_tolerance``
+    numeric tokens may differ by that absolute or relative error.
+    """
+    with _mapped(actual_path) as actual, _mapped(expected_path) as expected:
+        if len(actual) == len(expected) and all(
+            actual[i:i + COMPARE_BLOCK_BYTES] == expected[i:i + COMPARE_BLOCK_BYTES]
+            for i in range(0, len(actual), COMPARE_BLOCK_BYTES)
+        ):
+            return True # Byte-identical, the common AC case
+
+        actual_blocks, expected_blocks = _token_blocks(actual), _token_blocks(expected)
+        xs: List[bytes] = []
+        ys: List[bytes] = []
+        while True:
+            while not xs:
+                xs = next(actual_blocks, None)
+                if xs is None:
+                    xs = []
+                    break
+            while not ys:
+                ys = next(expected_blocks, None)
+                if ys is None:
+                    ys = []
+                    break
+            if not xs or not ys:
+                return not xs and not ys
+            n = min(len(xs), len(ys))
+            if xs[:n] != ys[:n] and not all(
+                _tokens_match(x, y, float_tolerance) for x, y in zip(xs[:n], ys[:n])
+            ):
+                return False
+            xs, ys = xs[n:], ys[n:]
+
+
+def _classify(run: Dict[str, Any], stderr: str, address_space_mb: Optional[int]) -> str:
+    memory_limit_kb = MEMORY_LIMIT_MB * 1024
+    if run["timed_out"] or run["signal"] == signal.SIGXCPU or run["cpu_time"] > TIME_LIMIT:
+        return "TLE"
+    if run["peak_rss_kb"] > memory_limit_kb:
+        return "MLE"
+    if run["exit_code"] != 0:
+        # With RLIMIT_AS an allocation fails before RSS reaches the limit, so
+        # also look at how the common runtimes report out-of-memory.
+        oom_markers = ("MemoryError", "std::bad_alloc", "heap out of memory", "OutOfMemoryException")
+        if any(marker in stderr for marker in oom_markers) or (
+            address_space_mb is not None and run["peak_rss_kb"] > 0.9 * memory_limit_kb
+        ):
+            return "MLE"
+        return "RE"
+    return "AC"
+
+
+def _link_files(src_dir: str, dst_dir: str, names: List[str]) -> None:
+    for name in names:
+        src, dst = os.path.join(src_dir, name), os.path.join(dst_dir, name)
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def _run_test_case(
+    index: int, run_dir: str, io_dir: str, spec: Dict[str, Any], test_case: Dict[str, str],
+    float_tolerance: Optional[float], trace: Optional[metrics.Trace] = None,
+) -> Dict[str, Any]:
+    # Test cases from the TestCaseStore are files the runner opens as stdin;
+    # inline {"input", "output"} test cases are written out first. Inputs,
+    # expected outputs and the program's own stdout/stderr all live in io_dir,
+    # which the sandbox uid can't enter: the runner opens them before dropping
+    # privileges, and the comparison happens here, outside the sandbox.
+    input_path = test_case.get("input_path")
+    expected_path = test_case.get("output_path")
+    if input_path is None:
+        input_path = os.path.join(io_dir, f"{index}.in")
+        with open(input_path, "w") as f:
+            f.write(test_case.get("input", ""))
+    if expected_path is None:
+        expected_path = os.path.join(io_dir, f"{index}.ans")
+        with open(expected_path, "w") as f:
+            f.write(test_case.get("output", ""))
+    stdout_path = os.path.join(io_dir, f"{index}.out")
+    stderr_path = os.path.join(io_dir, f"{index}.err")
+
+    # Each test case gets its own root-owned cwd holding links to the program,
+    # so nothing one run leaves behind is visible to the next
+    cwd = os.path.join(run_dir, str(index))
+    address_space_mb = spec.get("address_space_mb", MEMORY_LIMIT_MB)
+    try:
+        os.mkdir(cwd, 0o755)
+        _link_files(run_dir, cwd, [spec["source"], *spec.get("artifacts", [])])
+        with metrics.span("execution", trace, test_case=index + 1):
+            run = _run_limited(
+                spec["run"], cwd, input_path, stdout_path, stderr_path,
+                TIME_LIMIT, WALL_TIME_LIMIT, address_space_mb, spec.get("warm", False),
             )
+    except OSError as e:
+        return {"test_case_id": index + 1, "verdict": "IE", "passed": False, "output": "",
+                "error": f"Sandbox error: {e}", "wall_time": 0.0, "cpu_time": 0.0, "peak_rss_kb": 0}
 
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(input=input_data.encode()),
-                    timeout=5 # 5 second timeout per test case
-                )
-                
-                success = process.returncode == 0 and stderr.decode().strip() == ""
-                output = stdout.decode().strip()
-                error = stderr.decode().strip()
-
-                results.append({
-                    "test_case_id": i + 1,
-                    "success": success,
-                    "output": output,
-                    "error": error,
-                    "passed": success and output == expected_output,
-                    "runtime": 0.0 # Placeholder, needs actual measurement
-                })
-
-            except asyncio.TimeoutError:
-                process.kill()
-                await process.wait()
-                results.append({
-                    "test_case_id": i + 1,
-                    "success": False,
-                    "output": "",
-                    "error": "Execution timed out.",
-                    "passed": False,
-                    "runtime": 5.0
-                })
-            except Exception as e:
-                results.append({
-                    "test_case_id": i + 1,
-                    "success": False,
-                    "output": "",
-                    "error": f"Sandbox error: {e}",
-                    "passed": False,
-                    "runtime": 0.0
-                })
-
-        overall_success = all(r["passed"] for r in results)
-        overall_output = "\n".join(r["output"] for r in results)
-        overall_error = "\n".join(r["error"] for r in results if r["error"])
-
-        return {
-            "success": overall_success,
-            "output": overall_output,
-            "error": overall_error,
-            "runtime": sum(r["runtime"] for r in results),
-            "memory_usage": "N/A (needs Docker stats)",
-            "details": results
-        }
-
-    except Exception as e:
-        return {"success": False, "error": f"Failed to set up sandbox: {e}"}
+    stderr = _read_text(stderr_path, 64 * 1024)
+    output = _read_text(stdout_path, 1000) # Only a preview; the comparison streams the file
+    verdict = _classify(run, stderr, address_space_mb)
+    if run["signal"] == signal.SIGXFSZ or os.path.getsize(stdout_path) >= MAX_OUTPUT_BYTES:
+        stderr += "\nOutput limit exceeded."
+    if verdict == "AC":
+        with metrics.span("comparison", trace, test_case=index + 1):
+            if not outputs_match(stdout_path, expected_path, float_tolerance):
+                verdict = "WA"
+
+    return {
+        "test_case_id": index + 1,
+        "verdict": verdict,
+        "passed": verdict == "AC",
+        "output": output[:1000],
+        "error": stderr[:1000],
+        "exit_code": run["exit_code"],
+        "wall_time": round(run["wall_time"], 4),
+        "cpu_time": round(run["cpu_time"], 4),
+        "peak_rss_kb": run["peak_rss_kb"],
+    }
+
+
+def _compile(build_dir: str, spec: Dict[str, Any], trace: Optional[metrics.Trace] = None) -> Tuple[Optional[str], bool]:
+    """Run the compile step; returns (compiler output on failure, timed out)."""
+    stdout_path = os.path.join(build_dir, "compile.out")
+    stderr_path = os.path.join(build_dir, "compile.err")
+    with metrics.span("compile", trace):
+        run = _run_limited(
+            spec["compile"], build_dir, None, stdout_path, stderr_path,
+            COMPILE_TIME_LIMIT, COMPILE_TIME_LIMIT * 2,
+            spec.get("compile_address_space_mb", COMPILE_MEMORY_LIMIT_MB),
+        )
+    if run["exit_code"] == 0:
+        return None, False
+    message = (_read_text(stdout_path, 32 * 1024) + _read_text(stderr_path, 32 * 1024)).strip()
+    if run["timed_out"]:
+        message = "Compilation timed out.\n" + message
+    return message or f"Compiler exited with status {run['exit_code']}.", run["timed_out"]
+
+
+def _prepare_build_dir(run_dir: str, spec: Dict[str, Any]) -> str:
+    # The compiler writes its output next to the source, so it gets a scratch
+    # copy owned by the sandbox uid; run_dir itself stays read-only to programs
+    build_dir = tempfile.mkdtemp(prefix="judge-build-")
+    shutil.copyfile(os.path.join(run_dir, spec["source"]), os.path.join(build_dir, spec["source"]))
+    if os.getuid() == 0:
+        os.chown(build_dir, SANDBOX_UID, SANDBOX_GID)
+    os.chmod(build_dir, 0o755)
+    return build_dir
+
+
+def _publish_artifacts(build_dir: str, run_dir: str, artifacts: List[str]) -> None:
+    # Copies (not links), so the run_dir files are owned by us, not the sandbox uid
+    for name in artifacts:
+        dst = os.path.join(run_dir, name)
+        shutil.copyfile(os.path.join(build_dir, name), dst)
+        os.chmod(dst, 0o555)
+
+
+async def _build(
+    run_dir: str, spec: Dict[str, Any], language: str, code: str, priority: int = 0,
+    trace: Optional[metrics.Trace] = None,
+) -> Tuple[Optional[str], bool]:
+    """Compile once per distinct (language, toolchain version, flags, source).
+
+    Returns (compile error or None, served from cache). On a hit the cached
+    artifacts are linked into run_dir and the compiler is not run at all; on
+    a miss the compiler runs in a scratch directory and only the artifacts
+    are copied into run_dir.
+    """
+    loop = asyncio.get_running_loop()
+    compiler, flags = spec["compile"][0], spec["compile"][1:]
+    version = await loop.run_in_executor(None, toolchain_version, compiler)
+    key = cache_key(language, version, flags, code)
+
+    while True:
+        pending = _compiling.get(key)
+        if pending is not None:
+            await asyncio.shield(pending)
+        with metrics.span("compile_cache_lookup", trace) as attrs:
+            entry = await loop.run_in_executor(None, compile_cache.lookup, key)
+            attrs["hit"] = entry is not None
+            if entry is not None:
+                compile_error = compile_cache.compile_error(entry)
+                if compile_error is None and not await loop.run_in_executor(
+                    None, compile_cache.install, entry, spec["artifacts"], run_dir
+                ):
+                    entry = None # Evicted since the lookup
+                    attrs["hit"] = False
+        if entry is not None:
+            return compile_error, True
+        # No await between this check and registering below
+        if key not in _compiling:
+            break
+
+    done = _compiling[key] = loop.create_future()
+    build_dir = None
+    try:
+        build_dir = await loop.run_in_executor(None, _prepare_build_dir, run_dir, spec)
+        compile_error, timed_out = await _in_slot(priority, _compile, build_dir, spec, trace)
+        if compile_error is None:
+            await loop.run_in_executor(None, _publish_artifacts, build_dir, run_dir, spec["artifacts"])
+        if not timed_out: # A timeout may just mean the judge was overloaded
+            await loop.run_in_executor(
+                None, compile_cache.store, key, build_dir, spec["artifacts"], compile_error
+            )
     finally:
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        del _compiling[key]
+        done.set_result(None)
+        if build_dir is not None:
+            await loop.run_in_executor(None, shutil.rmtree, build_dir, True)
+    return compile_error, False
+
+
+def _summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # The submission's verdict is that of its first failing test case
+    verdict = next((r["verdict"] for r in results if r["verdict"] != "AC"), "AC")
+    peak_rss_kb = max((r["peak_rss_kb"] for r in results), default=0)
+    return {
+        "success": verdict == "AC",
+        "verdict": verdict,
+        "output": "\n".join(
+            f"Test {r['test_case_id']}: {r['verdict']} ({r['wall_time']:.3f}s wall, {r['cpu_time']:.3f}s CPU, {r['peak_rss_kb'] / 1024:.1f}MB)"
+            for r in results
+        ),
+        "error": "\n".join(f"Test {r['test_case_id']}: {r['error']}" for r in results if r["error"]),
+        "runtime": max((r["wall_time"] for r in results), default=0.0),
+        "cpu_time": max((r["cpu_time"] for r in results), default=0.0),
+        "memory_usage": f"{peak_rss_kb / 1024:.1f}MB",
+        "details": results,
+    }
+
+
+def _failure(verdict: str, error: str) -> Dict[str, Any]:
+    return {"success": False, "verdict": verdict, "output": "", "error": error,
+            "runtime": 0.0, "cpu_time": 0.0, "memory_usage": "0.0MB", "details": []}
+
+
+async def execute_code_in_sandbox(
+    language: str,
+    code: str,
+    test_cases: list[Dict[str, str]],
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    float_tolerance: Optional[float] = None,
+    priority: int = 0,
+    trace: Optional[metrics.Trace] = None,
+) -> Dict[str, Any]:
     """
+    Judge ``code`` against ``test_cases`` in local sandboxed subprocesses.
+
+    A test case is either inline ({"input", "output"}) or a pair of files
+    ({"input_path", "output_path"}, see TestCaseStore.cases()); outputs are
+    compared token-wise with outputs_match().
+
+    The code is compiled once (for compiled languages, and only on a
+    compile-cache miss; see _build()), then every test case
+    runs concurrently on the bounded SANDBOX_WORKERS pool; python3 runs are
+    forked from warm interpreters once start_python_pool() has been called.
+    Pool slots go to the lowest ``priority`` value first, so background work
+    (rejudges) can be queued behind live submissions. Each process is
+    launched by a sandbox_runner.py helper with rlimits for CPU time, address
+    space, process count and file size, its own process group, a private
+    network namespace and, when the backend runs as root, an unprivileged uid.
+
+    Per test case the verdict is AC/WA/TLE/MLE/RE (IE for sandbox failures),
+    with wall time, CPU time and peak RSS taken from wait4() rusage. The
+    submission gets CE when compilation fails. ``on_result`` is called with
+    each test case's result as soon as it finishes (in completion order).
+    Stage timings go to the metrics registry, and to ``trace`` when given.
+    """
+    setup_started = time.perf_counter()
+    spec = LANGUAGES.get(language)
+    if spec is None:
+        return _failure("IE", f"Unsupported language: {language}")
+    # Resolve toolchain binaries up front; the sandboxed child only gets absolute paths
+    spec = dict(spec)
+    for stage in ("compile", "run"):
+        argv = spec[stage]
+        if argv and not argv[0].startswith("./"):
+            path = shutil.which(argv[0])
+            if path is None:
+                return _failure("IE", f"Toolchain not available on the judge: {argv[0]}")
+            spec[stage] = [path, *argv[1:]]
+
+    loop = asyncio.get_running_loop()
+    run_dir = tempfile.mkdtemp(prefix="judge-")
+    io_dir = tempfile.mkdtemp(prefix="judge-io-") # 0700: test data and outputs, out of the sandbox's reach
+    try:
+        os.chmod(run_dir, 0o755) # Readable, but not writable, by the sandbox uid
+        with open(os.path.join(run_dir, spec["source"]), "w") as f:
+            f.write(code)
+        metrics.observe("sandbox_setup", time.perf_counter() - setup_started, trace)
+
+        compile_cached = False
+        if spec["compile"]:
+            try:
+                compile_error, compile_cached = await _build(run_dir, spec, language, code, priority, trace)
+            except OSError as e:
+                return _failure("IE", f"Failed to set up sandbox: {e}")
+            if compile_error is not None:
+                return {**_failure("CE", compile_error), "compile_cached": compile_cached}
+
+        async def run(index: int, test_case: Dict[str, str]) -> Dict[str, Any]:
+            result = await _in_slot(priority, _run_test_case, index, run_dir, io_dir, spec, test_case,
+                                    float_tolerance, trace)
+            metrics.registry.inc("test_cases", verdict=result["verdict"])
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        results = await asyncio.gather(*(run(i, tc) for i, tc in enumerate(test_cases)))
+        return {**_summarize(list(results)), "compile_cached": compile_cached}
+    finally:
+        with metrics.span("sandbox_cleanup", trace):
+            await loop.run_in_executor(None, shutil.rmtree, run_dir, True)
+            await loop.run_in_executor(None, shutil.rmtree, io_dir, True)
@@ -0,0 +1,232 @@
+"""Sandbox process launcher.
+
+Started by sandbox.py as a small, single-threaded helper process. It reads
+one JSON request per line on stdin, forks and execs the requested command
+under rlimits, reaps it with wait4() and writes one JSON result line to
+stdout.
+
+Launching from this helper instead of the backend matters for two reasons:
+fork() from the multi-threaded server is not async-signal-safe, and a forked
+child inherits its parent's resident set, which the kernel keeps as a floor
+for ru_maxrss across execve(). Forking from a process of a few MB keeps the
+reported peak RSS close to what the submission actually used.
+
+With --zygote the helper is instead a warm Python interpreter: it imports
+WARM_MODULES once, and requests carrying a "script" run that file in a
+fresh fork of itself (after the same setup as an exec'd child) instead of
+exec'ing a new interpreter, so a test case skips interpreter startup and
+the common imports. All forks share the zygote's hash seed; random reseeds
+itself after fork.
+"""
+import gc
+import io
+import json
+import os
+import resource
+import signal
+import sys
+import time
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+# Imported once by a zygote; the usual competitive-programming toolkit
+WARM_MODULES = [
+    "array", "bisect", "collections", "copy", "decimal", "fractions", "functools", "heapq",
+    "itertools", "math", "operator", "random", "re", "statistics", "string", "traceback", "typing",
+]
+
+_current_pgid = None
+
+
+def _unshare(flags):
+    if hasattr(os, "unshare"): # Python 3.12+
+        os.unshare(flags)
+        return
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.unshare(flags) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def _setup_child(req):
+    # Runs in the forked child before exec
+    os.setsid() # Own process group, so the whole tree can be killed
+    stdin = os.open(req["stdin"], os.O_RDONLY) if req.get("stdin") else os.open(os.devnull, os.O_RDONLY)
+    stdout = os.open(req["stdout"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    stderr = os.open(req["stderr"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(stdin, 0)
+    os.dup2(stdout, 1)
+    os.dup2(stderr, 2)
+    os.chdir(req["cwd"])
+
+    cpu = max(1, int(req["cpu_seconds"] + 0.999))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    if req.get("address_space_mb") is not None:
+        limit = req["address_space_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_NPROC, (req["max_processes"], req["max_processes"]))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (req["max_output_bytes"], req["max_output_bytes"]))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+    # A fresh network namespace only has a down loopback device: no network at all.
+    # Unprivileged callers need a user namespace to be allowed to create it.
+    isolation = req.get("network_isolation", "required")
+    if isolation != "off":
+        try:
+            _unshare(CLONE_NEWNET if os.getuid() == 0 else CLONE_NEWUSER | CLONE_NEWNET)
+        except OSError as e:
+            if isolation == "required":
+                raise OSError(e.errno, f"cannot create network namespace: {e.strerror}")
+
+    if os.getuid() == 0:
+        os.setgroups([])
+        os.setgid(req["gid"])
+        os.setuid(req["uid"])
+
+
+def _exit_status(e: SystemExit) -> int:
+    # Same mapping as the interpreter's own handling of an uncaught SystemExit
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code & 0xFF
+    print(e.code, file=sys.stderr)
+    return 1
+
+
+def _run_script(req, err_w):
+    """Run req["script"] as __main__ in this forked zygote child; never returns."""
+    import traceback
+    import types
+
+    signal.signal(signal.SIGALRM, signal.SIG_DFL)
+    os.environ.clear()
+    os.environ.update(req["env"])
+    path = os.path.join(req["cwd"], req["script"])
+    sys.argv = [req["script"]]
+    sys.path[0] = req["cwd"]
+    # Fresh stdio objects over the redirected fds, configured like a cold start writing to files
+    sys.stdin = sys.__stdin__ = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", encoding="utf-8", closefd=False)
+    sys.stderr = sys.__stderr__ = io.TextIOWrapper(
+        open(2, "wb", buffering=0, closefd=False), encoding="utf-8", errors="backslashreplace", line_buffering=True
+    )
+    main = types.ModuleType("__main__")
+    main.__file__ = path
+    main.__builtins__ = __builtins__
+    sys.modules["__main__"] = main
+    os.close(err_w) # Setup succeeded; there is no exec to close it
+
+    status = 0
+    try:
+        with open(path, "rb") as f:
+            code = compile(f.read(), path, "exec")
+        exec(code, main.__dict__)
+    except SystemExit as e:
+        status = _exit_status(e)
+    except BaseException as e:
+        # Drop this frame so the traceback starts in the submission
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    try:
+        threading = sys.modules.get("threading")
+        if threading is not None:
+            threading._shutdown() # Join non-daemon threads like interpreter exit does
+        import atexit
+        atexit._run_exitfuncs()
+    except SystemExit as e:
+        status = _exit_status(e)
+    try:
+        sys.stdout.flush()
+    except Exception:
+        status = 120 # What the interpreter returns when flushing stdout fails at exit
+    try:
+        sys.stderr.flush()
+    except Exception:
+        pass
+    os._exit(status)
+
+
+def _on_alarm(signum, frame):
+    if _current_pgid is not None:
+        try:
+            os.killpg(_current_pgid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def run(req):
+    global _current_pgid
+    # The child reports setup/exec failures through this pipe; a successful
+    # exec closes it (O_CLOEXEC) without writing anything.
+    err_r, err_w = os.pipe2(os.O_CLOEXEC)
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(err_r)
+            _setup_child(req)
+            if req.get("script"):
+                _run_script(req, err_w)
+            # argv[0] is already resolved by the caller; execvpe() would import
+            # modules lazily, which can fail once privileges are dropped
+            os.execve(req["argv"][0], req["argv"], req["env"])
+        except BaseException as e:
+            try:
+                os.write(err_w, f"{type(e).__name__}: {e}".encode())
+            finally:
+                os._exit(127)
+    os.close(err_w)
+    _current_pgid = pid
+    timed_out = False
+    signal.setitimer(signal.ITIMER_REAL, req["wall_seconds"])
+    try:
+        setup_error = b""
+        while True:
+            chunk = os.read(err_r, 4096)
+            if not chunk:
+                break
+            setup_error += chunk
+        _, status, usage = os.wait4(pid, 0)
+    finally:
+        timed_out = signal.setitimer(signal.ITIMER_REAL, 0)[0] == 0.0
+        os.close(err_r)
+    wall_time = time.perf_counter() - start
+    try:
+        os.killpg(pid, signal.SIGKILL) # Stray grandchildren
+    except (ProcessLookupError, PermissionError):
+        pass
+    _current_pgid = None
+
+    if setup_error:
+        return {"error": setup_error.decode(errors="replace")}
+    exit_code = os.waitstatus_to_exitcode(status)
+    return {
+        "exit_code": exit_code,
+        "signal": -exit_code if exit_code < 0 else None,
+        "timed_out": timed_out,
+        "wall_time": wall_time,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "peak_rss_kb": usage.ru_maxrss,
+    }
+
+
+def main():
+    if "--zygote" in sys.argv[1:]:
+        for name in WARM_MODULES:
+            __import__(name)
+        gc.freeze() # Keep the collector from touching (and un-sharing) inherited objects
+    signal.signal(signal.SIGALRM, _on_alarm)
+    for line in sys.stdin.buffer:
+        try:
+            result = run(json.loads(line))
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
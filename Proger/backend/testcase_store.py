@@ -0,0 +1,112 @@
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from typing import AsyncIterator, BinaryIO, Dict, List
+
+KINDS = {"input": "in", "output": "out"}
+_CASE_FILE = re.compile(r"^(\d+)\.(in|out)$")
+WRITE_BUFFER_BYTES = 1 << 20 # Uploaded bytes collected before each write
+
+
+class TestCaseStore:
+    """Test data kept as files: ``<root>/<problem id>/<n>.in`` and ``<n>.out``, n from 1.
+
+    The sandbox opens the .in file directly as the program's stdin and
+    compares against the .out file, so test data never has to be held in
+    the backend's memory. The tree is private to the backend (0700 dirs,
+    0600 files): the sandbox runner opens stdin before dropping to the
+    sandbox uid, so submissions never need, and never get, access to the
+    expected outputs. Files are replaced atomically, so a judge never sees
+    a half-written file.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, mode=0o700, exist_ok=True)
+        os.chmod(root, 0o700) # Also closes trees created before the data was made private
+
+    def _dir(self, problem_id: int) -> str:
+        return os.path.join(self.root, str(problem_id))
+
+    def path(self, problem_id: int, index: int, kind: str) -> str:
+        return os.path.join(self._dir(problem_id), f"{index}.{KINDS[kind]}")
+
+    def replace(self, problem_id: int, test_cases: List[Dict[str, str]]) -> int:
+        """Swap in a new set of test cases given as {"input": ..., "output": ...}."""
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        try:
+            for index, test_case in enumerate(test_cases, 1):
+                for kind, ext in KINDS.items():
+                    with open(os.open(os.path.join(staging, f"{index}.{ext}"), os.O_WRONLY | os.O_CREAT, 0o600),
+                              "w", encoding="utf-8") as f:
+                        f.write(test_case.get(kind, ""))
+            self.delete(problem_id)
+            os.rename(staging, self._dir(problem_id))
+            staging = None
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+        return len(test_cases)
+
+    async def write_stream(self, problem_id: int, index: int, kind: str, chunks: AsyncIterator[bytes]) -> int:
+        """Write one test file from an async byte stream (a request body) without buffering it.
+
+        Disk I/O runs in worker threads, WRITE_BUFFER_BYTES at a time, so a
+        large upload doesn't stall the event loop. If the stream fails or is
+        cancelled, the partial file is removed and any previous file is kept.
+        """
+        path = self.path(problem_id, index, kind)
+        partial = f"{path}.part"
+        f = await asyncio.to_thread(self._open_partial, partial)
+        size = 0
+        try:
+            buffer = bytearray()
+            async for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                if len(buffer) >= WRITE_BUFFER_BYTES:
+                    await asyncio.to_thread(f.write, buffer)
+                    buffer = bytearray()
+            await asyncio.to_thread(self._finish_partial, f, buffer, partial, path)
+        except BaseException:
+            # Not awaited: this also runs on cancellation. Closing and unlinking don't wait on data.
+            f.close()
+            if os.path.exists(partial):
+                os.unlink(partial)
+            raise
+        return size
+
+    @staticmethod
+    def _open_partial(partial: str) -> BinaryIO:
+        os.makedirs(os.path.dirname(partial), mode=0o700, exist_ok=True)
+        return open(os.open(partial, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb")
+
+    @staticmethod
+    def _finish_partial(f: BinaryIO, tail: bytes, partial: str, path: str) -> None:
+        with f:
+            f.write(tail)
+        os.replace(partial, path)
+
+    def cases(self, problem_id: int) -> List[Dict[str, str]]:
+        """Test cases with both files present, in index order, as sandbox input/output paths."""
+        try:
+            names = os.listdir(self._dir(problem_id))
+        except FileNotFoundError:
+            return []
+        found: Dict[int, set] = {}
+        for name in names:
+            match = _CASE_FILE.match(name)
+            if match:
+                found.setdefault(int(match.group(1)), set()).add(match.group(2))
+        return [
+            {"input_path": self.path(problem_id, i, "input"), "output_path": self.path(problem_id, i, "output")}
+            for i in sorted(found) if len(found[i]) == 2
+        ]
+
+    def count(self, problem_id: int) -> int:
+        return len(self.cases(problem_id))
+
+    def delete(self, problem_id: int) -> None:
+        shutil.rmtree(self._dir(problem_id), ignore_errors=True)
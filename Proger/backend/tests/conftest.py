@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(BACKEND)), "common"))
+
+# Read when sandbox.py is imported: short limits keep the TLE/MLE cases quick,
+# and judging still works on hosts without network namespaces
+os.environ.setdefault("SANDBOX_TIME_LIMIT", "1.0")
+os.environ.setdefault("SANDBOX_WALL_TIME_LIMIT", "2.0")
+os.environ.setdefault("SANDBOX_MEMORY_LIMIT_MB", "128")
+os.environ.setdefault("SANDBOX_NETWORK_ISOLATION", "best-effort")
+# The sandbox uid must be able to run the interpreter; a pyenv one under /root may be off limits
+if os.path.exists("/usr/bin/python3"):
+    os.environ.setdefault("SANDBOX_PYTHON", "/usr/bin/python3")
+os.environ.setdefault("COMPILE_CACHE_DIR", tempfile.mkdtemp(prefix="proger-test-compile-cache-"))
+# main.py opens its stores at import time
+_data = tempfile.mkdtemp(prefix="proger-test-")
+os.environ.setdefault("JUDGE_DB_PATH", os.path.join(_data, "proger.db"))
+os.environ.setdefault("TESTCASE_DIR", os.path.join(_data, "testdata"))
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import shutil
+import stat
+
+import pytest
+
+import sandbox
+from compile_cache import COMPILE_ERROR_FILE, CompileCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CompileCache(str(tmp_path / "cache"), max_bytes=1 << 20)
+
+
+def build(tmp_path, name, size=100):
+    build_dir = tmp_path / f"build-{name}"
+    build_dir.mkdir()
+    (build_dir / "main").write_bytes(b"x" * size)
+    return str(build_dir)
+
+
+def test_cache_key():
+    key = cache_key("c", "gcc 12", ["-O2"], "int main;")
+    assert key == cache_key("c", "gcc 12", ["-O2"], "int main;")
+    assert len({
+        key,
+        cache_key("c", "gcc 13", ["-O2"], "int main;"), # A toolchain upgrade misses
+        cache_key("c", "gcc 12", ["-O0"], "int main;"),
+        cache_key("cpp", "gcc 12", ["-O2"], "int main;"),
+        cache_key("c", "gcc 12", ["-O2"], "int main; "),
+        cache_key("c", "gcc 12", ["-O", "2"], "int main;"),
+    }) == 6
+
+
+def test_store_publishes_atomically(cache, tmp_path):
+    cache.store("k", build(tmp_path, "a"), ["main"])
+    assert os.listdir(cache.root) == ["k"] # No staging directory is left behind
+    assert stat.S_IMODE(os.stat(os.path.join(cache.root, "k", "main")).st_mode) == 0o555
+    # A second build of the same key loses the rename and leaves the first in place
+    build_b = build(tmp_path, "b", 50)
+    cache.store("k", build_b, ["main"])
+    assert os.listdir(cache.root) == ["k"] and os.path.getsize(os.path.join(cache.root, "k", "main")) == 100
+    assert cache.stats()["stores"] == 1
+
+    cache.store("ce", build_b, ["main"], compile_error="error: expected ';'")
+    assert cache.compile_error(cache.lookup("ce")) == "error: expected ';'"
+    assert os.listdir(os.path.join(cache.root, "ce")) == [COMPILE_ERROR_FILE]
+
+
+def test_install_links_the_artifacts(cache, tmp_path):
+    cache.store("k", build(tmp_path, "a"), ["main"])
+    work_dir = tmp_path / "run"
+    work_dir.mkdir()
+    assert cache.install(cache.lookup("k"), ["main"], str(work_dir))
+    shutil.rmtree(os.path.join(cache.root, "k")) # Evicted after the install: the link survives
+    assert (work_dir / "main").read_bytes() == b"x" * 100
+
+
+def test_eviction_removes_least_recently_used(cache, tmp_path):
+    cache.max_bytes = 350
+    for age, key in enumerate(("old", "middle", "new")):
+        cache.store(key, build(tmp_path, key), ["main"])
+        os.utime(os.path.join(cache.root, key), (1000 + age, 1000 + age))
+    assert cache.lookup("old") is not None # A hit makes it the most recently used
+    cache.store("newest", build(tmp_path, "newest"), ["main"])
+    assert sorted(os.listdir(cache.root)) == ["new", "newest", "old"]
+    cache.max_bytes = 150
+    cache.evict()
+    assert os.listdir(cache.root) == ["newest"]
+    assert cache.stats()["evictions"] == 3
+
+
+def test_install_after_eviction_is_a_miss(cache, tmp_path):
+    build_dir = build(tmp_path, "a")
+    (tmp_path / "build-a" / "data").write_bytes(b"table")
+    cache.store("k", build_dir, ["data", "main"])
+    entry = cache.lookup("k")
+    os.unlink(os.path.join(entry, "main")) # Evicted by another process, halfway through
+    work_dir = tmp_path / "run"
+    work_dir.mkdir()
+    assert not cache.install(entry, ["data", "main"], str(work_dir))
+    assert os.listdir(work_dir) == [] # Nothing half-installed
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is not installed")
+def test_judge_rebuilds_when_the_entry_is_evicted_after_lookup(monkeypatch):
+    code = '#include <stdio.h>\nint main(void) { puts("evicted"); return 0; }'
+    cases = [{"input": "", "output": "evicted\n"}]
+    first = asyncio.run(sandbox.execute_code_in_sandbox("c", code, cases))
+    assert (first["verdict"], first["compile_cached"]) == ("AC", False)
+
+    lookup = sandbox.compile_cache.lookup
+
+    def lookup_then_evict(key):
+        entry = lookup(key)
+        if entry is not None:
+            shutil.rmtree(entry)
+        return entry
+
+    monkeypatch.setattr(sandbox.compile_cache, "lookup", lookup_then_evict)
+    result = asyncio.run(sandbox.execute_code_in_sandbox("c", code, cases))
+    assert (result["verdict"], result["compile_cached"]) == ("AC", False)
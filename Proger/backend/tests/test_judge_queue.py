@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from judge_queue import JudgeQueue, QueueFullError
+
+
+class Judge:
+    """Records the order submissions are judged in; each one waits for its gate."""
+
+    def __init__(self, followup=False):
+        self.order = []
+        self.gates = {}
+        self.followup = followup
+        self.reviews = {}
+
+    def gate(self, submission_id):
+        return self.gates.setdefault(submission_id, asyncio.Event())
+
+    async def __call__(self, record, publish):
+        self.order.append(record["id"])
+        result = {"test_case_id": 1, "verdict": "AC"}
+        record["test_results"].append(result) # As main.judge_submission() does
+        publish("test", result)
+        await self.gate(record["id"]).wait()
+        publish("verdict", {"verdict": "AC"})
+        if not self.followup:
+            return None
+        publish("status", {"status": "reviewing"})
+        review = self.reviews[record["id"]] = asyncio.Event()
+
+        async def follow_up():
+            await review.wait()
+            publish("review", {"score": 100})
+
+        return follow_up()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_lower_priority_values_go_first():
+    async def run():
+        judge = Judge()
+        queue = JudgeQueue(judge, workers=1, max_depth=10)
+        queue.start()
+        queue.submit({"id": 1})
+        await settle() # 1 is being judged; the rest wait behind it
+        for submission_id, priority in ((2, 10), (3, 0), (4, 10), (5, 0)):
+            queue.submit({"id": submission_id}, priority)
+        for submission_id in (1, 3, 5, 2, 4):
+            judge.gate(submission_id).set()
+            await settle()
+        await queue.stop()
+        return judge.order
+
+    # Live submissions (priority 0) overtake queued rejudges (10); FIFO within a priority
+    assert asyncio.run(run()) == [1, 3, 5, 2, 4]
+
+
+def test_follow_up_runs_after_the_verdict():
+    async def run():
+        judge = Judge(followup=True)
+        events = []
+        queue = JudgeQueue(judge, workers=1, max_depth=10, on_event=lambda record, event, data: events.append((record["id"], event)))
+        queue.start()
+        queue.submit({"id": 1})
+        queue.submit({"id": 2})
+        judge.gate(1).set()
+        await settle()
+        # The worker moved on to 2 while 1 waits for its review
+        assert judge.order == [1, 2]
+        assert queue.get(1)["status"] == "reviewing" and queue.get(1)["finished_at"] is None
+        assert queue.stats()["following_up"] == 1
+        assert (1, "done") not in events
+        judge.reviews[1].set()
+        await settle()
+        assert [e for i, e in events if i == 1] == ["status", "test", "verdict", "status", "review", "status", "done"]
+        assert queue.get(1) is None
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_subscriber_gets_a_snapshot_of_earlier_events():
+    async def run():
+        judge = Judge()
+        queue = JudgeQueue(judge, workers=1, max_depth=10)
+        queue.start()
+        queue.submit({"id": 1})
+        await settle() # The first test result is already published
+        received = []
+
+        async def listen():
+            async for event, data in queue.subscribe(1):
+                received.append((event, data if event != "snapshot" else dict(data, test_results=list(data["test_results"]))))
+
+        listener = asyncio.create_task(listen())
+        await settle()
+        judge.gate(1).set()
+        await asyncio.wait_for(listener, 1)
+        await queue.stop()
+        return received
+
+    received = asyncio.run(run())
+    event, snapshot = received[0]
+    assert event == "snapshot" and snapshot["status"] == "judging"
+    assert snapshot["test_results"] == [{"test_case_id": 1, "verdict": "AC"}]
+    assert [event for event, _ in received[1:]] == ["verdict", "status", "done"]
+
+
+def test_subscribe_after_finishing_yields_nothing():
+    async def run():
+        judge = Judge()
+        queue = JudgeQueue(judge, workers=1, max_depth=10)
+        queue.start()
+        queue.submit({"id": 1})
+        judge.gate(1).set()
+        await settle()
+        events = [event async for event in queue.subscribe(1)]
+        await queue.stop()
+        return events
+
+    # The SSE endpoint then follows the submission through the store
+    assert asyncio.run(run()) == []
+
+
+def test_finished_records_are_released():
+    async def run():
+        async def judge(record, publish):
+            if record["id"] == 2:
+                raise RuntimeError("boom")
+
+        def on_event(record, event, data):
+            if record["id"] == 3 and event == "done":
+                raise OSError("disk full")
+
+        queue = JudgeQueue(judge, workers=2, max_depth=10, on_event=on_event)
+        queue.start()
+        records = [queue.submit({"id": i}) for i in (1, 2, 3)]
+        await settle()
+        stats = queue.stats()
+        await queue.stop()
+        return records, stats
+
+    records, stats = asyncio.run(run())
+    assert [r["status"] for r in records] == ["done", "failed", "done"]
+    assert records[1]["error"] == "Judge failed: boom"
+    assert stats["tracked"] == 0 and stats["running"] == 0
+
+
+def test_submit_raises_when_full():
+    async def run():
+        queue = JudgeQueue(Judge(), workers=1, max_depth=2) # Not started: nothing leaves the queue
+        queue.submit({"id": 1})
+        queue.submit({"id": 2})
+        assert queue.full()
+        with pytest.raises(QueueFullError):
+            queue.submit({"id": 3})
+        assert queue.get(3) is None
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def problem_id():
+    return main.judge_store.create_problem({
+        "title": "A + B", "description": "", "input_format": "", "output_format": "",
+        "sample_input": "", "sample_output": "", "float_tolerance": None,
+    })["id"]
+
+
+def test_submit_returns_503_when_the_queue_is_full(problem_id, monkeypatch):
+    queue = JudgeQueue(Judge(), workers=1, max_depth=1)
+    monkeypatch.setattr(main, "judge_queue", queue)
+    client = TestClient(main.app) # No lifespan: the queue has no workers and stays full
+    submission = {"problem_id": problem_id, "language": "c", "code": "int main(void) { return 0; }"}
+    assert client.post("/submit", json=submission).status_code == 202
+    response = client.post("/submit", json=submission)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(main.JUDGE_RETRY_AFTER)
+
+    # Filled up between the check and submit(): the stored submission is removed again
+    monkeypatch.setattr(queue, "full", lambda: False)
+    before = main.judge_store.list_submissions(problem_id)
+    response = client.post("/submit", json=submission)
+    assert response.status_code == 503 and response.headers["Retry-After"] == str(main.JUDGE_RETRY_AFTER)
+    assert main.judge_store.list_submissions(problem_id) == before
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from judge_store import JudgeStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JudgeStore(str(tmp_path / "proger.db"))
+
+
+@pytest.fixture
+def problem_id(store):
+    return store.create_problem({
+        "title": "A + B", "description": "", "input_format": "", "output_format": "",
+        "sample_input": "", "sample_output": "", "float_tolerance": None,
+    })["id"]
+
+
+def owned_submission(store, problem_id, owner, status):
+    record = store.create_submission({"problem_id": problem_id, "language": "c", "code": "", "code_hash": ""})
+    store.update_submission(record["id"], {"owner": owner, "status": status})
+    store.add_test_result(record["id"], {"test_case_id": 1, "verdict": "AC"})
+    return record["id"]
+
+
+def test_claim_orphans(store, problem_id):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    try:
+        orphan = owned_submission(store, problem_id, dead.pid, "judging")
+        reviewing = owned_submission(store, problem_id, dead.pid, "reviewing")
+        ours = owned_submission(store, problem_id, os.getpid(), "queued") # Left by this pid's previous life
+        alive = owned_submission(store, problem_id, live.pid, "judging")
+        finished = owned_submission(store, problem_id, dead.pid, "done")
+
+        claimed = store.claim_orphans()
+        assert sorted(r["id"] for r in claimed) == [orphan, reviewing, ours]
+        for record in claimed:
+            assert (record["owner"], record["status"], record["test_results"]) == (os.getpid(), "queued", [])
+        untouched = store.get_submission(alive)
+        assert (untouched["owner"], untouched["status"], len(untouched["test_results"])) == (live.pid, "judging", 1)
+        assert store.get_submission(finished)["status"] == "done"
+    finally:
+        live.kill()
+        live.wait()
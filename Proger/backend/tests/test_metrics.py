@@ -0,0 +1,95 @@
+import asyncio
+import os
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import metrics
+
+SAMPLE = re.compile(r'^(\w+)\{([^}]*)\} (\S+)$')
+
+
+def samples(text):
+    """{(name, frozenset of labels): value} of every sample line, checking the pid label on each."""
+    result = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', labels))
+        assert labels.pop("pid") == str(os.getpid()), line
+        result[name, frozenset(labels.items())] = float(value)
+    return result
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    for name in ("errors", "cancelled", "reviews"):
+        registry.counter(name, name)
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+
+def test_histogram_and_quantiles(registry):
+    for seconds in (0.0005, 0.003, 0.003, 0.2, 100.0):
+        registry.observe("compile", seconds)
+    registry.inc("reviews", outcome="cached")
+    registry.inc("reviews", 2, outcome="reviewed")
+    registry.gauge("judge_queue", "queue", lambda: [({"state": "queued"}, 3), ({"state": 'we"ird'}, 1.5)])
+    text = registry.render()
+    assert "# TYPE proger_stage_duration_seconds histogram" in text
+    values = samples(text)
+
+    def bucket(le):
+        return values["proger_stage_duration_seconds_bucket", frozenset({("stage", "compile"), ("le", le)})]
+
+    # Cumulative counts; the 100s sample only shows up in +Inf
+    assert [bucket(le) for le in ("0.001", "0.0025", "0.005", "0.1", "0.25", "60", "+Inf")] == [1, 1, 3, 3, 4, 4, 5]
+    assert values["proger_stage_duration_seconds_count", frozenset({("stage", "compile")})] == 5
+    assert values["proger_stage_duration_seconds_sum", frozenset({("stage", "compile")})] == pytest.approx(100.2065)
+    quantile = {q: values["proger_stage_duration_quantile_seconds", frozenset({("stage", "compile"), ("quantile", q)})]
+                for q in ("0.5", "0.95", "0.99")}
+    assert quantile == {"0.5": 0.003, "0.95": 100.0, "0.99": 100.0}
+    assert values["proger_reviews_total", frozenset({("outcome", "reviewed")})] == 2
+    assert values["proger_judge_queue", frozenset({("state", 'we\\"ird')})] == 1.5
+    assert values["proger_process_info", frozenset()] == 1
+
+
+def test_span_counts_errors_and_cancellations_apart(registry):
+    trace = metrics.Trace()
+    with metrics.span("compile", trace):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("compile", trace):
+            raise ValueError
+
+    async def disconnected():
+        with metrics.span("review", trace):
+            await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(disconnected())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    values = samples(registry.render())
+    assert values["proger_errors_total", frozenset({("stage", "compile")})] == 1
+    assert ("proger_errors_total", frozenset({("stage", "review")})) not in values
+    assert values["proger_cancelled_total", frozenset({("stage", "review")})] == 1
+    assert values["proger_stage_duration_seconds_count", frozenset({("stage", "compile")})] == 2
+    assert ("proger_stage_duration_seconds_count", frozenset({("stage", "review")})) not in values
+    assert [s.get("cancelled", False) for s in trace.as_dict()["spans"]] == [False, False, True]
+
+
+def test_metrics_endpoint():
+    response = TestClient(main.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    names = {name for name, _ in samples(response.text)} # Every series carries this worker's pid
+    assert {"proger_judge_queue", "proger_cache_entries", "proger_process_info"} <= names
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import shutil
+import stat
+import tempfile
+
+import pytest
+
+import sandbox
+import testcase_store
+
+
+@pytest.fixture
+def compare(tmp_path):
+    def compare(actual: bytes, expected: bytes, float_tolerance=None) -> bool:
+        (tmp_path / "actual").write_bytes(actual)
+        (tmp_path / "expected").write_bytes(expected)
+        return sandbox.outputs_match(str(tmp_path / "actual"), str(tmp_path / "expected"), float_tolerance)
+    return compare
+
+
+def test_whitespace_is_ignored(compare):
+    assert compare(b"1 2\n3\n", b"1\t2 3")
+    assert compare(b"", b"\n\n")
+    assert not compare(b"1 2", b"1 2 3")
+    assert not compare(b"12", b"1 2")
+
+
+def test_exact_without_tolerance(compare):
+    assert compare(b"0.5\n", b"0.5\n")
+    assert not compare(b"0.5000001\n", b"0.5\n")
+
+
+def test_float_tolerance(compare):
+    assert compare(b"3.1415927\n", b"3.14159265\n", 1e-6)
+    assert not compare(b"3.1416\n", b"3.14159265\n", 1e-6)
+    # Relative error for large values, absolute error below 1
+    assert compare(b"1000000.5\n", b"1000000\n", 1e-6)
+    assert not compare(b"0.0000015\n", b"0.0000000\n", 1e-6)
+    assert compare(b"1e-7\n", b"0\n", 1e-6)
+
+
+def test_float_tolerance_only_applies_to_numbers(compare):
+    assert not compare(b"yes\n", b"Yes\n", 1e-6)
+    assert not compare(b"nan\n", b"1.0\n", 1e-6)
+
+
+def test_tokens_split_across_blocks(compare, monkeypatch):
+    monkeypatch.setattr(sandbox, "COMPARE_BLOCK_BYTES", 4)
+    expected = b" ".join(str(i * 1.5).encode() for i in range(200)) + b"\n"
+    assert compare(expected.replace(b" ", b"\n"), expected)
+    assert compare(expected.replace(b".5", b".5000001"), expected, 1e-6)
+    assert not compare(expected.replace(b"150.0", b"150.1"), expected)
+
+
+def test_store_is_private(tmp_path):
+    store = testcase_store.TestCaseStore(str(tmp_path / "data"))
+    store.replace(1, [{"input": "1\n", "output": "2\n"}])
+    assert stat.S_IMODE(os.stat(store.root).st_mode) == 0o700
+    for case in store.cases(1):
+        for path in (case["input_path"], case["output_path"]):
+            assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+@pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is not installed")
+@pytest.mark.skipif(os.getuid() != 0, reason="the sandbox only switches uid when run as root")
+def test_program_cannot_read_expected_outputs():
+    # pytest's tmp_path is private already; the store's own permissions must do the job
+    root = tempfile.mkdtemp()
+    os.chmod(root, 0o755)
+    store = testcase_store.TestCaseStore(os.path.join(root, "data"))
+    store.replace(1, [{"input": "stored\n", "output": "secret-stored\n"}])
+    # Echo whatever expected output the program can find, from its cwd or the store
+    code = r'''
+#include <stdio.h>
+int main(void) {
+    const char *paths[] = {"0.ans", "0.out", "%s/1/1.out"};
+    char buf[256];
+    for (int i = 0; i < 3; i++) {
+        FILE *f = fopen(paths[i], "r");
+        if (f && fgets(buf, sizeof buf, f)) { fputs(buf, stdout); return 0; }
+    }
+    puts("nothing");
+    return 0;
+}
+'''.replace("%s", store.root)
+
+    async def judge(test_cases):
+        return await sandbox.execute_code_in_sandbox("c", code, test_cases)
+
+    try:
+        inline = asyncio.run(judge([{"input": "inline\n", "output": "secret-inline\n"}]))
+        stored = asyncio.run(judge(store.cases(1)))
+    finally:
+        shutil.rmtree(root)
+    assert inline["verdict"] == "WA" and inline["details"][0]["output"] == "nothing\n"
+    assert stored["verdict"] == "WA" and stored["details"][0]["output"] == "nothing\n"
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+import rejudge
+from judge_store import JudgeStore
+from rejudge import Rejudger
+import testcase_store
+
+FAST = "fast code"
+SLOW = "slow code"
+
+
+@pytest.fixture
+def stores(tmp_path):
+    store = JudgeStore(str(tmp_path / "proger.db"))
+    testcases = testcase_store.TestCaseStore(str(tmp_path / "testdata"))
+    problem = store.create_problem({
+        "title": "A + B", "description": "", "input_format": "", "output_format": "",
+        "sample_input": "", "sample_output": "", "float_tolerance": None,
+    })
+    testcases.replace(problem["id"], [{"input": "1 2\n", "output": "3\n"}, {"input": "2 2\n", "output": "4\n"}])
+    return store, testcases, problem
+
+
+@pytest.fixture
+def sandbox_runs(monkeypatch):
+    """Stand-in sandbox: FAST now passes both test cases, SLOW times out on the second."""
+    runs = []
+
+    async def execute(language, code, test_cases, float_tolerance=None, priority=0):
+        runs.append((code, priority, [case["input_path"] for case in test_cases]))
+        verdicts = ["AC", "AC"] if code == FAST else ["AC", "TLE"]
+        details = [{"test_case_id": i + 1, "verdict": v} for i, v in enumerate(verdicts)]
+        verdict = "AC" if code == FAST else "TLE"
+        return {"success": verdict == "AC", "verdict": verdict, "details": details}
+
+    monkeypatch.setattr(rejudge, "execute_code_in_sandbox", execute)
+    return runs
+
+
+def submit(store, problem, code, verdict, status="done"):
+    record = store.create_submission({"problem_id": problem["id"], "language": "c", "code": code, "code_hash": ""})
+    store.update_submission(record["id"], {"status": status, "verdict": verdict})
+    return record["id"]
+
+
+def run_rejudge(store, testcases, **selection):
+    async def run():
+        rejudger = Rejudger(store, testcases, concurrency=2, priority=10)
+        started = await rejudger.start(**selection)
+        await asyncio.gather(*rejudger._tasks)
+        return started
+    return asyncio.run(run())
+
+
+def test_identical_programs_are_judged_once(stores, sandbox_runs):
+    store, testcases, problem = stores
+    unchanged = submit(store, problem, FAST, "AC")
+    was_wrong = submit(store, problem, FAST, "WA")
+    now_slow = submit(store, problem, SLOW, "AC")
+    still_queued = submit(store, problem, FAST, None, status="queued")
+
+    started = run_rejudge(store, testcases, problem_id=problem["id"])
+    assert (started["submissions"], started["programs"]) == (3, 2)
+    assert sorted(code for code, _, _ in sandbox_runs) == [FAST, SLOW]
+    assert all(priority == 10 and len(paths) == 2 for _, priority, paths in sandbox_runs)
+
+    for submission_id, verdict in ((unchanged, "AC"), (was_wrong, "AC"), (now_slow, "TLE")):
+        record = store.get_submission(submission_id)
+        assert record["verdict"] == verdict
+        assert record["execution"]["verdict"] == verdict
+        assert [r["test_case_id"] for r in record["test_results"]] == [1, 2]
+    assert store.get_submission(still_queued)["verdict"] is None
+
+    result = store.get_rejudge(started["id"])
+    assert (result["status"], result["programs_done"], result["submissions_done"]) == ("done", 2, 3)
+    assert result["changes"] == [
+        {"submission_id": was_wrong, "old_verdict": "WA", "new_verdict": "AC"},
+        {"submission_id": now_slow, "old_verdict": "AC", "new_verdict": "TLE"},
+    ]
+    assert result["transitions"] == {"WA->AC": 1, "AC->TLE": 1}
+
+
+def test_rejudge_selected_submissions(stores, sandbox_runs):
+    store, testcases, problem = stores
+    first = submit(store, problem, FAST, "WA")
+    submit(store, problem, SLOW, "AC")
+    started = run_rejudge(store, testcases, submission_ids=[first])
+    assert [code for code, _, _ in sandbox_runs] == [FAST]
+    assert store.get_rejudge(started["id"])["changed"] == 1
+
+
+def test_failed_rejudge_is_recorded(stores, monkeypatch):
+    store, testcases, problem = stores
+    submit(store, problem, FAST, "AC")
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("sandbox exploded")
+
+    monkeypatch.setattr(rejudge, "execute_code_in_sandbox", broken)
+    started = run_rejudge(store, testcases, problem_id=problem["id"])
+    result = store.get_rejudge(started["id"])
+    assert (result["status"], result["error"], result["changed"]) == ("failed", "sandbox exploded", 0)
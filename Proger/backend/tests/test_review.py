@@ -0,0 +1,108 @@
+import asyncio
+import json
+import shutil
+import time
+
+import httpx
+import pytest
+
+import main
+
+ADD = r'''
+#include <stdio.h>
+int main(void) { long a, b; scanf("%ld %ld", &a, &b); printf("%ld\n", a + b); return 0; }
+'''
+REVIEW = {"score": 90, "comments": "Fine.", "improvements": []}
+
+pytestmark = pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is not installed")
+
+
+@pytest.fixture
+def problem():
+    row = main.judge_store.create_problem({
+        "title": "A + B", "description": "Add two numbers.", "input_format": "a b", "output_format": "a + b",
+        "sample_input": "1 2", "sample_output": "3", "float_tolerance": None,
+    })
+    main.testcase_store.replace(row["id"], [{"input": "1 2\n", "output": "3\n"}, {"input": "2 2\n", "output": "4\n"}])
+    return row
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Stand-in for the LLM server; records the judge events seen at each call."""
+    calls = []
+
+    async def post(payload, url=None, retries=None):
+        calls.append(list(events))
+        if fail:
+            raise httpx.ConnectError("LLM server down")
+        body = {"choices": [{"message": {"content": json.dumps(REVIEW)}}]}
+        return httpx.Response(200, json=body, request=httpx.Request("POST", main.LLM_API_URL))
+
+    events = []
+    fail = []
+    monkeypatch.setattr(main.llm_gateway, "post", post)
+    main.review_cache._entries.clear()
+    return calls, events, fail
+
+
+def judge(problem, code, events):
+    async def run():
+        record = {"id": int(time.time() * 1e6), "problem_id": problem["id"], "language": "c", "code": code,
+                  "created_at": time.time(), "test_results": []}
+        followup = await main.judge_submission(record, lambda event, data: events.append(event))
+        await followup
+        return record
+    return asyncio.run(run())
+
+
+def test_one_review_call(problem, llm):
+    calls, events, _ = llm
+    record = judge(problem, ADD, events)
+    assert record["verdict"] == "AC"
+    assert record["review"]["score"] == 90
+    assert record["review"]["execution_details"]["verdict"] == "AC"
+    assert len(calls) == 1
+    assert events.index("verdict") < events.index("review")
+
+
+def test_review_starts_before_the_sandbox_finishes(problem, llm, monkeypatch):
+    calls, events, _ = llm
+    execute = main.execute_code_in_sandbox
+
+    async def slow_sandbox(**kwargs):
+        # Finishes only once the LLM has been asked; a review started after the verdict would time out here
+        for _ in range(200):
+            if calls:
+                break
+            await asyncio.sleep(0.01)
+        assert calls, "the review did not start while the sandbox ran"
+        return await execute(**kwargs)
+
+    monkeypatch.setattr(main, "execute_code_in_sandbox", slow_sandbox)
+    record = judge(problem, ADD, events)
+    assert calls == [[]] # No judge events yet when the LLM was called
+    assert record["review"]["score"] == 90
+    assert record["review"]["execution_details"]["test_results"] == record["test_results"]
+
+
+def test_resubmission_reuses_the_review(problem, llm):
+    calls, events, _ = llm
+    judge(problem, ADD, events)
+    record = judge(problem, ADD.replace("\n", "\r\n") + "\n\n", events)
+    assert record["review"]["score"] == 90
+    assert len(calls) == 1
+    # Different code: reviewed again
+    judge(problem, ADD.replace("a + b", "a - b"), events)
+    assert len(calls) == 2
+
+
+def test_failed_review_is_not_cached(problem, llm):
+    calls, events, fail = llm
+    fail.append(True)
+    record = judge(problem, ADD, events)
+    assert record["review"]["comments"].startswith("LLM API request failed")
+    fail.clear()
+    record = judge(problem, ADD, events)
+    assert record["review"]["score"] == 90
+    assert len(calls) == 2
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import socket
+
+import pytest
+
+import sandbox
+
+needs_gcc = pytest.mark.skipif(shutil.which("gcc") is None, reason="gcc is not installed")
+needs_gxx = pytest.mark.skipif(shutil.which("g++") is None, reason="g++ is not installed")
+needs_root = pytest.mark.skipif(os.getuid() != 0, reason="the sandbox only switches uid when run as root")
+
+ADD = r'''
+#include <stdio.h>
+int main(void) { long a, b; scanf("%ld %ld", &a, &b); printf("%ld\n", a + b); return 0; }
+'''
+CASES = [{"input": "1 2\n", "output": "3\n"}, {"input": "20 22\n", "output": "42\n"}]
+
+
+def judge(language, code, test_cases=CASES):
+    return asyncio.run(sandbox.execute_code_in_sandbox(language, code, test_cases))
+
+
+@needs_gcc
+def test_accepted():
+    result = judge("c", ADD)
+    assert result["verdict"] == "AC"
+    assert [r["verdict"] for r in result["details"]] == ["AC", "AC"]
+
+
+@needs_gcc
+def test_wrong_answer():
+    result = judge("c", ADD.replace("a + b", "a + b + 1"))
+    assert result["verdict"] == "WA"
+    assert not result["success"]
+
+
+@needs_gcc
+def test_cpu_time_limit():
+    result = judge("c", "int main(void) { for (volatile int i = 0;; i++); }", CASES[:1])
+    assert result["verdict"] == "TLE"
+
+
+@needs_gcc
+def test_wall_time_limit():
+    result = judge("c", "#include <unistd.h>\nint main(void) { sleep(30); return 0; }", CASES[:1])
+    assert result["verdict"] == "TLE"
+    assert result["details"][0]["wall_time"] < 10
+
+
+@needs_gxx
+def test_memory_limit():
+    code = r'''
+#include <cstdio>
+#include <vector>
+int main() { std::vector<char> v(1u << 30, 1); std::printf("%d\n", v[12345]); }
+'''
+    result = judge("cpp", code, CASES[:1])
+    assert result["verdict"] == "MLE"
+
+
+@needs_gcc
+def test_runtime_error():
+    result = judge("c", "int main(void) { volatile int *p = 0; return *p; }", CASES[:1])
+    assert result["verdict"] == "RE"
+
+
+@needs_gcc
+def test_compile_error():
+    result = judge("c", "int main(void) { return missing; }")
+    assert result["verdict"] == "CE"
+    assert "missing" in result["error"]
+
+
+def test_unsupported_language():
+    assert judge("cobol", "")["verdict"] == "IE"
+
+
+@needs_gcc
+@needs_root
+def test_program_runs_as_sandbox_uid():
+    code = '#include <stdio.h>\n#include <unistd.h>\nint main(void) { printf("%d\\n", (int)getuid()); return 0; }'
+    result = judge("c", code, [{"input": "", "output": f"{sandbox.SANDBOX_UID}\n"}])
+    assert result["verdict"] == "AC"
+
+
+@needs_gcc
+@needs_root
+def test_program_cannot_write_its_cwd():
+    # Test cases must not be able to leave files for each other; checked on a
+    # compile-cache miss and again on the hit
+    code = r'''
+#include <stdio.h>
+int main(void) { FILE *f = fopen("planted.txt", "w"); puts(f ? "writable" : "read-only"); return 0; }
+'''
+    for cached in (False, True):
+        result = judge("c", code, [{"input": "", "output": "read-only\n"}] * 2)
+        assert result["compile_cached"] is cached
+        assert result["verdict"] == "AC", result["details"][0]["output"]
+
+
+@needs_gcc
+def test_no_network(monkeypatch):
+    monkeypatch.setattr(sandbox, "NETWORK_ISOLATION", "required")
+    try:
+        sandbox.check_network_isolation()
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    code = r'''
+#include <arpa/inet.h>
+#include <stdio.h>
+#include <sys/socket.h>
+int main(void) {
+    int port; scanf("%d", &port);
+    struct sockaddr_in addr = {.sin_family = AF_INET, .sin_port = htons(port)};
+    inet_pton(AF_INET, "127.0.0.1", &addr.sin_addr);
+    int fd = socket(AF_INET, SOCK_STREAM, 0);
+    puts(fd >= 0 && connect(fd, (struct sockaddr *)&addr, sizeof addr) == 0 ? "connected" : "blocked");
+    return 0;
+}
+'''
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        result = judge("c", code, [{"input": f"{port}\n", "output": "blocked\n"}])
+    assert result["verdict"] == "AC", result["details"][0]["output"]
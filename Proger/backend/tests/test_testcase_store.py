@@ -0,0 +1,75 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+import testcase_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    return testcase_store.TestCaseStore(str(tmp_path / "data"))
+
+
+async def body(*chunks, error=None):
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+    if error is not None:
+        raise error
+
+
+def files(store, problem_id):
+    return sorted(os.listdir(os.path.join(store.root, str(problem_id))))
+
+
+def test_write_stream(store, monkeypatch):
+    monkeypatch.setattr(testcase_store, "WRITE_BUFFER_BYTES", 8)
+    writers = set()
+    write = testcase_store.TestCaseStore._finish_partial
+
+    def finish(*args):
+        writers.add(threading.current_thread())
+        return write(*args)
+
+    monkeypatch.setattr(testcase_store.TestCaseStore, "_finish_partial", staticmethod(finish))
+    chunks = [b"%d\n" % i for i in range(100)]
+    size = asyncio.run(store.write_stream(1, 1, "input", body(*chunks)))
+    assert size == len(b"".join(chunks))
+    with open(store.path(1, 1, "input"), "rb") as f:
+        assert f.read() == b"".join(chunks)
+    assert threading.main_thread() not in writers
+    assert files(store, 1) == ["1.in"]
+
+
+def test_cut_off_stream_leaves_the_previous_file(store):
+    store.replace(1, [{"input": "old\n", "output": "old answer\n"}])
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(store.write_stream(1, 1, "output", body(b"new", b" answer", error=ConnectionResetError())))
+    assert files(store, 1) == ["1.in", "1.out"]
+    with open(store.path(1, 1, "output")) as f:
+        assert f.read() == "old answer\n"
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(store.write_stream(2, 1, "input", body(b"x" * 100, error=ConnectionResetError())))
+    assert files(store, 2) == []
+
+
+def test_cancelled_upload_is_removed(store):
+    async def run():
+        started = asyncio.Event()
+
+        async def stalled():
+            yield b"partial data"
+            started.set()
+            await asyncio.Event().wait() # The client stops sending
+
+        task = asyncio.create_task(store.write_stream(1, 2, "input", stalled()))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert files(store, 1) == []
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import shutil
+
+import pytest
+
+import sandbox
+
+pytestmark = pytest.mark.skipif(shutil.which(sandbox.PYTHON_COMMAND) is None, reason="no python3 for submissions")
+
+# What a run can see of the interpreter it was forked from
+PROBE = r'''
+import gc, json, math, os, resource, sys
+import collections
+print(json.dumps({
+    "warm": "heapq" in sys.modules, # Imported by the zygote, not by this script
+    "main": __name__,
+    "pi": math.pi,
+    "marker": hasattr(collections, "planted"),
+    "recursion": sys.getrecursionlimit(),
+    "path0": sys.path[0],
+    "argv": sys.argv,
+    "cpu": resource.getrlimit(resource.RLIMIT_CPU),
+    "as": resource.getrlimit(resource.RLIMIT_AS),
+    "nofile": resource.getrlimit(resource.RLIMIT_NOFILE)[0],
+    "gc": gc.isenabled(),
+    "uid": os.getuid(),
+    "env": sorted(os.environ),
+}))
+'''
+# Leaves behind everything it can, for the next run to trip over
+POLLUTE = r'''
+import collections, math, resource, sys
+math.pi = 3
+collections.planted = True
+sys.setrecursionlimit(50)
+resource.setrlimit(resource.RLIMIT_NOFILE, (16, resource.getrlimit(resource.RLIMIT_NOFILE)[1]))
+import os; os.environ["LEAK"] = "1"
+print("ok")
+'''
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(sandbox, "PYTHON_POOL_SIZE", 1) # Every run forks from the same zygote
+    assert sandbox.start_python_pool() == 1
+    yield
+    sandbox.stop_python_pool()
+
+
+def run(code, expected=None):
+    case = {"input": "", "output": expected if expected is not None else ""}
+    return asyncio.run(sandbox.execute_code_in_sandbox("python3", code, [case]))
+
+
+def probe():
+    result = run(PROBE)
+    assert result["details"][0]["verdict"] in ("AC", "WA"), result
+    return json.loads(result["details"][0]["output"])
+
+
+def test_runs_are_isolated_from_earlier_runs(pool):
+    before = probe()
+    assert before["warm"] and before["main"] == "__main__"
+    assert run(POLLUTE, "ok\n")["verdict"] == "AC"
+    after = probe()
+    assert after == {**before, "path0": after["path0"]} # Only the run directory differs
+    assert after["pi"] == pytest.approx(3.14159, abs=1e-5)
+    assert not after["marker"] and after["recursion"] == before["recursion"]
+    assert "LEAK" not in after["env"] and after["argv"] == ["main.py"]
+
+
+def test_limits_are_set_per_run(pool):
+    info = probe()
+    # The zygote itself runs unlimited; each fork gets the submission's limits
+    cpu = max(1, int(sandbox.TIME_LIMIT + 0.999))
+    assert info["cpu"] == [cpu, cpu + 1]
+    assert info["as"][0] != -1
+    assert info["gc"]
+    if os.getuid() == 0:
+        assert info["uid"] == sandbox.SANDBOX_UID
+
+
+def test_time_limit_in_a_forked_run(pool):
+    assert run("while True: pass\n")["verdict"] == "TLE"
+    assert probe()["warm"] # The zygote survived the killed run
+
+
+def test_dead_zygote_is_replaced(pool):
+    runner = sandbox._zygotes.get()
+    runner.proc.kill()
+    runner.proc.wait()
+    sandbox._zygotes.put(runner)
+    assert run("print(sum(range(10)))\n", "45\n")["verdict"] == "AC"
+    replacement = sandbox._zygotes.get()
+    sandbox._zygotes.put(replacement)
+    assert replacement is not runner and replacement.alive()
+    assert sandbox._zygote_count == 1 and sandbox._zygotes.qsize() == 1
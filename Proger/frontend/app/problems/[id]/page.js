@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams } from 'next/navigation';
 
 export default function ProblemDetailPage() {
@@ -12,6 +12,11 @@ export default function ProblemDetailPage() {
   const [language, setLanguage] = useState('python3');
   const [submissionResult, setSubmissionResult] = useState(null);
   const [submitting, setSubmitting] = useState(false);
+  const [judge, setJudge] = useState(null); // { id, status, verdict, testResults } while the judge reports progress
+  const eventsRef = useRef(null);
+
+  // Stop listening to a previous submission when leaving the page
+  useEffect(() => () => eventsRef.current?.close(), []);
 
   useEffect(() => {
     async function fetchProblem() {
@@ -38,10 +43,48 @@ export default function ProblemDetailPage() {
     fetchProblem();
   }, [id]);
 
+  // Follow a queued submission over SSE: per-test verdicts arrive as they finish, the review last
+  const followSubmission = (submissionId) => {
+    eventsRef.current?.close();
+    const events = new EventSource(`http://localhost:8000/submissions/${submissionId}/events`);
+    eventsRef.current = events;
+    const data = (e) => JSON.parse(e.data);
+
+    events.addEventListener('snapshot', (e) => {
+      const record = data(e);
+      setJudge({ id: record.id, status: record.status, verdict: record.verdict, testResults: record.test_results });
+      if (record.review) setSubmissionResult(record.review);
+    });
+    events.addEventListener('status', (e) => {
+      const { status } = data(e);
+      setJudge((j) => ({ ...j, status }));
+    });
+    events.addEventListener('test', (e) => {
+      const result = data(e);
+      setJudge((j) => ({ ...j, testResults: [...j.testResults, result] }));
+    });
+    events.addEventListener('verdict', (e) => {
+      const { verdict } = data(e);
+      setJudge((j) => ({ ...j, verdict }));
+    });
+    events.addEventListener('review', (e) => setSubmissionResult(data(e)));
+    events.addEventListener('done', (e) => {
+      events.close();
+      setSubmitting(false);
+      if (data(e).status === 'failed') setError('Judging failed. Please try again.');
+    });
+    events.onerror = () => {
+      // The stream is gone (backend restarted or unreachable); don't keep reconnecting
+      events.close();
+      setSubmitting(false);
+    };
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setSubmitting(true);
     setSubmissionResult(null);
+    setJudge(null);
     setError(null); // Clear previous errors
 
     try {
@@ -63,10 +106,9 @@ export default function ProblemDetailPage() {
       }
 
       const result = await response.json();
-      setSubmissionResult(result.review);
+      followSubmission(result.submission_id);
     } catch (e) {
       setError(e.message);
-    } finally {
       setSubmitting(false);
     }
   };
@@ -162,12 +204,32 @@ export default function ProblemDetailPage() {
               className="bg-green-600 hover:bg-green-700 text-white font-bold py-4 px-8 rounded-full shadow-lg transition-all duration-300 transform hover:scale-105 focus:outline-none focus:ring-2 focus:ring-green-500 focus:ring-opacity-50 text-lg"
               disabled={submitting}
             >
-              {submitting ? 'Submitting...' : 'Submit Code'}
+              {submitting ? (judge ? `Judging... (${judge.status})` : 'Submitting...') : 'Submit Code'}
             </button>
           </form>
         </div>
       </div>
 
+      {/* Live judge progress, until the review arrives */}
+      {judge && !submissionResult && (
+        <div className="bg-white p-8 rounded-xl shadow-lg border border-gray-200 mt-10">
+          <h2 className="text-2xl font-bold mb-4 text-gray-800 border-b pb-3">
+            Submission #{judge.id}: <span className="text-blue-600">{judge.status}</span>
+            {judge.verdict && (
+              <span className={`ml-4 ${judge.verdict === 'AC' ? 'text-green-600' : 'text-red-600'}`}>{judge.verdict}</span>
+            )}
+          </h2>
+          <ul className="text-sm font-mono text-gray-700 space-y-1">
+            {[...judge.testResults].sort((a, b) => a.test_case_id - b.test_case_id).map((tc) => (
+              <li key={tc.test_case_id}>
+                #{tc.test_case_id}: <span className={tc.verdict === 'AC' ? 'text-green-600' : 'text-red-600'}>{tc.verdict}</span>
+                {' '}({tc.wall_time.toFixed(3)}s, {(tc.peak_rss_kb / 1024).toFixed(1)}MB)
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       {/* AI Review Result Section */}
       {submissionResult && (
         <div className="bg-white p-8 rounded-xl shadow-lg border border-gray-200 mt-10">
@@ -196,6 +258,24 @@ export default function ProblemDetailPage() {
                   <p className="mb-3 text-lg">Success: <span className={`font-semibold ${submissionResult.execution_details.success ? 'text-green-600' : 'text-red-600'}`}>{
                     submissionResult.execution_details.success ? 'Yes' : 'No'
                   }</span></p>
+                  {submissionResult.execution_details.verdict && (
+                    <p className="mb-3 text-lg">Verdict: <span className={`font-semibold ${submissionResult.execution_details.verdict === 'AC' ? 'text-green-600' : 'text-red-600'}`}>{
+                      submissionResult.execution_details.verdict
+                    }</span></p>
+                  )}
+                  {submissionResult.execution_details.test_results && submissionResult.execution_details.test_results.length > 0 && (
+                    <div className="mb-3">
+                      <p className="font-semibold text-lg">Test Cases:</p>
+                      <ul className="text-sm font-mono text-gray-700 space-y-1">
+                        {submissionResult.execution_details.test_results.map((tc) => (
+                          <li key={tc.test_case_id}>
+                            #{tc.test_case_id}: <span className={tc.verdict === 'AC' ? 'text-green-600' : 'text-red-600'}>{tc.verdict}</span>
+                            {' '}({tc.wall_time.toFixed(3)}s, {(tc.peak_rss_kb / 1024).toFixed(1)}MB)
+                          </li>
+                        ))}
+                      </ul>
+                    </div>
+                  )}
                   {submissionResult.execution_details.output && (
                     <div className="mb-3">
                       <p className="font-semibold text-lg">Output:</p>
@@ -0,0 +1,338 @@
+"""Drive the backends at a target concurrency; report throughput, latency and event-loop lag.
+
+Usage: python load_test.py SCENARIO[,SCENARIO...] [--concurrency 16] [--requests 200 | --duration 30]
+                           [--output FILE] [--baseline FILE]
+
+Scenarios, run one after the other (base URLs: --std-card-url, --proger-url, --dita-url):
+
+  card     POST /generate-card/ on std-card
+  submit   POST /submit on Proger, for a small python3 problem created at setup; with
+           --wait a request lasts until the submission is judged and reviewed
+           (followed on /submissions/{id}/events)
+  analyze  POST /analyze-opinion on Dita
+  avatar   POST /invoke-avatar on Dita, answering an opinion posted at setup
+
+--concurrency workers each send their next request as soon as the previous
+one is answered. Request inputs (card queries, code, opinions) differ per
+request and per run, so caches don't help; --distinct N cycles through N of
+them instead.
+
+Event-loop lag is measured on both sides:
+
+  client  how late this process's own timer wakeups are; if it is high the
+          harness, not the backend, is the bottleneck
+  server  latency of GET /llm/stats polled on the backend during the run. It
+          does no I/O, so beyond a local round trip it is time spent waiting
+          for the backend's event loop
+
+Results are written as JSON (git commit, settings, per-scenario numbers and
+the backend's own stats after the run) to --output, by default
+results/<time>.json next to this script. --baseline prints the change
+against an earlier result file. Point the backends at mock_llm.py to run
+without LM Studio.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+LOOP_LAG_INTERVAL = 0.01 # Seconds between the client's timer wakeups
+SERVER_PROBE_INTERVAL = 0.1
+SERVER_PROBE_PATH = "/llm/stats" # Served by every backend, from memory
+
+CARD_TOPICS = ["光合成", "明治維新", "微分", "細胞分裂", "量子力学", "民主主義", "江戸幕府", "化学反応"]
+OPINIONS = [
+    "Remote work makes teams more productive because people can focus without interruptions.",
+    "Cities should ban cars from their centers to make streets safer and quieter.",
+    "AI tutors will replace most homework help within ten years.",
+    "リモートワークは地方の活性化につながると思う。",
+]
+AVATARS = ["ソクラテス", "スティーブ・ジョブズ", "未来の歴史家"]
+
+PROBLEM = {
+    "title": "Load test: sum of a list",
+    "description": "Print the sum of the given integers.",
+    "input_format": "n, then n integers",
+    "output_format": "The sum",
+    "sample_input": "3\n1 2 3\n",
+    "sample_output": "6\n",
+    "test_cases": [
+        {"input": f"{n}\n{' '.join(str(i) for i in range(n))}\n", "output": f"{n * (n - 1) // 2}\n"}
+        for n in (1, 10, 100, 1000)
+    ],
+}
+SUBMISSION_CODE = """\
+import sys
+data = sys.stdin.read().split()
+print(sum(map(int, data[1:1 + int(data[0])])))  # variant {variant}
+"""
+
+
+# --- Scenarios: setup(client, base, args) -> context; request(client, base, args, context, i) -> status ---
+
+async def no_setup(client: httpx.AsyncClient, base: str, args) -> Dict[str, Any]:
+    return {}
+
+
+async def card_request(client, base, args, context, i) -> str:
+    query = f"{CARD_TOPICS[i % len(CARD_TOPICS)]}の要点 ({context['tag']}-{i})"
+    response = await client.post(f"{base}/generate-card/", json={"query": query})
+    return str(response.status_code)
+
+
+async def submit_setup(client, base, args) -> Dict[str, Any]:
+    response = await client.post(f"{base}/problems", json=PROBLEM)
+    response.raise_for_status()
+    return {"problem_id": response.json()["id"]}
+
+
+async def submit_request(client, base, args, context, i) -> str:
+    code = SUBMISSION_CODE.format(variant=f"{context['tag']}-{i}")
+    submission = {"problem_id": context["problem_id"], "language": "python3", "code": code}
+    response = await client.post(f"{base}/submit", json=submission)
+    if response.status_code != 202 or not args.wait:
+        return str(response.status_code)
+    submission_id = response.json()["submission_id"]
+    event = None
+    async with client.stream("GET", f"{base}/submissions/{submission_id}/events") as events:
+        async for line in events.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event == "done":
+                return json.loads(line[len("data:"):])["status"] # done or failed
+    return "unfinished"
+
+
+async def analyze_request(client, base, args, context, i) -> str:
+    text = f"{OPINIONS[i % len(OPINIONS)]} ({context['tag']}-{i})"
+    response = await client.post(f"{base}/analyze-opinion", json={"text": text})
+    return str(response.status_code)
+
+
+async def avatar_setup(client, base, args) -> Dict[str, Any]:
+    response = await client.post(f"{base}/analyze-opinion", json={"text": OPINIONS[0]})
+    response.raise_for_status()
+    return {"parent_node": response.json()["id"]}
+
+
+async def avatar_request(client, base, args, context, i) -> str:
+    response = await client.post(f"{base}/invoke-avatar",
+                                 json={"name": AVATARS[i % len(AVATARS)], "parent_node": context["parent_node"]})
+    return str(response.status_code)
+
+
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "card": {"service": "std_card", "setup": no_setup, "request": card_request, "ok": {"200"},
+             "stats": ["/llm/stats", "/cache/stats"]},
+    "submit": {"service": "proger", "setup": submit_setup, "request": submit_request, "ok": {"202", "done"},
+               "stats": ["/llm/stats", "/judge/stats", "/review-cache/stats"]},
+    "analyze": {"service": "dita", "setup": no_setup, "request": analyze_request, "ok": {"200"},
+                "stats": ["/llm/stats", "/analyze-opinion/batch-stats"]},
+    "avatar": {"service": "dita", "setup": avatar_setup, "request": avatar_request, "ok": {"200"},
+               "stats": ["/llm/stats"]},
+}
+
+
+# --- Measurement ---
+
+def summarize(samples: List[float], quantiles=(0.5, 0.95, 0.99)) -> Dict[str, float]:
+    """Milliseconds: nearest-rank percentiles, mean and max of samples in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    summary = {f"p{int(q * 100)}": ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 for q in quantiles}
+    summary["mean"] = sum(ordered) / len(ordered) * 1000
+    summary["max"] = ordered[-1] * 1000
+    return {k: round(v, 2) for k, v in summary.items()}
+
+
+async def client_loop_lag(samples: List[float]) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        samples.append(max(0.0, time.perf_counter() - started - LOOP_LAG_INTERVAL))
+
+
+async def server_probe(base: str, samples: List[float], failures: List[str]) -> None:
+    # Own client, so the probes never wait behind the load for a pooled connection
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        while True:
+            started = time.perf_counter()
+            try:
+                (await client.get(f"{base}{SERVER_PROBE_PATH}")).raise_for_status()
+                samples.append(time.perf_counter() - started)
+            except httpx.HTTPError as e:
+                failures.append(type(e).__name__)
+            await asyncio.sleep(SERVER_PROBE_INTERVAL)
+
+
+async def run_scenario(name: str, args) -> Dict[str, Any]:
+    scenario = SCENARIOS[name]
+    base = getattr(args, f"{scenario['service']}_url").rstrip("/")
+    request: Callable[..., Awaitable[str]] = scenario["request"]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        # The tag keeps this run's inputs apart from earlier runs' (and whatever they left in caches)
+        context = {"tag": f"{time.time_ns():x}", **await scenario["setup"](client, base, args)}
+        latencies: List[float] = []
+        ok_latencies: List[float] = []
+        statuses: Counter = Counter()
+        lag: List[float] = []
+        probes: List[float] = []
+        probe_failures: List[str] = []
+        counter = itertools.count()
+
+        async def worker():
+            while True:
+                i = next(counter)
+                if args.requests and i >= args.requests:
+                    return
+                if args.duration and time.perf_counter() >= deadline:
+                    return
+                variant = i % args.distinct if args.distinct else i
+                sent = time.perf_counter()
+                try:
+                    status = await request(client, base, args, context, variant)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - sent
+                latencies.append(elapsed)
+                statuses[status] += 1
+                if status in scenario["ok"]:
+                    ok_latencies.append(elapsed)
+
+        monitors = [asyncio.create_task(client_loop_lag(lag)),
+                    asyncio.create_task(server_probe(base, probes, probe_failures))]
+        started = time.perf_counter()
+        deadline = started + (args.duration or 0)
+        try:
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        finally:
+            for task in monitors:
+                task.cancel()
+        duration = time.perf_counter() - started
+
+        server_stats = {}
+        for path in scenario["stats"]:
+            try:
+                response = await client.get(f"{base}{path}")
+                server_stats[path] = response.json() if response.is_success else response.status_code
+            except (httpx.HTTPError, ValueError) as e:
+                server_stats[path] = repr(e)
+
+    return {
+        "url": base,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "ok": len(ok_latencies),
+        "duration_seconds": round(duration, 3),
+        "throughput_rps": round(len(ok_latencies) / duration, 3) if duration else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": summarize(ok_latencies),
+        "latency_all_ms": summarize(latencies),
+        "client_loop_lag_ms": summarize(lag),
+        "server_probe_ms": summarize(probes),
+        "server_probe_failures": dict(Counter(probe_failures)),
+        "server_stats": server_stats,
+    }
+
+
+# --- Reporting ---
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    latency, lag, probe = result["latency_ms"], result["client_loop_lag_ms"], result["server_probe_ms"]
+    print(f"{name}: {result['ok']}/{result['requests']} ok in {result['duration_seconds']:.1f}s "
+          f"({result['throughput_rps']:.2f} req/s) statuses={result['statuses']}")
+    if latency:
+        print(f"  latency      p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms")
+    if probe:
+        print(f"  server probe p50={probe['p50']:.1f}ms p95={probe['p95']:.1f}ms p99={probe['p99']:.1f}ms max={probe['max']:.1f}ms")
+    if lag:
+        print(f"  client lag   p50={lag['p50']:.1f}ms p99={lag['p99']:.1f}ms max={lag['max']:.1f}ms")
+
+
+def print_comparison(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\nvs. baseline {baseline.get('git_commit')} ({baseline.get('started_at')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            print(f"  {name}: not in baseline")
+            continue
+        rows = [("throughput_rps", before["throughput_rps"], result["throughput_rps"])]
+        for section in ("latency_ms", "server_probe_ms"):
+            for q in ("p50", "p95", "p99"):
+                if q in before.get(section, {}) and q in result.get(section, {}):
+                    rows.append((f"{section[:-3]} {q}", before[section][q], result[section][q]))
+        print(f"  {name}:")
+        for label, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            print(f"    {label:20} {old:10.2f} -> {new:10.2f}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", help=f"comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="per scenario; 0 with --duration")
+    parser.add_argument("--duration", type=float, default=0.0, help="seconds per scenario instead of --requests")
+    parser.add_argument("--distinct", type=int, default=0, help="distinct request inputs to cycle through (0: all)")
+    parser.add_argument("--wait", action="store_true", help="submit: wait for the verdict and review")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--std-card-url", default="http://localhost:8000")
+    parser.add_argument("--proger-url", default="http://localhost:8000")
+    parser.add_argument("--dita-url", default="http://localhost:8000")
+    parser.add_argument("--output", help="result file (default: results/<time>.json next to this script)")
+    parser.add_argument("--baseline", help="earlier result file to compare with")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    if args.duration:
+        args.requests = 0
+    elif args.requests <= 0:
+        parser.error("--requests must be positive unless --duration is given")
+
+    started_at = datetime.now(timezone.utc)
+    report = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "settings": vars(args),
+        "scenarios": {},
+    }
+    for name in names:
+        result = asyncio.run(run_scenario(name, args))
+        report["scenarios"][name] = result
+        print_result(name, result)
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                         started_at.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""OpenAI-compatible stand-in for LM Studio, for benchmarking the backends offline.
+
+Usage: python mock_llm.py [--port 1234] [--latency lognormal:0.3,0.5] [--tokens-per-second 40]
+                          [--max-tokens-per-second 400] [--parallel 4] [--error-rate 0.02] ...
+
+Serves POST /v1/chat/completions, plain and streamed ("stream": true), with
+content shaped for whichever backend sent the prompt: std-card cards and
+decks, Proger reviews, Dita analyses (single and micro-batched) and avatar
+replies. Each request is timed like a local LLM server:
+
+  queue        at most --parallel requests are generated at once, the rest wait
+  first token  a sample of the --latency distribution, plus prompt tokens / --prefill-tokens-per-second
+  generation   --tokens-per-second per request, and at most --max-tokens-per-second
+               over all requests (the GPU's total throughput)
+
+Latency distributions: fixed:S, uniform:A,B, normal:MEAN,SD, lognormal:MEDIAN,SIGMA, exp:MEAN.
+
+Errors are injected at the given rates: --error-rate answers --error-status
+(with Retry-After), --malformed-rate returns content that isn't JSON,
+--disconnect-rate drops streamed responses halfway, --hang-rate stalls for
+--hang-seconds before answering (to hit client read timeouts).
+
+GET /mock/stats reports what was served; POST /mock/config takes a JSON
+object of the same settings (e.g. {"error_rate": 1.0}) to change them while
+a benchmark runs, e.g. to watch the circuit breakers open and close.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STREAM_CHUNK_TOKENS = 4 # Tokens per streamed delta
+
+
+def estimate_tokens(text: str) -> int:
+    # Same rule of thumb as Dita: ~4 ASCII characters per token, one per other character
+    ascii_chars = sum(c < "\x80" for c in text)
+    return ascii_chars // 4 + len(text) - ascii_chars + 1
+
+
+def parse_distribution(spec: str):
+    """Parse "kind:a,b" into a function returning a sample in seconds (never negative)."""
+    kind, _, args = spec.partition(":")
+    try:
+        params = [float(x) for x in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+    samplers = {
+        "fixed": (1, lambda rng, s: s),
+        "uniform": (2, lambda rng, a, b: rng.uniform(a, b)),
+        "normal": (2, lambda rng, mean, sd: rng.gauss(mean, sd)),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        "exp": (1, lambda rng, mean: rng.expovariate(1 / mean)),
+    }
+    if kind not in samplers or len(params) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+    sampler = samplers[kind][1]
+    return lambda rng: max(0.0, sampler(rng, *params))
+
+
+class TokenBucket:
+    """Total generation throughput shared by every request; rate 0 means unlimited."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next = 0.0 # When the tokens handed out so far have all been generated
+
+    async def take(self, tokens: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._next = max(self._next, now) + tokens / self.rate
+        await asyncio.sleep(self._next - now)
+
+
+# --- Responses for each backend's prompts ---
+
+def dita_analysis(rng: random.Random, text: str = "") -> Dict[str, Any]:
+    return {
+        "opinion_type": rng.choice(["agreement", "counterargument", "question", "clarification"]),
+        "summary": f"Summary of: {text[:60]}" if text else "A concise summary of the argument.",
+        "spectrum_scores": {m: rng.randint(0, 100) for m in ("logicality", "emotion", "novelty", "concreteness")},
+    }
+
+
+def card(rng: random.Random, topic: str) -> Dict[str, str]:
+    return {"question": f"{topic}とは何ですか？", "answer": f"{topic}の簡潔な説明です。（{rng.randint(1, 9999)}）"}
+
+
+def completion_content(messages: List[Dict[str, Any]], rng: random.Random) -> str:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    if '"results"' in system: # Dita micro-batch: one analysis per "Opinion N:" block
+        opinions = re.split(r"^Opinion \d+:\n", user, flags=re.M)[1:]
+        return json.dumps({"results": [dita_analysis(rng, o.strip()) for o in opinions]}, ensure_ascii=False)
+    if "debate analyst" in system: # Dita analysis, and avatars (which answer with the analyst's keys)
+        return json.dumps(dita_analysis(rng, user), ensure_ascii=False)
+    if "competitive programming judge" in system: # Proger review
+        return json.dumps({
+            "score": rng.randint(40, 100),
+            "comments": "The solution is correct and readable. Consider the edge cases of empty input.",
+            "improvements": ["Use faster input reading.", "Name variables after what they hold."],
+        })
+    if "暗記カード" in system: # std-card; decks number their topics, one per line
+        topics = re.findall(r"^\d+\. (.+)$", user, flags=re.M)
+        if "JSON配列" in user:
+            return json.dumps([card(rng, t) for t in topics], ensure_ascii=False)
+        topic = re.search(r"^トピック: (.+)$", user, flags=re.M)
+        return json.dumps(card(rng, topic.group(1)[:40] if topic else "トピック"), ensure_ascii=False)
+    return "This is a mock completion."
+
+
+def truncate_tokens(text: str, max_tokens: Optional[int]) -> str:
+    if not max_tokens or estimate_tokens(text) <= max_tokens:
+        return text
+    lo, hi = 0, len(text) # Longest prefix within max_tokens
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def split_tokens(text: str, tokens_per_chunk: int) -> List[str]:
+    chunks, start = [], 0
+    while start < len(text):
+        end = start + 1
+        while end < len(text) and estimate_tokens(text[start:end + 1]) <= tokens_per_chunk + 1:
+            end += 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+
+def create_app(config: Dict[str, Any]) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.pop("seed"))
+    state = {"latency": parse_distribution(config["latency"])}
+    slots = asyncio.Semaphore(config["parallel"])
+    bucket = TokenBucket(config["max_tokens_per_second"])
+    stats = {"requests": 0, "streamed": 0, "errors": 0, "malformed": 0, "disconnects": 0, "hangs": 0,
+             "prompt_tokens": 0, "completion_tokens": 0, "in_flight": 0, "queued": 0}
+
+    async def generation_slot():
+        stats["queued"] += 1
+        try:
+            await slots.acquire()
+        finally:
+            stats["queued"] -= 1
+        stats["in_flight"] += 1
+
+    def release_slot():
+        stats["in_flight"] -= 1
+        slots.release()
+
+    def first_token_delay(prompt_tokens: int) -> float:
+        prefill = config["prefill_tokens_per_second"]
+        return state["latency"](rng) + (prompt_tokens / prefill if prefill > 0 else 0.0)
+
+    async def generate(chunk_tokens: int, started: float, generated: int) -> None:
+        # Per-request pace, then the shared throughput budget
+        rate = config["tokens_per_second"]
+        if rate > 0:
+            await asyncio.sleep(max(0.0, started + (generated + chunk_tokens) / rate - time.monotonic()))
+        await bucket.take(chunk_tokens)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        stats["requests"] += 1
+        if rng.random() < config["hang_rate"]:
+            stats["hangs"] += 1
+            await asyncio.sleep(config["hang_seconds"])
+        if rng.random() < config["error_rate"]:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "Injected error"}}, status_code=config["error_status"],
+                                headers={"Retry-After": str(config["retry_after"])})
+
+        content = completion_content(messages, rng)
+        if rng.random() < config["malformed_rate"]:
+            stats["malformed"] += 1
+            content = "Sure! Here is the JSON you asked for: " + content[: len(content) // 2]
+        content = truncate_tokens(content, body.get("max_tokens"))
+        prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = estimate_tokens(content)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model") or "mock-model"
+
+        if not body.get("stream"):
+            await generation_slot()
+            try:
+                await asyncio.sleep(first_token_delay(prompt_tokens))
+                await generate(completion_tokens, time.monotonic(), 0)
+            finally:
+                release_slot()
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        stats["streamed"] += 1
+        disconnect = rng.random() < config["disconnect_rate"]
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra: Any) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+        async def events():
+            await generation_slot()
+            try:
+                await asyncio.sleep(first_token_delay(prompt_tokens))
+                yield chunk({"role": "assistant"})
+                stats["prompt_tokens"] += prompt_tokens
+                started, generated = time.monotonic(), 0
+                pieces = split_tokens(content, STREAM_CHUNK_TOKENS)
+                for i, piece in enumerate(pieces):
+                    if disconnect and i >= len(pieces) // 2:
+                        stats["disconnects"] += 1
+                        raise ConnectionResetError("Injected disconnect") # Ends the response without [DONE]
+                    tokens = max(1, estimate_tokens(piece) - 1)
+                    await generate(tokens, started, generated)
+                    generated += tokens
+                    stats["completion_tokens"] += tokens
+                    yield chunk({"content": piece})
+                yield chunk({}, "stop")
+                if include_usage:
+                    yield f"data: {json.dumps({'id': completion_id, 'choices': [], 'usage': usage})}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                release_slot()
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock-model", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return {**stats, "config": config}
+
+    @app.post("/mock/config")
+    async def update_config(changes: Dict[str, Any]):
+        unknown = set(changes) - set(config)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown settings: {sorted(unknown)}")
+        if "latency" in changes:
+            try:
+                state["latency"] = parse_distribution(changes["latency"])
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        if "max_tokens_per_second" in changes:
+            bucket.rate = changes["max_tokens_per_second"]
+        if "parallel" in changes:
+            raise HTTPException(status_code=400, detail="parallel can only be set at startup")
+        config.update(changes)
+        return config
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", default="lognormal:0.3,0.4", help="time to first token distribution (seconds)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000.0, help="0: prompt length is free")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0, help="per request; 0: unlimited")
+    parser.add_argument("--max-tokens-per-second", type=float, default=0.0, help="over all requests; 0: unlimited")
+    parser.add_argument("--parallel", type=int, default=4, help="requests generated at once")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = {k: v for k, v in vars(args).items() if k not in ("host", "port")}
+    parse_distribution(config["latency"]) # Fail on a bad spec before starting
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
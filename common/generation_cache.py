@@ -0,0 +1,138 @@
+import asyncio
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+def normalize_query(text: str) -> str:
+    # "ＡＩ とは？" and "ai  とは?" should hit the same entry
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class _Entry:
+    __slots__ = ("expires_at", "variants")
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+        self.variants: List[Any] = []
+
+
+class GenerationCache:
+    """LRU + TTL cache for LLM generations.
+
+    Keys are whatever identifies a generation to the backend (std-card: the
+    query, passed through ``normalize=normalize_query``; Proger: problem
+    and code hash). Up to ``variants_per_key`` different generations
+    are kept per key; until that many exist, lookups still go to the LLM so
+    repeated queries don't all get the exact same card. Concurrent misses on
+    the same key share a single upstream call; failed calls are not cached.
+    """
+
+    def __init__(
+        self, max_entries: int = 1024, ttl: float = 600.0, variants_per_key: int = 1,
+        normalize: Optional[Callable[[Any], Hashable]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants_per_key = max(1, variants_per_key)
+        self.normalize = normalize or (lambda key: key)
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _lookup(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        entry = self._lookup(key)
+        if entry is None:
+            entry = _Entry(time.monotonic() + self.ttl)
+            self._entries[key] = entry
+        if len(entry.variants) < self.variants_per_key:
+            entry.variants.append(value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _generate(self, key: Hashable, generate: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await generate()
+            self._store(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def get_or_generate(self, key: Any, generate: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await generate()
+
+        key = self.normalize(key)
+        entry = self._lookup(key)
+        if entry is not None and len(entry.variants) >= self.variants_per_key:
+            self.hits += 1
+            return random.choice(entry.variants)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._generate(key, generate))
+            # Errors are re-raised to every waiter; this only silences the
+            # "exception was never retrieved" warning when all of them left.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # shield() keeps the shared generation alive if this caller disconnects
+        return await asyncio.shield(task)
+
+    def peek(self, key: Any) -> Optional[Any]:
+        """Return a cached generation without starting one (used by streaming callers)."""
+        if not self.enabled:
+            return None
+        entry = self._lookup(self.normalize(key))
+        if entry is not None and len(entry.variants) >= self.variants_per_key:
+            self.hits += 1
+            return random.choice(entry.variants)
+        self.misses += 1
+        return None
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.enabled:
+            self._store(self.normalize(key), value)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "variants_per_key": self.variants_per_key,
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,280 @@
+"""Shared client for the OpenAI-compatible LLM server (LM Studio, llama.cpp).
+
+std-card, Proger and Dita all talk to the same local LM server. LLMGateway
+gives each backend process:
+
+- one keep-alive httpx connection pool, opened in the app's lifespan
+- per endpoint (URL), at most ``max_concurrency`` requests in flight; the
+  rest wait their turn in FIFO order instead of piling onto the server
+- retries with jittered exponential backoff on 429/5xx and connection
+  failures (honouring Retry-After), never on read timeouts, which would
+  only start the same generation again
+- a circuit breaker per endpoint: after ``breaker_threshold`` consecutive
+  failures requests fail fast with CircuitOpenError for
+  ``breaker_cooldown`` seconds, then a single probe decides whether to close
+- latency, queue wait, retry and token counters, see stats()
+
+The limits are per process: give each backend (and each uvicorn worker) a
+share of what the LM server can run in parallel.
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2")) # Extra attempts after a retryable failure
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5")) # Seconds; doubled per attempt, full jitter
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8.0"))
+BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5")) # Consecutive failures that open the circuit
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30.0")) # Seconds before a probe request is let through
+LATENCY_WINDOW = 1024 # Recent requests the latency percentiles are computed over
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures where the server never started on the request, so sending it again is safe
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+
+
+class CircuitOpenError(httpx.RequestError):
+    """The endpoint failed repeatedly; requests are refused until the cooldown ends."""
+
+
+def _percentiles(samples: deque) -> Dict[str, float]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    return {f"p{int(q * 100)}": round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4) for q in (0.5, 0.95, 0.99)}
+
+
+class _Endpoint:
+    def __init__(self, max_concurrency: int):
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.queued = 0
+        self.in_flight = 0
+        # Circuit breaker: closed, open (until opened_at + cooldown) or half_open (a probe is in flight)
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency: deque = deque(maxlen=LATENCY_WINDOW)
+        self.queue_wait: deque = deque(maxlen=LATENCY_WINDOW)
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        url: str,
+        max_concurrency: int,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = MAX_RETRIES,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_cooldown: float = BREAKER_COOLDOWN,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.transport = transport # e.g. httpx.MockTransport in tests
+        self._client: Optional[httpx.AsyncClient] = None
+        self._endpoints: Dict[str, _Endpoint] = {}
+
+    async def start(self) -> None:
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.max_concurrency),
+            transport=self.transport,
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _endpoint(self, url: str) -> _Endpoint:
+        endpoint = self._endpoints.get(url)
+        if endpoint is None:
+            endpoint = self._endpoints[url] = _Endpoint(self.max_concurrency)
+        return endpoint
+
+    # --- Circuit breaker ---
+
+    def _admit(self, url: str, endpoint: _Endpoint) -> None:
+        if endpoint.state == "closed":
+            return
+        # A probe that never reported back (e.g. cancelled) is replaced after another cooldown
+        if time.monotonic() - endpoint.opened_at >= self.breaker_cooldown:
+            endpoint.state = "half_open" # This request is the probe
+            endpoint.opened_at = time.monotonic()
+            return
+        endpoint.rejected += 1
+        raise CircuitOpenError(f"LLM endpoint {url} is unavailable after repeated failures; retrying later")
+
+    def _succeeded(self, endpoint: _Endpoint) -> None:
+        endpoint.failures = 0
+        endpoint.state = "closed"
+
+    def _failed(self, endpoint: _Endpoint) -> None:
+        endpoint.errors += 1
+        endpoint.failures += 1
+        if endpoint.state == "half_open" or endpoint.failures >= self.breaker_threshold:
+            endpoint.state = "open"
+            endpoint.opened_at = time.monotonic()
+
+    # --- Requests ---
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                delay = max(delay, min(BACKOFF_MAX, float(retry_after)))
+            except ValueError:
+                pass # HTTP-date form; the jittered delay will do
+        return delay
+
+    @asynccontextmanager
+    async def _slot(self, endpoint: _Endpoint):
+        waited = time.perf_counter()
+        endpoint.queued += 1
+        try:
+            await endpoint.slots.acquire()
+        finally:
+            endpoint.queued -= 1
+        endpoint.queue_wait.append(time.perf_counter() - waited)
+        endpoint.in_flight += 1
+        try:
+            yield
+        finally:
+            endpoint.in_flight -= 1
+            endpoint.slots.release()
+
+    def _count_tokens(self, endpoint: _Endpoint, usage: Any) -> None:
+        if isinstance(usage, dict):
+            endpoint.prompt_tokens += usage.get("prompt_tokens") or 0
+            endpoint.completion_tokens += usage.get("completion_tokens") or 0
+
+    @asynccontextmanager
+    async def stream(self, payload: Dict[str, Any], url: Optional[str] = None,
+                     retries: Optional[int] = None) -> AsyncIterator[httpx.Response]:
+        """POST ``payload`` and yield the response with its body still unread.
+
+        The concurrency slot is held until the context exits. Failed attempts
+        are retried before the response is handed over; once it has been, the
+        caller owns it (and raise_for_status() is up to the caller).
+        """
+        url = url or self.url
+        endpoint = self._endpoint(url)
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            self._admit(url, endpoint)
+            response = None
+            handed_over = False
+            async with self._slot(endpoint):
+                endpoint.requests += 1
+                started = time.perf_counter()
+                try:
+                    async with self._client.stream("POST", url, json=payload) as response:
+                        if response.status_code in RETRY_STATUSES:
+                            self._failed(endpoint)
+                            if attempt < retries:
+                                await response.aread()
+                        else:
+                            self._succeeded(endpoint)
+                        if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                            handed_over = True
+                            try:
+                                yield response
+                            finally:
+                                endpoint.latency.append(time.perf_counter() - started)
+                            return
+                except RETRY_ERRORS:
+                    if handed_over: # Raised while the caller was reading the body
+                        raise
+                    self._failed(endpoint)
+                    if attempt >= retries:
+                        raise
+                except httpx.TransportError:
+                    if not handed_over:
+                        self._failed(endpoint) # Read timeouts and the like are not retried
+                    raise
+            attempt += 1
+            endpoint.retries += 1
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def post(self, payload: Dict[str, Any], url: Optional[str] = None,
+                   retries: Optional[int] = None) -> httpx.Response:
+        """POST ``payload`` with queueing, retries and the circuit breaker; returns the read response.
+
+        Non-retryable error statuses (and the last attempt's) are returned as
+        they are, so callers keep using response.raise_for_status().
+        """
+        async with self.stream(payload, url, retries) as response:
+            await response.aread()
+        if response.is_success:
+            try:
+                self._count_tokens(self._endpoint(url or self.url), response.json().get("usage"))
+            except (ValueError, AttributeError):
+                pass
+        return response
+
+    async def complete(self, payload: Dict[str, Any], url: Optional[str] = None) -> str:
+        """Chat completion content; raises httpx errors, or KeyError/IndexError on an unexpected body."""
+        response = await self.post(payload, url)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream_deltas(self, payload: Dict[str, Any], url: Optional[str] = None) -> AsyncIterator[str]:
+        """Content deltas of a streamed chat completion (server-sent "data:" lines).
+
+        The upstream request is aborted as soon as the consumer stops iterating.
+        """
+        endpoint = self._endpoint(url or self.url)
+        async with self.stream({**payload, "stream": True}, url) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                self._count_tokens(endpoint, chunk.get("usage")) # Only sent by servers that report usage on streams
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            url: {
+                "circuit": e.state,
+                "max_concurrency": e.max_concurrency,
+                "in_flight": e.in_flight,
+                "queued": e.queued,
+                "requests": e.requests,
+                "errors": e.errors,
+                "retries": e.retries,
+                "rejected": e.rejected,
+                "prompt_tokens": e.prompt_tokens,
+                "completion_tokens": e.completion_tokens,
+                "latency_seconds": _percentiles(e.latency),
+                "queue_wait_seconds": _percentiles(e.queue_wait),
+            }
+            for url, e in self._endpoints.items()
+        }
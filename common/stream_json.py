@@ -0,0 +1,152 @@
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_SIMPLE_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JSONFieldStream:
+    """Incrementally extracts top-level string fields from a streamed JSON object.
+
+    Feed it raw text as tokens arrive and it returns ``(field, text)`` deltas
+    for the string values of ``fields`` as soon as their characters are seen,
+    e.g. the ``question`` of a card while ``answer`` is still being generated.
+    Text outside the object (such as Markdown code fences) is ignored.
+
+    Every top-level value, whatever its type, is also parsed as soon as it
+    is complete; completed() returns the ``(field, value)`` pairs finished
+    since the last call, e.g. a nested scores object.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None):
+        self.fields = set(fields) if fields is not None else None
+        self.values: Dict[str, str] = {}
+        self._raw: List[str] = []
+        self._depth = 0
+        self._expect_key = False
+        self._in_string = False
+        self._string_is_key = False
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[str] = None
+        self._key_buf: List[str] = []
+        self._key: Optional[str] = None
+        self._out: List[Tuple[str, str]] = []
+        # Offset of the next character, and of the current top-level value once it has started
+        self._pos = 0
+        self._awaiting_value = False
+        self._value_start: Optional[int] = None
+        self._completed: List[Tuple[str, Any]] = []
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self._raw.append(chunk)
+        self._out = []
+        for ch in chunk:
+            if self._awaiting_value and not ch.isspace():
+                self._awaiting_value = False
+                self._value_start = self._pos
+            if self._in_string:
+                self._feed_string(ch)
+            elif ch == '"':
+                self._in_string = True
+                self._string_is_key = self._depth == 1 and self._expect_key
+                if self._string_is_key:
+                    self._key_buf = []
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = ch == "{"
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._complete(self._pos) # A number/true/false/null ends at the closing brace
+                self._depth -= 1
+                if self._depth == 1:
+                    self._complete(self._pos + 1)
+            elif ch == ":" and self._depth == 1:
+                self._expect_key = False
+                self._awaiting_value = True
+            elif ch == "," and self._depth == 1:
+                self._complete(self._pos)
+                self._expect_key = True
+            self._pos += 1
+
+        # Merge consecutive deltas for the same field
+        merged: List[Tuple[str, str]] = []
+        for field, text in self._out:
+            if merged and merged[-1][0] == field:
+                merged[-1] = (field, merged[-1][1] + text)
+            else:
+                merged.append((field, text))
+        return merged
+
+    def _feed_string(self, ch: str) -> None:
+        if self._escape is not None:
+            self._escape += ch
+            decoded = self._decode_escape(self._escape)
+            if decoded is not None:
+                self._escape = None
+                self._emit(decoded)
+        elif ch == "\\":
+            self._escape = ""
+        elif ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._key = "".join(self._key_buf)
+            elif self._depth == 1:
+                self._complete(self._pos + 1)
+        else:
+            self._emit(ch)
+
+    def _decode_escape(self, escape: str) -> Optional[str]:
+        # Returns None while the escape sequence is still incomplete
+        if escape[0] != "u":
+            return _SIMPLE_ESCAPES.get(escape[0], escape[0])
+        if len(escape) < 5:
+            return None
+        try:
+            char = chr(int(escape[1:5], 16))
+        except ValueError:
+            return ""
+        if "\ud800" <= char <= "\udbff":
+            self._high_surrogate = char
+            return ""
+        if "\udc00" <= char <= "\udfff" and self._high_surrogate:
+            char = (self._high_surrogate + char).encode("utf-16", "surrogatepass").decode("utf-16")
+        self._high_surrogate = None
+        return char
+
+    def _emit(self, text: str) -> None:
+        if not text:
+            return
+        if self._string_is_key:
+            self._key_buf.append(text)
+        elif self._depth == 1 and self._key is not None:
+            if self.fields is None or self._key in self.fields:
+                self.values[self._key] = self.values.get(self._key, "") + text
+                self._out.append((self._key, text))
+
+    def _complete(self, end: int) -> None:
+        if self._value_start is None or self._key is None:
+            return
+        start, self._value_start = self._value_start, None
+        try:
+            value = json.loads(self.text[start:end])
+        except json.JSONDecodeError:
+            return # Malformed; result() will report it
+        if self.fields is None or self._key in self.fields:
+            self._completed.append((self._key, value))
+
+    def completed(self) -> List[Tuple[str, Any]]:
+        """Top-level ``(field, value)`` pairs that were completed since the last call."""
+        completed, self._completed = self._completed, []
+        return completed
+
+    @property
+    def text(self) -> str:
+        return "".join(self._raw)
+
+    def result(self):
+        """Parse the complete text; raises json.JSONDecodeError if it isn't valid JSON."""
+        text = self.text
+        start, end = text.find("{"), text.rfind("}")
+        if start != -1 and end > start:
+            text = text[start:end + 1]
+        return json.loads(text)
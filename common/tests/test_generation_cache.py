@@ -0,0 +1,60 @@
+import asyncio
+
+from generation_cache import GenerationCache, normalize_query
+
+
+def counter():
+    calls = []
+
+    async def generate():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return len(calls)
+    return calls, generate
+
+
+def test_concurrent_misses_share_one_call():
+    async def run():
+        cache = GenerationCache()
+        calls, generate = counter()
+        results = await asyncio.gather(*(cache.get_or_generate(("p", 1), generate) for _ in range(5)))
+        return cache, calls, results
+    cache, calls, results = asyncio.run(run())
+    assert results == [1] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_normalized_keys():
+    async def run():
+        cache = GenerationCache(normalize=normalize_query)
+        calls, generate = counter()
+        await cache.get_or_generate("ＡＩ とは？", generate)
+        await cache.get_or_generate("ai  とは?", generate)
+        return cache, calls
+    cache, calls = asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.peek(" AI とは? ") == 1
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("generation_cache.time.monotonic", lambda: now[0])
+    cache = GenerationCache(max_entries=2, ttl=60.0)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.peek("a") is None # Least recently used, evicted
+    assert cache.peek("c") == "C"
+    now[0] += 61
+    assert cache.peek("c") is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["expirations"] == 1
+
+
+def test_disabled_cache_always_generates():
+    async def run():
+        cache = GenerationCache(max_entries=0)
+        calls, generate = counter()
+        await cache.get_or_generate("k", generate)
+        await cache.get_or_generate("k", generate)
+        return calls
+    assert len(asyncio.run(run())) == 2
@@ -0,0 +1,190 @@
+import asyncio
+
+import httpx
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitOpenError, LLMGateway
+
+URL = "http://llm.test/v1/chat/completions"
+COMPLETION = {"choices": [{"message": {"content": "ok"}}], "usage": {"prompt_tokens": 3, "completion_tokens": 1}}
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_gateway, "BACKOFF_BASE", 0.001)
+
+
+def run(handler, scenario, **options):
+    """Run ``scenario(gateway)`` against a gateway whose requests go to ``handler``."""
+    async def main():
+        gateway = LLMGateway(URL, options.pop("max_concurrency", 4), transport=httpx.MockTransport(handler), **options)
+        await gateway.start()
+        try:
+            return await scenario(gateway)
+        finally:
+            await gateway.close()
+    return asyncio.run(main())
+
+
+def replies(*outcomes):
+    """A handler answering with each outcome in turn: a status code, or an exception to raise."""
+    calls = []
+
+    def handler(request):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(request)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json=COMPLETION if outcome == 200 else {"error": "busy"})
+
+    return handler, calls
+
+
+def test_retries_then_succeeds():
+    handler, calls = replies(503, httpx.ConnectError("refused"), 429, 200)
+
+    async def scenario(gateway):
+        assert await gateway.complete({"messages": []}) == "ok"
+        return gateway.stats()[URL]
+
+    stats = run(handler, scenario, max_retries=3)
+    assert len(calls) == 4
+    assert (stats["requests"], stats["retries"], stats["errors"]) == (4, 3, 3)
+    assert stats["circuit"] == "closed"
+    assert (stats["prompt_tokens"], stats["completion_tokens"]) == (3, 1)
+
+
+def test_gives_up_after_the_retry_limit():
+    handler, calls = replies(503)
+
+    async def scenario(gateway):
+        # The last attempt's response is returned for the caller's raise_for_status()
+        response = await gateway.post({})
+        assert response.status_code == 503
+        with pytest.raises(httpx.HTTPStatusError):
+            await gateway.complete({})
+
+    run(handler, scenario, max_retries=2, breaker_threshold=100)
+    assert len(calls) == 6
+
+
+def test_connection_errors_are_raised_after_the_retry_limit():
+    handler, calls = replies(httpx.ConnectError("refused"))
+
+    async def scenario(gateway):
+        with pytest.raises(httpx.ConnectError):
+            await gateway.post({})
+        with pytest.raises(httpx.ConnectError):
+            await gateway.post({}, retries=0)
+
+    run(handler, scenario, max_retries=1, breaker_threshold=100)
+    assert len(calls) == 3
+
+
+def test_read_timeouts_and_client_errors_are_not_retried():
+    handler, calls = replies(httpx.ReadTimeout("slow"), 400)
+
+    async def scenario(gateway):
+        with pytest.raises(httpx.ReadTimeout):
+            await gateway.post({})
+        assert (await gateway.post({})).status_code == 400
+
+    run(handler, scenario, max_retries=3)
+    assert len(calls) == 2
+
+
+def test_breaker_opens_after_consecutive_failures():
+    handler, calls = replies(500)
+
+    async def scenario(gateway):
+        for _ in range(3):
+            assert (await gateway.post({}, retries=0)).status_code == 500
+        with pytest.raises(CircuitOpenError):
+            await gateway.post({})
+        return gateway.stats()[URL]
+
+    stats = run(handler, scenario, breaker_threshold=3, breaker_cooldown=60)
+    assert len(calls) == 3
+    assert (stats["circuit"], stats["rejected"]) == ("open", 1)
+
+
+def test_success_resets_the_failure_count():
+    handler, calls = replies(500, 500, 200, 500, 500, 200)
+
+    async def scenario(gateway):
+        for _ in range(6):
+            await gateway.post({}, retries=0)
+        return gateway.stats()[URL]["circuit"]
+
+    assert run(handler, scenario, breaker_threshold=3) == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    release = asyncio.Event()
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) <= 2:
+            return httpx.Response(500)
+        await release.wait() # The probe
+        return httpx.Response(200, json=COMPLETION)
+
+    async def scenario(gateway):
+        for _ in range(2):
+            await gateway.post({}, retries=0)
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(gateway.post({}))
+        await asyncio.sleep(0.01)
+        assert gateway.stats()[URL]["circuit"] == "half_open"
+        with pytest.raises(CircuitOpenError):
+            await gateway.post({})
+        release.set()
+        assert (await probe).status_code == 200
+        assert gateway.stats()[URL]["circuit"] == "closed"
+        assert (await gateway.post({})).status_code == 200
+
+    run(handler, scenario, breaker_threshold=2, breaker_cooldown=0.05)
+    assert len(calls) == 4
+
+
+def test_failed_probe_reopens_the_circuit():
+    handler, calls = replies(500, 500, 500)
+
+    async def scenario(gateway):
+        for _ in range(2):
+            await gateway.post({}, retries=0)
+        await asyncio.sleep(0.06)
+        assert (await gateway.post({}, retries=0)).status_code == 500
+        assert gateway.stats()[URL]["circuit"] == "open"
+        with pytest.raises(CircuitOpenError):
+            await gateway.post({})
+
+    run(handler, scenario, breaker_threshold=2, breaker_cooldown=0.05)
+    assert len(calls) == 3
+
+
+def test_concurrency_is_limited_per_endpoint():
+    active = {"now": 0, "peak": 0}
+
+    async def handler(request):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.02)
+        active["now"] -= 1
+        return httpx.Response(200, json=COMPLETION)
+
+    async def scenario(gateway):
+        other = URL.replace("llm.test", "other.test")
+        tasks = [asyncio.create_task(gateway.post({})) for _ in range(6)]
+        tasks += [asyncio.create_task(gateway.post({}, other)) for _ in range(6)]
+        await asyncio.sleep(0.005)
+        stats = gateway.stats()
+        assert [(stats[url]["in_flight"], stats[url]["queued"]) for url in (URL, other)] == [(2, 4), (2, 4)]
+        await asyncio.gather(*tasks)
+        return gateway.stats()
+
+    stats = run(handler, scenario, max_concurrency=2)
+    assert active["peak"] == 4 # Two per endpoint
+    assert all(s["requests"] == 6 and s["in_flight"] == 0 for s in stats.values())
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from llm_gateway import LLMGateway
+from stream_json import JSONFieldStream
+
+CARD = {"question": "光合成で \"酸素\" は\nどこから？ 🌱", "answer": "水（H₂O）の分解から\tです\\"}
+
+
+def feed_all(parser, chunks):
+    """Feed every chunk and merge the deltas per field."""
+    deltas = {}
+    for chunk in chunks:
+        for field, text in parser.feed(chunk):
+            deltas[field] = deltas.get(field, "") + text
+    return deltas
+
+
+@pytest.mark.parametrize("ensure_ascii", [False, True])
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_deltas_survive_any_chunking(ensure_ascii, size):
+    # ensure_ascii=True encodes the Japanese text and the emoji (a surrogate pair) as \\uXXXX escapes
+    text = "```json\n" + json.dumps(CARD, ensure_ascii=ensure_ascii) + "\n```"
+    parser = JSONFieldStream(["question", "answer"])
+    deltas = feed_all(parser, [text[i:i + size] for i in range(0, len(text), size)])
+    assert deltas == CARD
+    assert parser.values == CARD
+    assert parser.result() == CARD
+
+
+def test_escape_split_inside_sequence():
+    parser = JSONFieldStream(["a"])
+    assert parser.feed('{"a": "x\\') == [("a", "x")]
+    assert parser.feed("u30") == []
+    assert parser.feed("a2\\ud83c") == [("a", "ア")]
+    assert parser.feed("\\udf31\\") == [("a", "🌱")]
+    assert parser.feed('"y"}') == [("a", '"y')]
+    assert parser.result() == {"a": 'xア🌱"y'}
+
+
+def test_only_requested_fields():
+    parser = JSONFieldStream(["answer"])
+    deltas = feed_all(parser, ['{"question": "q", ', '"answer": "a", "extra": {"answer": "nested"}}'])
+    assert deltas == {"answer": "a"}
+
+
+def test_values_completed_across_feeds():
+    parser = JSONFieldStream()
+    assert parser.feed('{"n": 1') == []
+    assert parser.completed() == []
+    parser.feed('2, "scores": {"emotion": 4')
+    assert parser.completed() == [("n", 12)]
+    parser.feed('0, "logic": [1, ')
+    assert parser.completed() == []
+    parser.feed('2]}, "ok": tr')
+    assert parser.completed() == [("scores", {"emotion": 40, "logic": [1, 2]})]
+    parser.feed('ue, "s": "done"}')
+    assert parser.completed() == [("ok", True), ("s", "done")]
+    assert parser.completed() == []
+
+
+def test_unfinished_stream():
+    parser = JSONFieldStream(["question"])
+    feed_all(parser, ['{"question": "途中', "で"])
+    assert parser.values == {"question": "途中で"}
+    assert parser.completed() == []
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_malformed_stream():
+    parser = JSONFieldStream()
+    parser.feed('{"a": "x", "n": 1.2.3, "b": [1,}')
+    # The malformed values are skipped; result() reports them
+    assert parser.completed() == [("a", "x")]
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_no_object():
+    parser = JSONFieldStream()
+    assert parser.feed("申し訳ありませんが、") == []
+    with pytest.raises(json.JSONDecodeError):
+        parser.result()
+
+
+def test_multibyte_split_across_network_chunks():
+    # The upstream body is cut in the middle of UTF-8 sequences
+    content = json.dumps(CARD, ensure_ascii=False)
+    body = "".join(
+        "data: " + json.dumps({"choices": [{"delta": {"content": content[i:i + 5]}}]}, ensure_ascii=False) + "\n\n"
+        for i in range(0, len(content), 5)
+    ).encode() + b"data: [DONE]\n\n"
+
+    async def chunks():
+        for i in range(0, len(body), 4):
+            yield body[i:i + 4]
+
+    def handler(request):
+        return httpx.Response(200, content=chunks(), headers={"Content-Type": "text/event-stream"})
+
+    async def main():
+        gateway = LLMGateway("http://llm.test/v1/chat/completions", 1, transport=httpx.MockTransport(handler))
+        await gateway.start()
+        try:
+            parser = JSONFieldStream(["question", "answer"])
+            deltas = {}
+            async for delta in gateway.stream_deltas({"messages": []}):
+                for field, text in parser.feed(delta):
+                    deltas[field] = deltas.get(field, "") + text
+            return deltas, parser.result()
+        finally:
+            await gateway.close()
+
+    assert asyncio.run(main()) == (CARD, CARD)
@@ -0,0 +1,107 @@
+"""Benchmark an NDJSON deck round trip: /cards/import, then /cards/export.
+
+Usage: python bench_import.py [--cards 500000] [--gzip] [--wait-index] [--port 8123]
+
+Starts the backend with uvicorn on a throwaway database, streams a generated
+deck into /cards/import and reads it back from /cards/export, and reports
+the time of each leg and the server's peak RSS. With --wait-index it also
+times the background indexer until search covers the whole deck.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import httpx
+
+from bench_search import make_card
+
+
+def deck_chunks(n: int, rng: random.Random, gzip: bool, chunk_cards: int = 1000) -> list:
+    # Generated up front, so the timings only cover the transfer and the server
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    chunks = []
+    for offset in range(0, n, chunk_cards):
+        chunk = "".join(
+            json.dumps(make_card(rng), ensure_ascii=False) + "\n" for _ in range(min(chunk_cards, n - offset))
+        ).encode()
+        chunks.append(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        chunks.append(compressor.flush())
+    return chunks
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=500_000)
+    parser.add_argument("--gzip", action="store_true", help="gzip both directions")
+    parser.add_argument("--wait-index", action="store_true", help="also wait for the background indexer")
+    parser.add_argument("--port", type=int, default=8123)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.TemporaryDirectory()
+    env = {**os.environ, "CARD_DB_PATH": os.path.join(tmpdir.name, "bench.db")}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    base = f"http://127.0.0.1:{args.port}"
+    chunks = deck_chunks(args.cards, random.Random(0), args.gzip)
+    try:
+        with httpx.Client(base_url=base, timeout=None) as client:
+            for _ in range(100):
+                try:
+                    client.get("/openapi.json")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+
+            start = import_started = time.perf_counter()
+            response = client.post(
+                "/cards/import", params={"gzip": args.gzip},
+                content=iter(chunks),
+            )
+            response.raise_for_status()
+            progress = response.json()
+            import_seconds = time.perf_counter() - start
+            print(f"import: {progress['imported']} cards in {import_seconds:.1f}s "
+                  f"({progress['imported'] / import_seconds:,.0f} cards/s), {progress['pending_index']} left to index")
+
+            start = time.perf_counter()
+            lines = 0
+            decompressor = zlib.decompressobj(47) if args.gzip else None
+            with client.stream("GET", "/cards/export", params={"gzip": args.gzip}) as response:
+                response.raise_for_status()
+                for chunk in response.iter_raw():
+                    lines += (decompressor.decompress(chunk) if decompressor else chunk).count(b"\n")
+            export_seconds = time.perf_counter() - start
+            print(f"export: {lines} cards in {export_seconds:.1f}s ({lines / export_seconds:,.0f} cards/s)")
+            print(f"round trip: {import_seconds + export_seconds:.1f}s, server peak RSS {peak_rss_mb(server.pid):.0f}MB")
+            assert lines == args.cards, (lines, args.cards)
+
+            if args.wait_index:
+                while client.get(f"/cards/import/{progress['import_id']}").json()["pending_index"]:
+                    time.sleep(0.5)
+                print(f"indexed {args.cards} cards {time.perf_counter() - import_started:.1f}s after the import started, "
+                      f"server peak RSS {peak_rss_mb(server.pid):.0f}MB")
+    finally:
+        server.terminate()
+        server.wait()
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
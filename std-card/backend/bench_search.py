@@ -0,0 +1,73 @@
+"""Benchmark /cards/search query latency on a synthetic deck.
+
+Usage: python bench_search.py [--cards 100000] [--queries 500] [--db PATH]
+
+Builds a throwaway SQLite store filled with generated Japanese/English
+cards, then times CardStore.search() for a mix of short and long queries.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from card_store import CardStore
+
+SUBJECTS = ["日本", "東京", "江戸幕府", "光合成", "微分", "積分", "細胞", "明治維新", "量子力学", "英文法",
+            "関数", "確率", "化学反応", "地球温暖化", "鎌倉時代", "Python", "HTTP", "DNA", "電磁気", "民主主義"]
+ASPECTS = ["の定義", "の特徴", "の歴史", "の原因", "の例", "の仕組み", "の公式", "の意義", "の影響", "の問題点"]
+ANSWER_WORDS = ["重要", "基本", "エネルギー", "変化", "構造", "時代", "法則", "政治", "計算", "生物", "物質",
+                "protocol", "function", "要素", "関係", "発展", "理論", "実験", "社会", "文化"]
+QUERIES = ["東京", "光合成", "の歴史", "微分の公式", "量子", "幕府", "python", "細胞 構造", "時", "温暖化の原因"]
+
+
+def make_card(rng: random.Random) -> dict:
+    subject = rng.choice(SUBJECTS)
+    question = f"{subject}{rng.choice(ASPECTS)}は何ですか？"
+    answer = "、".join(rng.sample(ANSWER_WORDS, 3)) + f"に関する{subject}の説明"
+    return {"question": question, "answer": answer}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db", help="database path (default: temporary file)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tmpdir = None
+    if args.db is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.db = os.path.join(tmpdir.name, "bench.db")
+    store = CardStore(args.db)
+
+    start = time.perf_counter()
+    batch = 5000
+    for offset in range(0, args.cards, batch):
+        store.insert_many([make_card(rng) for _ in range(min(batch, args.cards - offset))])
+    print(f"indexed {args.cards} cards in {time.perf_counter() - start:.1f}s")
+
+    latencies = {q: [] for q in QUERIES}
+    for i in range(args.queries):
+        q = QUERIES[i % len(QUERIES)]
+        t0 = time.perf_counter()
+        hits = store.search(q, args.limit)
+        latencies[q].append((time.perf_counter() - t0) * 1000)
+        assert hits, q
+
+    all_ms = sorted(ms for values in latencies.values() for ms in values)
+    def pct(p):
+        return all_ms[min(len(all_ms) - 1, int(p / 100 * len(all_ms)))]
+    print(f"{len(all_ms)} queries: p50={pct(50):.2f}ms p95={pct(95):.2f}ms p99={pct(99):.2f}ms max={all_ms[-1]:.2f}ms")
+    for q, values in latencies.items():
+        print(f"  {q!r:12} median={statistics.median(values):.2f}ms")
+
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
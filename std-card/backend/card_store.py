@@ -0,0 +1,381 @@
+import re
+import sqlite3
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import near_dup
+
+# Hiragana, katakana, CJK ideographs and half-width katakana: scripts written without spaces
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([^\\W_{_CJK}]+)")
+
+
+def _tokenize(text: str) -> List[List[str]]:
+    """Split text into runs of search terms.
+
+    CJK runs become overlapping character bigrams followed by the run's last
+    character, so every character starts at least one term; other runs are
+    kept as whole words.
+    """
+    runs = []
+    for cjk, word in _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold()):
+        if word:
+            runs.append([word])
+        else:
+            runs.append([cjk[i:i + 2] for i in range(len(cjk) - 1)] + [cjk[-1]])
+    return runs
+
+
+def ngram_text(text: str) -> str:
+    # What gets stored in the FTS table; its default tokenizer splits on the spaces
+    return " ".join(term for run in _tokenize(text) for term in run)
+
+
+def ngram_query(text: str) -> Optional[str]:
+    """Build an FTS5 MATCH expression that requires every run in ``text``."""
+    phrases = []
+    for run in _tokenize(text):
+        if len(run) == 1:
+            # A single character only exists as a bigram prefix or run-final unigram
+            phrases.append(f'"{run[0]}"*' if len(run[0]) == 1 else f'"{run[0]}"')
+        else:
+            # Drop the trailing unigram so the bigrams match as an adjacent phrase
+            phrases.append('"' + " ".join(run[:-1]) + '"')
+    return " AND ".join(phrases) or None
+
+
+class DuplicateCardError(Exception):
+    def __init__(self, matches: List[Dict]):
+        super().__init__(f"{len(matches)} similar card(s) already exist")
+        self.matches = matches
+
+
+class CardStore:
+    """SQLite-backed flashcard storage.
+
+    The database runs in WAL mode so several uvicorn workers can read while
+    one writes. Card ids come from a sequence row that is bumped inside a
+    write transaction, which keeps them unique across processes. Two
+    secondary indexes are updated in the same transactions as ``cards``:
+    a FTS5 table of character n-grams for full-text search, and MinHash
+    signatures with LSH band buckets for near-duplicate lookups. Bulk
+    imports can skip them (``insert_many(..., index=False)``); those cards
+    wait in ``card_index_queue`` until index_pending() catches up.
+
+    Calls block on disk I/O; async endpoints should go through
+    ``run_in_threadpool``. Each thread gets its own connection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cards (
+                id INTEGER PRIMARY KEY,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS id_sequence (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO id_sequence (name, value)
+                SELECT 'cards', COALESCE(MAX(id), 0) FROM cards;
+            CREATE TABLE IF NOT EXISTS card_index_queue (
+                card_id INTEGER PRIMARY KEY
+            );
+        """)
+        with self._transaction() as conn:
+            if not self._has_table(conn, "cards_fts"):
+                # rowid is the card id; columns hold the n-gram text of each field
+                conn.execute("CREATE VIRTUAL TABLE cards_fts USING fts5(question, answer)")
+                self._index_search(conn, self._all_cards(conn))
+            if not self._has_table(conn, "card_signatures"):
+                # executescript() would commit; the DDL has to stay inside this transaction
+                conn.execute("CREATE TABLE card_signatures (card_id INTEGER PRIMARY KEY, signature BLOB NOT NULL)")
+                conn.execute("CREATE TABLE card_lsh (band INTEGER NOT NULL, bucket INTEGER NOT NULL, card_id INTEGER NOT NULL)")
+                conn.execute("CREATE INDEX card_lsh_bucket ON card_lsh (band, bucket)")
+                conn.execute("CREATE INDEX card_lsh_card ON card_lsh (card_id)")
+                self._index_signatures(conn, self._all_cards(conn))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are opened explicitly in _transaction()
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, serializing writers across processes
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+        return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    @staticmethod
+    def _all_cards(conn: sqlite3.Connection) -> List[Dict]:
+        return [dict(row) for row in conn.execute("SELECT id, question, answer FROM cards")]
+
+    def _allocate(self, conn: sqlite3.Connection, n: int) -> int:
+        # Must run inside a write transaction; returns the first id of the block
+        conn.execute("UPDATE id_sequence SET value = value + ? WHERE name = 'cards'", (n,))
+        last = conn.execute("SELECT value FROM id_sequence WHERE name = 'cards'").fetchone()[0]
+        return last - n + 1
+
+    def _index_search(self, conn: sqlite3.Connection, cards: List[Dict]) -> None:
+        conn.executemany(
+            "INSERT INTO cards_fts (rowid, question, answer) VALUES (?, ?, ?)",
+            [(card["id"], ngram_text(card["question"]), ngram_text(card["answer"])) for card in cards],
+        )
+
+    def _index_signatures(self, conn: sqlite3.Connection, cards: List[Dict]) -> None:
+        signatures = [(card["id"], near_dup.minhash(near_dup.card_text(card))) for card in cards]
+        conn.executemany(
+            "INSERT INTO card_signatures (card_id, signature) VALUES (?, ?)",
+            [(card_id, near_dup.pack(sig)) for card_id, sig in signatures],
+        )
+        conn.executemany(
+            "INSERT INTO card_lsh (band, bucket, card_id) VALUES (?, ?, ?)",
+            [
+                (band, bucket, card_id)
+                for card_id, sig in signatures
+                for band, bucket in enumerate(near_dup.band_buckets(sig))
+            ],
+        )
+
+    def _write(self, conn: sqlite3.Connection, cards: List[Dict], index: bool = True) -> None:
+        # Insert or replace cards that already have ids, keeping every index in step
+        max_id = max(card["id"] for card in cards)
+        # Keep the sequence ahead of ids that were chosen by the client
+        conn.execute("UPDATE id_sequence SET value = MAX(value, ?) WHERE name = 'cards'", (max_id,))
+        self._unindex(conn, [card["id"] for card in cards])
+        conn.executemany(
+            "INSERT OR REPLACE INTO cards (id, question, answer) VALUES (?, ?, ?)",
+            [(card["id"], card["question"], card["answer"]) for card in cards],
+        )
+        if index:
+            self._index_search(conn, cards)
+            self._index_signatures(conn, cards)
+        else:
+            conn.executemany("INSERT INTO card_index_queue (card_id) VALUES (?)", [(card["id"],) for card in cards])
+
+    def _unindex(self, conn: sqlite3.Connection, card_ids: List[int]) -> None:
+        params = [(card_id,) for card_id in card_ids]
+        conn.executemany("DELETE FROM cards_fts WHERE rowid = ?", params)
+        conn.executemany("DELETE FROM card_signatures WHERE card_id = ?", params)
+        conn.executemany("DELETE FROM card_lsh WHERE card_id = ?", params)
+        conn.executemany("DELETE FROM card_index_queue WHERE card_id = ?", params)
+
+    def _find_similar(self, conn: sqlite3.Connection, card: Dict, threshold: float, limit: int) -> List[Dict]:
+        signature = near_dup.minhash(near_dup.card_text(card))
+        buckets = near_dup.band_buckets(signature)
+        # Only cards sharing at least one LSH bucket are compared, not the whole deck
+        condition = " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets))
+        params = [value for band, bucket in enumerate(buckets) for value in (band, bucket)]
+        rows = conn.execute(
+            f"""
+            SELECT c.id, c.question, c.answer, s.signature
+            FROM card_signatures AS s JOIN cards AS c ON c.id = s.card_id
+            WHERE s.card_id IN (SELECT card_id FROM card_lsh WHERE {condition}) AND s.card_id != ?
+            """,
+            (*params, card.get("id") or 0),
+        ).fetchall()
+        matches = []
+        for row in rows:
+            score = near_dup.similarity(signature, near_dup.unpack(row["signature"]))
+            if score >= threshold:
+                matches.append({"id": row["id"], "question": row["question"], "answer": row["answer"], "similarity": score})
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches[:limit]
+
+    def allocate_ids(self, n: int = 1) -> List[int]:
+        with self._transaction() as conn:
+            first = self._allocate(conn, n)
+        return list(range(first, first + n))
+
+    def insert(self, card: Dict, reject_similar_above: Optional[float] = None) -> Dict:
+        """Insert or replace ``card``; assigns an id when it has none.
+
+        With ``reject_similar_above`` set, raises DuplicateCardError instead of
+        inserting when a stored card is at least that similar. The check runs
+        inside the write transaction, so concurrent saves cannot both pass it.
+        """
+        with self._transaction() as conn:
+            if reject_similar_above is not None:
+                matches = self._find_similar(conn, card, reject_similar_above, limit=5)
+                if matches:
+                    raise DuplicateCardError(matches)
+            if card.get("id") is None:
+                card = {**card, "id": self._allocate(conn, 1)}
+            self._write(conn, [card])
+        return card
+
+    def insert_many(self, cards: List[Dict], index: bool = True) -> List[Dict]:
+        """Insert a batch of cards in one transaction.
+
+        A card whose id repeats within the batch replaces the earlier one, the
+        same as it would across batches; the returned list has one card per id.
+        With ``index=False`` the search and near-duplicate indexes are left to
+        index_pending(); until then the cards are missing from search(),
+        find_similar() and duplicate_groups().
+        """
+        if not cards:
+            return []
+        with self._transaction() as conn:
+            given = [card["id"] for card in cards if card.get("id") is not None]
+            if given:
+                # Allocate past the batch's own ids, so new cards can't take one of them
+                conn.execute("UPDATE id_sequence SET value = MAX(value, ?) WHERE name = 'cards'", (max(given),))
+            missing = len(cards) - len(given)
+            next_id = self._allocate(conn, missing) if missing else 0
+            saved: Dict[int, Dict] = {}
+            for card in cards:
+                if card.get("id") is None:
+                    card = {**card, "id": next_id}
+                    next_id += 1
+                saved[card["id"]] = card
+            self._write(conn, list(saved.values()), index)
+        return list(saved.values())
+
+    def index_pending(self, limit: int = 500) -> int:
+        """Index up to ``limit`` cards from card_index_queue; returns how many.
+
+        Each call is one short write transaction, so a large backlog can be
+        worked off in a loop without holding the write lock for long.
+        """
+        with self._transaction() as conn:
+            cards = [dict(row) for row in conn.execute(
+                """
+                SELECT c.id, c.question, c.answer
+                FROM card_index_queue AS q JOIN cards AS c ON c.id = q.card_id
+                ORDER BY q.card_id LIMIT ?
+                """,
+                (limit,),
+            )]
+            if not cards:
+                return 0
+            conn.executemany("DELETE FROM card_index_queue WHERE card_id = ?", [(card["id"],) for card in cards])
+            self._index_search(conn, cards)
+            self._index_signatures(conn, cards)
+        return len(cards)
+
+    def pending_count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM card_index_queue").fetchone()[0]
+
+    def get(self, card_id: int) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT id, question, answer FROM cards WHERE id = ?", (card_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, card_id: int) -> bool:
+        return self.delete_many([card_id]) > 0
+
+    def delete_many(self, card_ids: Iterable[int]) -> int:
+        card_ids = list(card_ids)
+        with self._transaction() as conn:
+            deleted = sum(
+                conn.execute("DELETE FROM cards WHERE id = ?", (card_id,)).rowcount for card_id in card_ids
+            )
+            self._unindex(conn, card_ids)
+        return deleted
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Return up to ``limit`` cards matching every term of ``query``, best first.
+
+        Ranked with BM25; matches in the question weigh twice as much as
+        matches in the answer.
+        """
+        match = ngram_query(query)
+        if match is None:
+            return []
+        rows = self._conn().execute(
+            """
+            SELECT c.id, c.question, c.answer, bm25(cards_fts, 2.0, 1.0) AS bm25_rank
+            FROM cards_fts JOIN cards AS c ON c.id = cards_fts.rowid
+            WHERE cards_fts MATCH ?
+            ORDER BY bm25_rank
+            LIMIT ?
+            """,
+            (match, limit),
+        ).fetchall()
+        # bm25() is lower-is-better; expose a positive score
+        return [{"id": r["id"], "question": r["question"], "answer": r["answer"], "score": -r["bm25_rank"]} for r in rows]
+
+    def find_similar(self, card: Dict, threshold: float, limit: int = 5) -> List[Dict]:
+        """Stored cards whose estimated Jaccard similarity to ``card`` is >= ``threshold``."""
+        return self._find_similar(self._conn(), card, threshold, limit)
+
+    def duplicate_groups(self, threshold: float) -> List[Dict]:
+        """Group near-duplicate cards across the whole store.
+
+        Candidate pairs come from LSH buckets holding more than one card, so
+        the pass never compares every card against every other. Each group
+        keeps its lowest id as the original.
+        """
+        conn = self._conn()
+        parent: Dict[int, int] = {}
+
+        def find(x: int) -> int:
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        signatures: Dict[int, List[int]] = {}
+
+        def signature(card_id: int) -> List[int]:
+            if card_id not in signatures:
+                row = conn.execute("SELECT signature FROM card_signatures WHERE card_id = ?", (card_id,)).fetchone()
+                signatures[card_id] = near_dup.unpack(row["signature"])
+            return signatures[card_id]
+
+        checked = set()
+        buckets = conn.execute(
+            "SELECT group_concat(card_id) AS ids FROM card_lsh GROUP BY band, bucket HAVING COUNT(*) > 1"
+        )
+        for row in buckets:
+            ids = sorted(int(i) for i in row["ids"].split(","))
+            for i, a in enumerate(ids):
+                for b in ids[i + 1:]:
+                    if (a, b) in checked:
+                        continue
+                    checked.add((a, b))
+                    if near_dup.similarity(signature(a), signature(b)) >= threshold:
+                        ra, rb = find(a), find(b)
+                        if ra != rb:
+                            parent[max(ra, rb)] = min(ra, rb)
+
+        groups: Dict[int, List[int]] = {}
+        for card_id in parent:
+            root = find(card_id)
+            if root != card_id:
+                groups.setdefault(root, []).append(card_id)
+        return [{"keep": keep, "duplicates": sorted(dups)} for keep, dups in sorted(groups.items())]
+
+    def list_page(self, after: Optional[int] = None, limit: int = 100) -> List[Dict]:
+        # Keyset pagination on the primary key: each page is an index range scan
+        rows = self._conn().execute(
+            "SELECT id, question, answer FROM cards WHERE id > ? ORDER BY id LIMIT ?",
+            (after or 0, limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cards").fetchone()[0]
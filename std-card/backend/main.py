@@ -1,11 +1,60 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict
-import requests
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import httpx
 import json
+import os
+import sys
+import time
+import uuid
+import zlib
 from fastapi.middleware.cors import CORSMiddleware # Import CORSMiddleware
+# Modules shared by the backends live in <repo>/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "common"))
+from llm_gateway import CircuitOpenError, LLMGateway
+from stream_json import JSONFieldStream
+from generation_cache import GenerationCache, normalize_query
+from card_store import CardStore, DuplicateCardError
 
-app = FastAPI()
+# LM Studio API configuration
+LM_STUDIO_API_URL = os.getenv("LM_STUDIO_API_URL", "http://localhost:1234/v1/chat/completions")
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5.0"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "120.0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4")) # In-flight LLM calls per process
+
+# Bulk deck generation
+DECK_CARDS_PER_CALL = int(os.getenv("DECK_CARDS_PER_CALL", "5")) # Cards requested from a single LLM call
+DECK_MAX_PARALLEL_CALLS = int(os.getenv("DECK_MAX_PARALLEL_CALLS", "3")) # Concurrent LLM calls per deck request
+DECK_MAX_CARDS = int(os.getenv("DECK_MAX_CARDS", "200"))
+
+# Cache of /generate-card/ results keyed on the normalized query (0 entries disables it)
+card_cache = GenerationCache(
+    max_entries=int(os.getenv("CARD_CACHE_MAX_ENTRIES", "1024")),
+    ttl=float(os.getenv("CARD_CACHE_TTL", "600")),
+    variants_per_key=int(os.getenv("CARD_CACHE_VARIANTS", "1")),
+    normalize=normalize_query,
+)
+
+# Keep-alive pool, concurrency cap, retries and circuit breaker for LM Studio; opened in lifespan().
+# Generations beyond the cap wait in the gateway instead of piling onto LM Studio.
+llm_gateway = LLMGateway(LM_STUDIO_API_URL, LLM_MAX_CONCURRENCY, LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_gateway.start()
+    start_indexer() # Picks up cards a previous run imported but didn't get to index
+    try:
+        yield
+    finally:
+        if indexer is not None:
+            indexer.cancel()
+        await llm_gateway.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 origins = [
@@ -20,33 +69,84 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# In-memory storage for flashcards
-# In a real application, this would be a database
-flashcards_db = []
-card_id_counter = 0
+# Persistent storage for flashcards, shared by every uvicorn worker
+CARD_DB_PATH = os.getenv("CARD_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "flashcards.db"))
+CARDS_PAGE_SIZE = int(os.getenv("CARDS_PAGE_SIZE", "100"))
+CARDS_MAX_PAGE_SIZE = 1000
+card_store = CardStore(CARD_DB_PATH)
+
+# Near-duplicate check on /save-card/: "off", "flag" (save, but report matches) or "reject" (409)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8")) # Estimated Jaccard similarity of character bigrams
+
+# NDJSON deck import/export
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+IMPORT_MAX_LINE_BYTES = 1 << 20
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "500")) # Imported cards indexed per transaction afterwards
+# Progress of imports handled by this process, keyed by import id
+deck_imports: Dict[str, dict] = {}
+# Background task working off card_index_queue; see start_indexer()
+indexer: Optional[asyncio.Task] = None
+
+def start_indexer():
+    """Index imported cards in the background, one short transaction at a time.
+
+    Imports only write the cards themselves; search and the near-duplicate
+    checks see them once this has caught up. Every worker may run one, the
+    queue is shared through the database.
+    """
+    global indexer
+    if indexer is not None and not indexer.done():
+        return
+
+    async def run():
+        while await run_in_threadpool(card_store.index_pending, INDEX_BATCH_SIZE):
+            await asyncio.sleep(0)
+
+    indexer = asyncio.get_running_loop().create_task(run())
 
 class Flashcard(BaseModel):
     id: int = None
     question: str
     answer: str
 
-# LM Studio API configuration
-LM_STUDIO_API_URL = "http://localhost:1234/v1/chat/completions"
+class SearchHit(Flashcard):
+    score: float
+
+class SimilarCard(Flashcard):
+    similarity: float
+
+class DeckRequest(BaseModel):
+    topic: Optional[str] = None
+    count: int = 10
+    topics: Optional[List[str]] = None
+
+class DeckError(BaseModel):
+    index: int
+    topic: str
+    detail: str
+
+class DeckResult(BaseModel):
+    cards: List[Flashcard]
+    errors: List[DeckError]
 
 @app.get("/")
 async def read_root():
     return {"message": "フラッシュカードAIツールへようこそ！"}
 
-@app.post("/generate-card/")
-async def generate_card(query: Dict[str, str]):
-    global card_id_counter
-    user_query = query.get("query", "")
+async def request_completion(payload: dict) -> str:
+    """Send a chat completion to LM Studio and return the message content.
 
-    if not user_query:
-        raise HTTPException(status_code=400, detail="クエリが提供されていません。")
+    Waits for a free slot under LLM_MAX_CONCURRENCY, so the event loop keeps
+    serving other requests while generations are queued or in flight.
+    """
+    return await llm_gateway.complete(payload)
 
+def build_card_payload(user_query: str) -> dict:
     # Prompt for the LLM to generate a flashcard in JSON format
     # Instruct the LLM to output ONLY the JSON, no other text.
     prompt = f"""以下のトピックについて、質問と回答の形式で暗記カードを生成してください。回答は簡潔にしてください。出力はJSON形式のみで、他のテキストは含めないでください。JSONのキーは "question" と "answer" としてください。
@@ -56,11 +156,7 @@ async def generate_card(query: Dict[str, str]):
 例:
 {{"question": "日本の首都は？", "answer": "東京"}}
 """
-
-    headers = {
-        "Content-Type": "application/json"
-    }
-    payload = {
+    return {
         "messages": [
             {
                 "role": "system",
@@ -76,65 +172,386 @@ async def generate_card(query: Dict[str, str]):
         "stream": False
     }
 
+def validate_card_data(card_data) -> Dict[str, str]:
+    if not isinstance(card_data, dict):
+        raise ValueError("LLMからの応答が期待されるJSON形式ではありませんでした。")
+    question = card_data.get("question")
+    answer = card_data.get("answer")
+
+    if not question or not answer or not isinstance(question, str) or not isinstance(answer, str):
+        raise ValueError("LLMからの応答が期待されるJSON形式ではありませんでした。")
+    return {"question": question, "answer": answer}
+
+def parse_card_content(llm_content: str) -> Dict[str, str]:
+    # Raises json.JSONDecodeError or ValueError when the LLM output is unusable
+    return validate_card_data(json.loads(llm_content))
+
+def llm_http_exception(e: Exception) -> HTTPException:
+    # Map transport errors from the LLM client onto the responses the frontend expects
+    if isinstance(e, httpx.TimeoutException):
+        return HTTPException(status_code=504, detail="LM Studioサーバーからの応答がタイムアウトしました。")
+    if isinstance(e, httpx.ConnectError):
+        return HTTPException(status_code=503, detail="LM Studioサーバーに接続できません。LM Studioが実行中であることを確認してください。")
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(status_code=503, detail="LM Studioサーバーでエラーが続いているため、しばらく待ってから再試行してください。")
+    if isinstance(e, (httpx.HTTPError, KeyError, IndexError)):
+        return HTTPException(status_code=500, detail=f"LM Studio APIリクエストエラー: {e}")
+    return HTTPException(status_code=500, detail=f"予期せぬエラーが発生しました: {e}")
+
+async def generate_card_data(user_query: str) -> Dict[str, str]:
+    try:
+        llm_content = await request_completion(build_card_payload(user_query))
+    except Exception as e:
+        raise llm_http_exception(e)
+
+    # Attempt to parse the JSON content
+    try:
+        return parse_card_content(llm_content)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=500, detail=f"LLMからの応答をJSONとして解析できませんでした: {llm_content}")
+    except ValueError as ve:
+        raise HTTPException(status_code=500, detail=f"LLM応答の解析エラー: {ve}")
+
+@app.post("/generate-card/")
+async def generate_card(query: Dict[str, str]):
+    user_query = query.get("query", "")
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="クエリが提供されていません。")
+
+    card_data = await card_cache.get_or_generate(user_query, lambda: generate_card_data(user_query))
+
+    [card_id] = await run_in_threadpool(card_store.allocate_ids, 1)
+    new_card = Flashcard(id=card_id, **card_data)
+    return new_card
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_completion(payload: dict):
+    """Yield content deltas from a streamed chat completion.
+
+    The upstream connection is closed as soon as the consumer stops iterating,
+    e.g. when the generator is cancelled because the browser disconnected.
+    """
+    async for delta in llm_gateway.stream_deltas(payload):
+        yield delta
+
+@app.post("/generate-card/stream")
+async def generate_card_stream(query: Dict[str, str]):
+    """Server-Sent Events variant of /generate-card/.
+
+    Emits ``delta`` events ({"field", "text"}) while the card is generated,
+    then a single ``card`` event with the validated Flashcard, or ``error``.
+    """
+    user_query = query.get("query", "")
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="クエリが提供されていません。")
+
+    async def events():
+        card_data = card_cache.peek(user_query)
+        if card_data is None:
+            parser = JSONFieldStream(["question", "answer"])
+            try:
+                async for delta in stream_completion(build_card_payload(user_query)):
+                    for field, text in parser.feed(delta):
+                        yield sse_event("delta", {"field": field, "text": text})
+            except Exception as e:
+                error = llm_http_exception(e)
+                yield sse_event("error", {"status": error.status_code, "detail": error.detail})
+                return
+
+            try:
+                card_data = validate_card_data(parser.result())
+            except json.JSONDecodeError:
+                yield sse_event("error", {"status": 500, "detail": f"LLMからの応答をJSONとして解析できませんでした: {parser.text}"})
+                return
+            except ValueError as ve:
+                yield sse_event("error", {"status": 500, "detail": f"LLM応答の解析エラー: {ve}"})
+                return
+            card_cache.put(user_query, card_data)
+
+        [card_id] = await run_in_threadpool(card_store.allocate_ids, 1)
+        yield sse_event("card", Flashcard(id=card_id, **card_data).dict())
+
+    # Starlette cancels events() when the client goes away, which exits the
+    # upstream stream context and aborts the LLM request.
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return card_cache.stats()
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    return llm_gateway.stats()
+
+def build_deck_payload(topics: List[str]) -> dict:
+    numbered = "\n".join(f"{i + 1}. {topic}" for i, topic in enumerate(topics))
+    prompt = f"""以下の各トピックについて、質問と回答の形式で暗記カードを1枚ずつ生成してください。回答は簡潔にしてください。同じトピックが複数ある場合は、それぞれ異なる内容のカードにしてください。出力は{len(topics)}個の要素を持つJSON配列のみで、他のテキストは含めないでください。配列の順番はトピックの番号と同じにし、各要素のキーは "question" と "answer" としてください。
+
+トピック:
+{numbered}
+
+例:
+[{{"question": "日本の首都は？", "answer": "東京"}}, {{"question": "フランスの首都は？", "answer": "パリ"}}]
+"""
+    payload = build_card_payload("")
+    payload["messages"][1]["content"] = prompt
+    payload["max_tokens"] = 300 * len(topics) + 200
+    return payload
+
+def parse_deck_content(llm_content: str) -> list:
+    deck_data = json.loads(llm_content)
+    # Some models wrap the array in an object, e.g. {"cards": [...]}
+    if isinstance(deck_data, dict):
+        deck_data = next((v for v in deck_data.values() if isinstance(v, list)), [deck_data])
+    if not isinstance(deck_data, list):
+        raise ValueError("LLMからの応答が期待されるJSON配列ではありませんでした。")
+    return deck_data
+
+async def generate_deck_chunk(start: int, topics: List[str], call_slots: asyncio.Semaphore):
+    # Returns ([(index, card_data)], [DeckError]) for one LLM call covering len(topics) cards
     try:
-        response = requests.post(LM_STUDIO_API_URL, headers=headers, json=payload)
-        response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
-        lm_studio_response = response.json()
-
-        # Extract content from the LLM response
-        llm_content = lm_studio_response["choices"][0]["message"]["content"]
-        
-        # Attempt to parse the JSON content
+        async with call_slots:
+            llm_content = await request_completion(build_deck_payload(topics))
+        items = parse_deck_content(llm_content)
+    except Exception as e:
+        # A failed call only fails the cards it was generating
+        if isinstance(e, json.JSONDecodeError):
+            detail = f"LLMからの応答をJSONとして解析できませんでした: {e}"
+        elif isinstance(e, ValueError):
+            detail = f"LLM応答の解析エラー: {e}"
+        else:
+            detail = llm_http_exception(e).detail
+        return [], [DeckError(index=start + i, topic=t, detail=detail) for i, t in enumerate(topics)]
+
+    cards, errors = [], []
+    for i, topic in enumerate(topics):
+        if i >= len(items):
+            errors.append(DeckError(index=start + i, topic=topic, detail="LLMの応答にこのカードが含まれていませんでした。"))
+            continue
         try:
-            card_data = json.loads(llm_content)
-            question = card_data.get("question")
-            answer = card_data.get("answer")
-
-            if not question or not answer:
-                raise ValueError("LLMからの応答が期待されるJSON形式ではありませんでした。")
-
-            card_id_counter += 1
-            new_card = Flashcard(id=card_id_counter, question=question, answer=answer)
-            return new_card
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail=f"LLMからの応答をJSONとして解析できませんでした: {llm_content}")
+            cards.append((start + i, validate_card_data(items[i])))
         except ValueError as ve:
-            raise HTTPException(status_code=500, detail=f"LLM応答の解析エラー: {ve}")
-
-    except requests.exceptions.ConnectionError:
-        raise HTTPException(status_code=503, detail="LM Studioサーバーに接続できません。LM Studioが実行中であることを確認してください。")
-    except requests.exceptions.Timeout:
-        raise HTTPException(status_code=504, detail="LM Studioサーバーからの応答がタイムアウトしました。")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"LM Studio APIリクエストエラー: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"予期せぬエラーが発生しました: {e}")
+            errors.append(DeckError(index=start + i, topic=topic, detail=f"LLM応答の解析エラー: {ve}"))
+    return cards, errors
+
+@app.post("/generate-deck/", response_model=DeckResult)
+async def generate_deck(request: DeckRequest):
+    if request.topics:
+        topics = [t for t in request.topics if t and t.strip()]
+    elif request.topic:
+        topics = [request.topic] * request.count
+    else:
+        topics = []
+
+    if not topics:
+        raise HTTPException(status_code=400, detail="トピックが提供されていません。")
+    if len(topics) > DECK_MAX_CARDS:
+        raise HTTPException(status_code=400, detail=f"一度に生成できるカードは{DECK_MAX_CARDS}枚までです。")
+
+    call_slots = asyncio.Semaphore(DECK_MAX_PARALLEL_CALLS)
+    chunks = [
+        generate_deck_chunk(start, topics[start:start + DECK_CARDS_PER_CALL], call_slots)
+        for start in range(0, len(topics), DECK_CARDS_PER_CALL)
+    ]
+    results = await asyncio.gather(*chunks)
+
+    cards, errors = [], []
+    for chunk_cards, chunk_errors in results:
+        cards.extend(chunk_cards)
+        errors.extend(chunk_errors)
+
+    # Assign ids in topic order once every call has finished
+    cards.sort(key=lambda c: c[0])
+    card_ids = await run_in_threadpool(card_store.allocate_ids, len(cards)) if cards else []
+    deck = [Flashcard(id=card_id, **card_data) for card_id, (_, card_data) in zip(card_ids, cards)]
+    errors.sort(key=lambda e: e.index)
+    return DeckResult(cards=deck, errors=errors)
 
 @app.post("/save-card/")
 async def save_card(card: Flashcard):
-    if card.id is None:
-        global card_id_counter
-        card_id_counter += 1
-        card.id = card_id_counter
-    flashcards_db.append(card.dict())
-    return {"message": "カードが正常に保存されました！", "card": card}
+    duplicates = []
+    try:
+        if DEDUP_MODE == "reject":
+            saved = await run_in_threadpool(card_store.insert, card.dict(), DEDUP_THRESHOLD)
+        else:
+            if DEDUP_MODE == "flag":
+                duplicates = await run_in_threadpool(card_store.find_similar, card.dict(), DEDUP_THRESHOLD)
+            saved = await run_in_threadpool(card_store.insert, card.dict())
+    except DuplicateCardError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "よく似たカードがすでに保存されています。", "duplicates": e.matches},
+        )
+    card.id = saved["id"]
+    response = {"message": "カードが正常に保存されました！", "card": card}
+    if duplicates:
+        response["duplicates"] = [SimilarCard(**d) for d in duplicates]
+    return response
 
 @app.get("/cards/", response_model=List[Flashcard])
-async def get_all_cards():
-    return flashcards_db
+async def get_all_cards(
+    response: Response,
+    cursor: Optional[int] = Query(None, description="Return cards with an id greater than this (X-Next-Cursor of the previous page)"),
+    limit: int = Query(CARDS_PAGE_SIZE, ge=1, le=CARDS_MAX_PAGE_SIZE),
+):
+    cards = await run_in_threadpool(card_store.list_page, cursor, limit)
+    if len(cards) == limit:
+        response.headers["X-Next-Cursor"] = str(cards[-1]["id"])
+    return cards
+
+@app.get("/cards/export")
+async def export_cards(gzip: bool = Query(False, description="gzip-compress the NDJSON stream")):
+    """Stream every card as newline-delimited JSON, one page at a time."""
+    total = await run_in_threadpool(card_store.count)
+
+    async def lines():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None # wbits=31: gzip container
+        cursor = None
+        while True:
+            page = await run_in_threadpool(card_store.list_page, cursor, EXPORT_PAGE_SIZE)
+            if not page:
+                break
+            cursor = page[-1]["id"]
+            chunk = "".join(json.dumps(card, ensure_ascii=False) + "\n" for card in page).encode()
+            yield compressor.compress(chunk) if compressor else chunk
+        if compressor:
+            yield compressor.flush()
+
+    filename = "cards.ndjson.gz" if gzip else "cards.ndjson"
+    return StreamingResponse(
+        lines(),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Total-Count": str(total), # Cards at the start of the export, for client-side progress
+        },
+    )
+
+@app.post("/cards/import")
+async def import_cards(
+    request: Request,
+    gzip: bool = Query(False, description="Body is gzip-compressed (also implied by Content-Encoding: gzip)"),
+    keep_ids: bool = Query(False, description="Keep the ids from the file instead of assigning new ones"),
+    import_id: Optional[str] = Query(None, description="Id to poll progress with at /cards/import/{import_id}"),
+):
+    """Import an NDJSON deck streamed in the request body.
+
+    Lines are validated with the Flashcard model and written in batches of
+    IMPORT_BATCH_SIZE, one transaction each, while the body is still being
+    received. Invalid lines are skipped and reported. The search and
+    near-duplicate indexes are built afterwards by start_indexer();
+    ``pending_index`` in the progress report counts the cards still waiting.
+    """
+    import_id = import_id or uuid.uuid4().hex
+    while len(deck_imports) >= 100:
+        deck_imports.pop(next(iter(deck_imports))) # Forget the oldest import
+    progress = deck_imports[import_id] = {
+        "import_id": import_id, "status": "running", "processed": 0, "imported": 0,
+        "failed": 0, "errors": [], "started_at": time.time(),
+    }
+    if gzip or request.headers.get("content-encoding", "").lower() == "gzip":
+        decompressor = zlib.decompressobj(47) # wbits=47: accept zlib or gzip headers
+    else:
+        decompressor = None
+
+    batch: List[dict] = []
+    buffer = b""
+
+    async def flush():
+        nonlocal batch
+        if batch:
+            saved = await run_in_threadpool(card_store.insert_many, batch, False)
+            progress["imported"] += len(saved)
+            batch = []
+
+    def add_line(line: bytes):
+        line = line.strip()
+        if not line:
+            return
+        progress["processed"] += 1
+        try:
+            card = Flashcard(**json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError, TypeError, ValidationError) as e:
+            progress["failed"] += 1
+            if len(progress["errors"]) < 100:
+                progress["errors"].append({"line": progress["processed"], "detail": str(e)})
+            return
+        if not keep_ids:
+            card.id = None
+        batch.append(card.dict())
+
+    try:
+        async for chunk in request.stream():
+            buffer += decompressor.decompress(chunk) if decompressor else chunk
+            *lines, buffer = buffer.split(b"\n")
+            if len(buffer) > IMPORT_MAX_LINE_BYTES:
+                raise HTTPException(status_code=400, detail="NDJSONの1行が大きすぎます。")
+            for line in lines:
+                add_line(line)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await flush()
+        if decompressor:
+            buffer += decompressor.flush()
+            if not decompressor.eof: # zlib doesn't complain about a body that was cut off
+                raise zlib.error("incomplete or truncated stream")
+        for line in buffer.split(b"\n"):
+            add_line(line)
+        await flush()
+    except zlib.error as e:
+        progress["status"] = "failed"
+        raise HTTPException(status_code=400, detail=f"gzipの展開に失敗しました: {e}")
+    except BaseException:
+        progress["status"] = "failed"
+        raise
+    finally:
+        if progress["imported"]:
+            start_indexer()
+    progress["status"] = "done"
+    progress["elapsed_seconds"] = time.time() - progress["started_at"]
+    return {**progress, "pending_index": await run_in_threadpool(card_store.pending_count)}
+
+@app.get("/cards/import/{import_id}")
+async def get_import_progress(import_id: str):
+    progress = deck_imports.get(import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="インポートが見つかりません。")
+    return {**progress, "pending_index": await run_in_threadpool(card_store.pending_count)}
+
+@app.post("/cards/dedupe")
+async def dedupe_cards(
+    threshold: float = Query(DEDUP_THRESHOLD, gt=0.0, le=1.0),
+    apply: bool = Query(False, description="Delete the duplicates instead of only reporting them"),
+):
+    groups = await run_in_threadpool(card_store.duplicate_groups, threshold)
+    deleted = 0
+    if apply:
+        deleted = await run_in_threadpool(card_store.delete_many, [d for g in groups for d in g["duplicates"]])
+    return {"groups": groups, "deleted": deleted}
+
+@app.get("/cards/search", response_model=List[SearchHit])
+async def search_cards(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return await run_in_threadpool(card_store.search, q, limit)
 
 @app.get("/cards/{card_id}", response_model=Flashcard)
 async def get_card(card_id: int):
-    for card in flashcards_db:
-        if card["id"] == card_id:
-            return card
-    raise HTTPException(status_code=404, detail="カードが見つかりません。")
+    card = await run_in_threadpool(card_store.get, card_id)
+    if card is None:
+        raise HTTPException(status_code=404, detail="カードが見つかりません。")
+    return card
 
 @app.delete("/cards/{card_id}")
 async def delete_card(card_id: int):
-    global flashcards_db
-    initial_len = len(flashcards_db)
-    flashcards_db = [card for card in flashcards_db if card["id"] != card_id]
-    if len(flashcards_db) < initial_len:
+    if await run_in_threadpool(card_store.delete, card_id):
         return {"message": "カードが正常に削除されました！"}
     raise HTTPException(status_code=404, detail="カードが見つかりません。")
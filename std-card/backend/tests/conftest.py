@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(BACKEND)), "common"))
+
+# main.py opens its store at import time
+os.environ.setdefault("CARD_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="std-card-test-"), "flashcards.db"))
+
+from card_store import CardStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CardStore(str(tmp_path / "cards.db"))
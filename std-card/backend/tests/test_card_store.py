@@ -0,0 +1,86 @@
+import threading
+
+from card_store import CardStore
+
+
+def card(n):
+    return {"question": f"question {n}", "answer": f"answer {n}"}
+
+
+def test_concurrent_allocations_do_not_collide(store):
+    # One CardStore per thread, as one per uvicorn worker: only the database is shared
+    allocated = []
+    lock = threading.Lock()
+
+    def allocate():
+        worker_store = CardStore(store.path)
+        for n in (1, 5, 1, 20):
+            ids = worker_store.allocate_ids(n)
+            assert ids == list(range(ids[0], ids[0] + n))
+            with lock:
+                allocated.extend(ids)
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(allocated) == 8 * 27
+    assert sorted(allocated) == list(range(1, 8 * 27 + 1))
+
+
+def test_insert_assigns_ids_past_explicit_ones(store):
+    assert store.insert(card(1))["id"] == 1
+    assert store.insert({**card(2), "id": 10})["id"] == 10
+    assert store.insert(card(3))["id"] == 11
+    assert store.allocate_ids(2) == [12, 13]
+    # Replacing an existing id keeps a single row
+    store.insert({**card(4), "id": 10})
+    assert store.get(10)["question"] == "question 4"
+    assert store.count() == 3
+
+
+def test_insert_many_with_a_repeated_id(store):
+    saved = store.insert_many([{**card(1), "id": 5}, card(2), {**card(3), "id": 5}, card(4)])
+    # The later card with id 5 wins; new cards don't take the batch's explicit ids
+    assert [c["id"] for c in saved] == [5, 6, 7]
+    assert store.get(5)["question"] == "question 3"
+    assert store.count() == 3
+    assert [hit["id"] for hit in store.search("question 3")] == [5]
+    assert store.search("question 1") == []
+
+
+def test_insert_many_defers_indexing(store):
+    saved = store.insert_many([card(n) for n in range(10)], index=False)
+    assert store.pending_count() == 10
+    assert store.search("question 3") == []
+    assert store.index_pending(4) == 4
+    assert store.pending_count() == 6
+    while store.index_pending(4):
+        pass
+    assert store.pending_count() == 0
+    assert [hit["id"] for hit in store.search("question 3")] == [saved[3]["id"]]
+    # Cards replaced or deleted before they were indexed leave the queue
+    store.insert_many([card(20), card(21)], index=False)
+    store.insert({**card(22), "id": saved[-1]["id"] + 1})
+    store.delete(saved[-1]["id"] + 2)
+    assert store.pending_count() == 0
+
+
+def test_list_page_with_inserts_between_pages(store):
+    store.insert_many([card(n) for n in range(50)])
+    seen = []
+    cursor = None
+    while True:
+        page = store.list_page(cursor, 7)
+        if not page:
+            break
+        seen.extend(c["id"] for c in page)
+        cursor = page[-1]["id"]
+        if len(seen) < 40:
+            # New cards land after the cursor; a replaced card keeps its place
+            store.insert(card(100 + len(seen)))
+            store.insert({**card(200), "id": seen[0]})
+    assert seen == sorted(set(seen))
+    assert seen == [c["id"] for c in store.list_page(None, 1000)]
+    assert len(seen) == 50 + 5 # One new card after each of the first five pages
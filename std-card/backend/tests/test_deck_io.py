@@ -0,0 +1,90 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from card_store import CardStore
+
+CARDS = [{"question": f"質問{n}は？", "answer": f"答え{n}"} for n in range(25)]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    source = CardStore(str(tmp_path / "source.db"))
+    source.insert_many(CARDS)
+    monkeypatch.setattr(main, "card_store", source)
+    monkeypatch.setattr(main, "EXPORT_PAGE_SIZE", 10)
+    monkeypatch.setattr(main, "IMPORT_BATCH_SIZE", 7)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def use_fresh_store(tmp_path, monkeypatch) -> CardStore:
+    target = CardStore(str(tmp_path / "target.db"))
+    monkeypatch.setattr(main, "card_store", target)
+    return target
+
+
+def wait_indexed(client, import_id):
+    for _ in range(100):
+        progress = client.get(f"/cards/import/{import_id}").json()
+        if not progress["pending_index"]:
+            return progress
+    raise AssertionError("imported cards were never indexed")
+
+
+@pytest.mark.parametrize("compressed", [False, True])
+def test_round_trip(client, tmp_path, monkeypatch, compressed):
+    exported = client.get("/cards/export", params={"gzip": compressed})
+    assert exported.status_code == 200
+    assert exported.headers["x-total-count"] == str(len(CARDS))
+    body = exported.content # TestClient doesn't decode it: there is no Content-Encoding
+    lines = (gzip.decompress(body) if compressed else body).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{"id": n + 1, **c} for n, c in enumerate(CARDS)]
+
+    target = use_fresh_store(tmp_path, monkeypatch)
+    response = client.post("/cards/import", params={"gzip": compressed, "keep_ids": True, "import_id": "deck"},
+                           content=body)
+    assert response.status_code == 200
+    progress = response.json()
+    assert (progress["status"], progress["processed"], progress["imported"], progress["failed"]) == ("done", 25, 25, 0)
+    assert target.list_page(None, 100) == [{"id": n + 1, **c} for n, c in enumerate(CARDS)]
+    assert wait_indexed(client, "deck")["imported"] == 25
+    assert [hit["id"] for hit in target.search("質問7")] == [8]
+
+
+def test_import_assigns_new_ids(client):
+    body = "".join(json.dumps({"id": 3, **c}, ensure_ascii=False) + "\n" for c in CARDS[:3])
+    progress = client.post("/cards/import", content=body.encode()).json()
+    assert progress["imported"] == 3
+    assert [c["question"] for c in main.card_store.list_page(25, 10)] == [c["question"] for c in CARDS[:3]]
+
+
+def test_malformed_lines_are_skipped(client, tmp_path, monkeypatch):
+    target = use_fresh_store(tmp_path, monkeypatch)
+    lines = [json.dumps(c, ensure_ascii=False) for c in CARDS[:10]]
+    lines[2] = '{"question": "閉じていない'
+    lines[5] = json.dumps({"question": "答えがない"}, ensure_ascii=False)
+    body = ("\n".join(lines) + "\n\n").encode()
+    progress = client.post("/cards/import", params={"import_id": "bad-lines"}, content=body).json()
+    assert (progress["status"], progress["processed"], progress["imported"], progress["failed"]) == ("done", 10, 8, 2)
+    assert [e["line"] for e in progress["errors"]] == [3, 6]
+    assert target.count() == 8
+    assert client.get("/cards/import/bad-lines").json()["failed"] == 2
+
+
+def test_truncated_gzip_fails_the_import(client, tmp_path, monkeypatch):
+    body = client.get("/cards/export", params={"gzip": True}).content
+    target = use_fresh_store(tmp_path, monkeypatch)
+    response = client.post("/cards/import", params={"gzip": True, "import_id": "cut"}, content=body[:len(body) - 10])
+    assert response.status_code == 400
+    progress = client.get("/cards/import/cut").json()
+    assert progress["status"] == "failed"
+    # Batches written before the end of the body stay imported
+    assert target.count() == progress["imported"]
+
+
+def test_unknown_import(client):
+    assert client.get("/cards/import/missing").status_code == 404
@@ -0,0 +1,105 @@
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from generation_cache import GenerationCache
+
+CARD = {"question": "光合成で「酸素」はどこから？", "answer": "水の分解から\nです"}
+
+
+def sse(text):
+    """[(event, data)] of a Server-Sent Events body."""
+    events = []
+    for block in text.split("\n\n"):
+        if block:
+            event, data = block.split("\n", 1)
+            events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class FakeStream:
+    """Stands in for main.stream_completion, yielding ``deltas`` then raising ``error`` if given."""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, payload):
+        self.calls += 1
+        for delta in self.deltas:
+            yield delta
+        if self.error is not None:
+            raise self.error
+
+
+def chunked(text, size=3):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(main, "card_store", store)
+    monkeypatch.setattr(main, "card_cache", GenerationCache(normalize=main.normalize_query))
+    return TestClient(main.app)
+
+
+def generate(client, query="光合成"):
+    response = client.post("/generate-card/stream", json={"query": query})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return sse(response.text)
+
+
+def test_deltas_then_card(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_completion", FakeStream(chunked("```json\n" + json.dumps(CARD, ensure_ascii=False) + "\n```")))
+    events = generate(client)
+    *deltas, (last, card) = events
+    assert {event for event, _ in deltas} == {"delta"}
+    text = {}
+    for _, delta in deltas:
+        text[delta["field"]] = text.get(delta["field"], "") + delta["text"]
+    assert text == CARD
+    assert last == "card"
+    assert {"question": card["question"], "answer": card["answer"]} == CARD
+    assert isinstance(card["id"], int)
+
+
+def test_cached_card_skips_the_llm(client, monkeypatch):
+    fake = FakeStream(chunked(json.dumps(CARD, ensure_ascii=False)))
+    monkeypatch.setattr(main, "stream_completion", fake)
+    first = generate(client)[-1][1]
+    events = generate(client, " 光合成 ")
+    assert fake.calls == 1
+    assert [event for event, _ in events] == ["card"]
+    assert events[0][1]["question"] == CARD["question"] and events[0][1]["id"] != first["id"]
+
+
+def test_unfinished_json(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_completion", FakeStream(['{"question": "光合成', '", "answer": "水']))
+    events = generate(client)
+    assert events[:2] == [("delta", {"field": "question", "text": "光合成"}), ("delta", {"field": "answer", "text": "水"})]
+    assert events[2][0] == "error"
+    assert events[2][1]["status"] == 500
+    assert "JSON" in events[2][1]["detail"]
+    assert main.card_cache.peek("光合成") is None
+
+
+def test_missing_field(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_completion", FakeStream(['{"question": "光合成"}']))
+    events = generate(client)
+    assert events[-1] == ("error", {"status": 500, "detail": "LLM応答の解析エラー: LLMからの応答が期待されるJSON形式ではありませんでした。"})
+
+
+def test_upstream_failure_mid_stream(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_completion", FakeStream(['{"question": "光'], httpx.ReadTimeout("timed out")))
+    events = generate(client)
+    assert events[0] == ("delta", {"field": "question", "text": "光"})
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 504
+
+
+def test_empty_query(client):
+    assert client.post("/generate-card/stream", json={"query": ""}).status_code == 400
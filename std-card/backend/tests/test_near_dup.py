@@ -0,0 +1,84 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import near_dup
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+CARD = {"question": "光合成で植物が作り出すものは何ですか？", "answer": "酸素とブドウ糖（グルコース）"}
+
+
+def mutate(text, changes, seed):
+    rng = random.Random(seed)
+    chars = list(text)
+    for i in rng.sample(range(len(chars)), changes):
+        chars[i] = rng.choice(KANA)
+    return "".join(chars)
+
+
+def test_shingles_ignore_case_width_and_punctuation():
+    assert near_dup.shingles("Ａb、c!") == near_dup.shingles("abc") == {"ab", "bc"}
+    assert near_dup.shingles("あ") == {"あ"}
+    assert near_dup.shingles("？！") == set()
+
+
+def test_similarity_estimates_jaccard():
+    a = near_dup.minhash(near_dup.card_text(CARD))
+    assert near_dup.similarity(a, near_dup.minhash(near_dup.card_text({**CARD, "answer": "酸素とブドウ糖(グルコース)。"}))) == 1.0
+    assert near_dup.similarity(a, near_dup.minhash("日本の首都は？\n東京")) < 0.2
+    assert near_dup.unpack(near_dup.pack(a)) == a
+    assert len(near_dup.band_buckets(a)) == near_dup.BANDS
+
+
+def test_find_similar(store):
+    store.insert(CARD)
+    store.insert({"question": "日本の首都は？", "answer": "東京"})
+    matches = store.find_similar({**CARD, "question": CARD["question"] + "。"}, 0.8)
+    assert [(m["id"], m["similarity"]) for m in matches] == [(1, 1.0)]
+    assert store.find_similar({"question": "フランスの首都は？", "answer": "パリ"}, 0.8) == []
+    # A stored card is not its own duplicate
+    assert store.find_similar({**CARD, "id": 1}, 0.8) == []
+
+
+def test_duplicate_groups_follow_chains(store):
+    # a~b and b~c, but a and c alone are too far apart: one group through b
+    rng = random.Random(1)
+    a = "".join(rng.choice(KANA) for _ in range(60))
+    b = mutate(a, 4, 2)
+    c = mutate(b, 4, 3)
+    sims = [near_dup.similarity(near_dup.minhash(x), near_dup.minhash(y)) for x, y in ((a, b), (b, c), (a, c))]
+    assert sims[0] >= 0.7 and sims[1] >= 0.7 and sims[2] < 0.7
+    store.insert_many([{"question": q, "answer": "答え"} for q in (c, "無関係なカード", a, b, "無関係なカード。")])
+    assert store.duplicate_groups(0.7) == [{"keep": 1, "duplicates": [3, 4]}, {"keep": 2, "duplicates": [5]}]
+    store.delete(4)
+    assert store.duplicate_groups(0.7) == [{"keep": 2, "duplicates": [5]}]
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    monkeypatch.setattr(main, "card_store", store)
+    return TestClient(main.app)
+
+
+def test_save_flags_near_duplicates(client, monkeypatch):
+    monkeypatch.setattr(main, "DEDUP_MODE", "flag")
+    assert "duplicates" not in client.post("/save-card/", json=CARD).json()
+    response = client.post("/save-card/", json={**CARD, "answer": CARD["answer"] + "です"})
+    assert response.status_code == 200
+    assert [d["id"] for d in response.json()["duplicates"]] == [1]
+    assert "duplicates" not in client.post("/save-card/", json={"question": "日本の首都は？", "answer": "東京"}).json()
+    assert main.card_store.count() == 3
+
+
+def test_save_rejects_near_duplicates(client, monkeypatch):
+    monkeypatch.setattr(main, "DEDUP_MODE", "reject")
+    assert client.post("/save-card/", json=CARD).status_code == 200
+    response = client.post("/save-card/", json={**CARD, "answer": "酸素とブドウ糖（グルコース）です"})
+    assert response.status_code == 409
+    assert [d["id"] for d in response.json()["detail"]["duplicates"]] == [1]
+    assert main.card_store.count() == 1
+    assert client.post("/save-card/", json={"question": "日本の首都は？", "answer": "東京"}).status_code == 200
+    # Resaving a card under its own id is not a duplicate of itself
+    assert client.post("/save-card/", json={**CARD, "id": 1}).status_code == 200
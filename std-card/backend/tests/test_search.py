@@ -0,0 +1,62 @@
+import pytest
+
+from card_store import ngram_query, ngram_text
+
+
+def test_ngram_text():
+    assert ngram_text("東京タワー is tall!") == "東京 京タ タワ ワー ー is tall"
+    assert ngram_text("ＡＢＣ") == "abc" # NFKC + casefold
+
+
+def test_ngram_query_quotes_every_term():
+    assert ngram_query("東京タワー") == '"東京 京タ タワ ワー"'
+    assert ngram_query("京") == '"京"*'
+    assert ngram_query('say "hi" NEAR(x y)*') == '"say" AND "hi" AND "near" AND "x"* AND "y"*'
+    assert ngram_query("!?* ") is None
+
+
+@pytest.fixture
+def cards(store):
+    return store.insert_many([
+        {"question": "日本の首都は？", "answer": "東京"},
+        {"question": "京都の別名は？", "answer": "平安京"},
+        {"question": "photosynthesis needs?", "answer": "light and water"},
+        {"question": "What does NEAR mean in SQL?", "answer": "An FTS5 \"operator\" for proximity"},
+        {"question": "大阪の名物は？", "answer": "東京にはないたこ焼き"},
+    ])
+
+
+def test_queries_shorter_than_a_bigram(store, cards):
+    # One character matches as the start of a bigram or the end of a run
+    assert {hit["id"] for hit in store.search("京")} == {1, 2, 5}
+    assert {hit["id"] for hit in store.search("都")} == {1, 2}
+    assert [hit["id"] for hit in store.search("阪")] == [5]
+    assert store.search("東京都") == []
+
+
+def test_fts_syntax_in_queries_is_literal(store, cards):
+    assert [hit["id"] for hit in store.search('"operator"')] == [4]
+    assert [hit["id"] for hit in store.search("NEAR")] == [4]
+    assert [hit["id"] for hit in store.search("NEAR(light water)")] == []
+    assert [hit["id"] for hit in store.search("light* AND water")] == [3]
+    assert [hit["id"] for hit in store.search("photo*")] == [] # No prefix queries on words
+    for query in ('"', "*", "AND", "OR NOT", "(", "col:x", "^"):
+        store.search(query) # Must not raise sqlite3.OperationalError
+
+
+def test_question_matches_rank_first(store):
+    # Same text, once in the question and once in the answer
+    store.insert_many([
+        {"question": "富士山の高さは？", "answer": "東京から見える山"},
+        {"question": "東京から見える山", "answer": "富士山の高さは？"},
+    ])
+    hits = store.search("東京")
+    assert [hit["id"] for hit in hits] == [2, 1]
+    assert hits[0]["score"] > hits[1]["score"] > 0
+
+
+def test_search_follows_updates_and_deletes(store, cards):
+    store.insert({"id": 1, "question": "日本の首都は？", "answer": "とうきょう"})
+    assert [hit["id"] for hit in store.search("東京")] == [5]
+    store.delete(5)
+    assert store.search("東京") == []
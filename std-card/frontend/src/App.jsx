@@ -9,6 +9,7 @@ import DeleteIcon from '@mui/icons-material/Delete';
 function App() {
   const [query, setQuery] = useState('');
   const [generatedCard, setGeneratedCard] = useState(null);
+  const [generating, setGenerating] = useState(false);
   const [savedCards, setSavedCards] = useState([]);
   const [snackbarOpen, setSnackbarOpen] = useState(false);
   const [snackbarMessage, setSnackbarMessage] = useState('');
@@ -34,8 +35,11 @@ function App() {
   };
 
   const handleGenerateCard = async () => {
+    setGenerating(true);
+    setGeneratedCard(null);
     try {
-      const response = await fetch(`${API_BASE_URL}/generate-card/`, {
+      // Stream the card over SSE so the question shows up while the answer is still generating
+      const response = await fetch(`${API_BASE_URL}/generate-card/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -45,12 +49,43 @@ function App() {
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
-      const data = await response.json();
-      setGeneratedCard(data);
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      let partial = { question: '', answer: '' };
+      let finalCard = null;
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += value;
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!eventName || dataLine === undefined) continue;
+          const data = JSON.parse(dataLine);
+          if (eventName === 'delta') {
+            partial = { ...partial, [data.field]: partial[data.field] + data.text };
+            setGeneratedCard(partial);
+          } else if (eventName === 'card') {
+            finalCard = data;
+            setGeneratedCard(data);
+          } else if (eventName === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
+      if (!finalCard) {
+        throw new Error('ストリームがカードを返さずに終了しました。');
+      }
       showSnackbar('フラッシュカードが生成されました！', 'success');
     } catch (error) {
       console.error('カード生成エラー:', error);
+      setGeneratedCard(null);
       showSnackbar('フラッシュカードの生成に失敗しました。', 'error');
+    } finally {
+      setGenerating(false);
     }
   };
 
@@ -82,12 +117,19 @@ function App() {
 
   const fetchSavedCards = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/cards/`);
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      const data = await response.json();
-      setSavedCards(data);
+      // /cards/ is paginated; follow X-Next-Cursor until the last page
+      const cards = [];
+      let cursor = null;
+      do {
+        const url = cursor ? `${API_BASE_URL}/cards/?cursor=${cursor}` : `${API_BASE_URL}/cards/`;
+        const response = await fetch(url);
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        cards.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+      } while (cursor);
+      setSavedCards(cards);
     } catch (error) {
       console.error('保存済みカード取得エラー:', error);
       showSnackbar('保存済みフラッシュカードの読み込みに失敗しました。', 'error');
@@ -148,7 +190,7 @@ function App() {
           <Button
             variant="contained"
             onClick={handleGenerateCard}
-            disabled={!query}
+            disabled={!query || generating}
           >
             フラッシュカードを生成
           </Button>
@@ -169,6 +211,7 @@ function App() {
                   variant="outlined"
                   sx={{ mt: 2 }}
                   onClick={handleSaveCard}
+                  disabled={generating}
                 >
                   カードを保存
                 </Button>